@@ -0,0 +1,44 @@
+'''
+Check the polars cleaning backend returns the same tables as the pandas backend and time both.
+
+Each clean method is run on the same synthetic dirty table with both backends. The cleaned tables
+and the rejected row counts must be equal, the script exits with status 1 when any differ.
+Needs the optional polars package.
+
+Run from the repository root:
+    python -m benchmarks.benchmark_backends --sizes 10000,1000000
+'''
+import argparse
+import sys
+import pandas as pd
+from synthetic_data import SyntheticDataGenerator
+from tests.cleaning_reference import CLEAN_METHODS, run_backend
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10000,1000000', help='Comma separated row counts')
+    parser.add_argument('--methods', default=','.join(CLEAN_METHODS), help='Comma separated clean methods')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    failures = 0
+    print(f"{'method':<22}{'rows':>10}{'pandas':>10}{'polars':>10}{'speedup':>9}  equal")
+    for clean_method in args.methods.split(','):
+        for rows in [int(size) for size in args.sizes.split(',')]:
+            table = SyntheticDataGenerator(seed=args.seed).table_for(clean_method, rows)
+            expected, expected_rejected, pandas_seconds = run_backend(table, clean_method, 'pandas')
+            result, rejected, polars_seconds = run_backend(table, clean_method, 'polars')
+            try:
+                pd.testing.assert_frame_equal(result, expected)
+                assert rejected == expected_rejected, f'rejected rows {rejected} != {expected_rejected}'
+                equal = 'yes'
+            except AssertionError as error:
+                failures += 1
+                equal = f'NO: {str(error).strip().splitlines()[0]}'
+            print(f'{clean_method:<22}{rows:>10}{pandas_seconds:>9.2f}s{polars_seconds:>9.2f}s{pandas_seconds / polars_seconds:>8.1f}x  {equal}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
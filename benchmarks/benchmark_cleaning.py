@@ -0,0 +1,113 @@
+'''
+Time every DataCleaning clean method on synthetic dirty tables and check for regressions.
+
+Each method and size runs in its own process, is timed without tracing then run again under
+tracemalloc to measure its peak memory. Results are compared with a stored baseline and the script
+exits with status 1 when a method's rows/sec drops by more than the threshold. Without --save-baseline
+the baseline must exist and hold every case run, otherwise the script exits with status 2 before timing
+anything, a check against nothing would always pass.
+
+Run from the repository root:
+    python -m benchmarks.benchmark_cleaning --sizes 10000,1000000,10000000 --save-baseline
+    python -m benchmarks.benchmark_cleaning --sizes 10000,1000000,10000000
+'''
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+from data_cleaning import DataCleaning
+from synthetic_data import SyntheticDataGenerator
+
+CLEAN_METHODS = ['clean_users', 'clean_card_data', 'clean_store_data', 'clean_products_data', 'clean_order_data', 'clean_events_data']
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'cleaning_baseline.json')
+
+
+def run_case(clean_method:str, rows:int, seed:int, repeat:int):
+    '''
+    Generate a table then time a clean method on it, keeping the fastest of repeat runs, and measure its peak traced memory.
+
+    Parameters
+    ----------
+    clean_method(str) : Name of the DataCleaning method
+    rows(int) : Number of rows to generate
+    seed(int) : Random seed
+    repeat(int) : Number of timed runs
+
+    Returns
+    -------
+    result : dictionary of seconds, rows_per_second and peak_mb
+    '''
+    generator = SyntheticDataGenerator(seed=seed)
+    table = generator.table_for(clean_method, rows)
+    with contextlib.redirect_stdout(io.StringIO()):
+        seconds = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            getattr(DataCleaning(table.copy()), clean_method)()
+            seconds = min(seconds, time.perf_counter() - start)
+        tracemalloc.start()
+        getattr(DataCleaning(table), clean_method)()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {'seconds': seconds, 'rows_per_second': rows / seconds, 'peak_mb': peak / 1024**2}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10000,1000000,10000000', help='Comma separated row counts')
+    parser.add_argument('--methods', default=','.join(CLEAN_METHODS), help='Comma separated clean methods')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case, the fastest is kept')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed fractional drop in rows/sec against the baseline')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='Store these results as the new baseline')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    methods = args.methods.split(',')
+    baseline = {}
+    if not args.save_baseline:
+        if not os.path.exists(args.baseline):
+            print(f'no baseline at {args.baseline}, run with --save-baseline first to store one')
+            sys.exit(2)
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        missing = [f'{clean_method}@{rows}' for clean_method in methods for rows in sizes if f'{clean_method}@{rows}' not in baseline]
+        if missing:
+            print(f"not in the baseline at {args.baseline}: {', '.join(missing)}, run these with --save-baseline first")
+            sys.exit(2)
+
+    results = {}
+    regressions = []
+    print(f"{'method':<22}{'rows':>10}{'seconds':>10}{'rows/s':>12}{'peak MB':>10}{'vs baseline':>13}")
+    for clean_method in methods:
+        for rows in sizes:
+            #a fresh process per case keeps peak memory and caches from leaking between cases
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                result = executor.submit(run_case, clean_method, rows, args.seed, args.repeat).result()
+            key = f'{clean_method}@{rows}'
+            results[key] = result
+            change = ''
+            if key in baseline:
+                ratio = result['rows_per_second'] / baseline[key]['rows_per_second']
+                change = f'{(ratio - 1) * 100:+.1f}%'
+                if ratio < 1 - args.threshold:
+                    regressions.append(key)
+            print(f"{clean_method:<22}{rows:>10}{result['seconds']:>10.2f}{result['rows_per_second']:>12.0f}{result['peak_mb']:>10.1f}{change:>13}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f'baseline saved to {args.baseline}')
+    if regressions:
+        print(f"regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
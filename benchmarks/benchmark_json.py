@@ -0,0 +1,121 @@
+'''
+Compare pandas.read_json with the streaming column JSON decoder on a large locally served date_details.json.
+
+A synthetic events file is written to a temporary directory and served over HTTP on localhost. Each
+reader is timed, then run again under tracemalloc for the peak memory it allocates. The streamed
+tables must equal pandas.read_json, the script exits with status 1 when any differ.
+
+Run from the repository root:
+    python -m benchmarks.benchmark_json --rows 2000000 --chunksize 100000
+'''
+import argparse
+import contextlib
+import functools
+import http.server
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import pandas as pd
+from data_extraction import DataExtractor
+from synthetic_data import SyntheticDataGenerator
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@contextlib.contextmanager
+def serve_directory(directory:str):
+    '''
+    Serve a directory over HTTP on a free localhost port and yield its URL.
+    '''
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(QuietHandler, directory=directory))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_address[1]}'
+    finally:
+        server.shutdown()
+
+
+def read(reader:str, extractor, url:str, chunksize:int):
+    '''
+    Read the JSON file with one reader and return its row count and first frame.
+    '''
+    if reader == 'pandas.read_json':
+        df = pd.read_json(url)
+        return len(df), df
+    if reader == 'streamed, one frame':
+        df = next(extractor.stream_json_from_s3(url, chunksize=None))
+        return len(df), df
+    #only one chunk is kept at a time, as when the chunks are cleaned and uploaded in turn
+    rows = 0
+    first = None
+    for chunk in extractor.stream_json_from_s3(url, chunksize=chunksize):
+        rows += len(chunk)
+        first = chunk if first is None else first
+    return rows, first
+
+
+def measure(reader:str, extractor, url:str, chunksize:int):
+    '''
+    Time a reader, then run it again under tracemalloc for the peak memory it allocates.
+
+    Returns
+    -------
+    rows : Number of rows read
+    seconds : Wall time of the untraced run
+    peak : Peak traced memory in MiB
+    df : First frame read
+    '''
+    start = time.perf_counter()
+    rows, df = read(reader, extractor, url, chunksize)
+    seconds = time.perf_counter() - start
+    del df
+    tracemalloc.start()
+    rows, df = read(reader, extractor, url, chunksize)
+    peak = tracemalloc.get_traced_memory()[1] / 1024**2
+    tracemalloc.stop()
+    return rows, seconds, peak, df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2000000)
+    parser.add_argument('--chunksize', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as directory:
+        SyntheticDataGenerator(seed=args.seed).date_events(args.rows).to_json(os.path.join(directory, 'date_details.json'))
+        megabytes = os.path.getsize(os.path.join(directory, 'date_details.json')) / 1024**2
+        print(f'date_details.json: {args.rows} rows, {megabytes:.0f} MiB')
+        print(f"{'reader':<28}{'seconds':>9}{'rows/s':>12}{'peak MiB':>10}  equal")
+        with serve_directory(directory) as base_url:
+            url = f'{base_url}/date_details.json'
+            extractor = DataExtractor()
+            expected = None
+            for reader in ['pandas.read_json', 'streamed, one frame', f'streamed, {args.chunksize} row chunks']:
+                rows, seconds, peak, df = measure(reader, extractor, url, args.chunksize)
+                if expected is None:
+                    expected, df = df, None
+                    equal = ''
+                else:
+                    try:
+                        pd.testing.assert_frame_equal(df, expected.iloc[:len(df)])
+                        assert rows == len(expected), f'{rows} rows != {len(expected)}'
+                        equal = 'yes'
+                    except AssertionError as error:
+                        failures += 1
+                        equal = f'NO: {str(error).strip().splitlines()[0]}'
+                print(f'{reader:<28}{seconds:>8.2f}s{rows / seconds:>12,.0f}{peak:>10.0f}  {equal}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+'''
+Compare replacing a dimension table on every run with merging only the rows that changed.
+
+A cleaned synthetic table is loaded once, then for each churn rate a copy with that fraction of rows
+updated, a tenth as many deleted and as many new rows inserted is written both ways. The merge must
+report the expected change counts and leave the table equal to the replaced one, the script exits
+with status 1 when it does not.
+Needs a local Postgres, the benchmarked table and its row hashes are dropped and recreated.
+Run from the repository root:
+    python -m benchmarks.benchmark_merge local_db_creds.yaml --table dim_users --rows 500000
+'''
+import argparse
+import contextlib
+import io
+import sys
+import time
+import numpy as np
+import pandas as pd
+from data_cleaning import DataCleaning
+from database_utils import DatabaseConnector
+from star_schema import STAR_SCHEMA
+from synthetic_data import SyntheticDataGenerator
+
+#DataCleaning method and a text column changed to simulate updates for each merged table
+TABLES = {
+    'dim_users': ('clean_users', 'company'),
+    'dim_card_details': ('clean_card_data', 'card_provider'),
+    'dim_store_details': ('clean_store_data', 'locality'),
+    'dim_products': ('clean_products_data', 'product_name'),
+}
+
+
+def churn(df, table:str, rate:float, new_rows, rng):
+    '''
+    Copy a table with a fraction of its rows updated, a tenth as many deleted and the same number of new rows added.
+
+    Returns
+    -------
+    df : The changed Pandas Dataframe object
+    expected : dictionary of the number of rows inserted, updated and deleted
+    '''
+    column = TABLES[table][1]
+    count = int(len(df) * rate)
+    deleted = max(count // 10, 1 if count else 0)
+    positions = rng.permutation(len(df))
+    df = df.copy()
+    df.iloc[positions[:count], df.columns.get_loc(column)] = df[column].iloc[positions[:count]].astype(str) + ' (changed)'
+    df = df.drop(df.index[positions[count:count + deleted]])
+    df = pd.concat([df, new_rows.iloc[:deleted]])
+    return df, {'inserted': deleted, 'updated': count, 'deleted': deleted}
+
+
+def read_table(connector:DatabaseConnector, table:str):
+    '''
+    The contents of a table sorted by its primary key.
+    '''
+    primary_key = STAR_SCHEMA[table]['primary_key']
+    with connector.connect() as connection:
+        return pd.read_sql(f'SELECT * FROM "{table}" ORDER BY "{primary_key}"', connection)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('credentials', help='Path to the local database credentials yaml')
+    parser.add_argument('--table', default='dim_users', choices=list(TABLES))
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--churn', default='0,0.001,0.01,0.1', help='Comma separated fractions of rows changed per run')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    connector = DatabaseConnector(args.credentials)
+    clean_method = TABLES[args.table][0]
+    primary_key = STAR_SCHEMA[args.table]['primary_key']
+    with contextlib.redirect_stdout(io.StringIO()):
+        generated = getattr(DataCleaning(SyntheticDataGenerator(seed=args.seed).table_for(clean_method, args.rows * 11 // 10)), clean_method)()
+    generated = generated.dropna(subset=[primary_key]).drop_duplicates(subset=[primary_key])
+    base, new_rows = generated.iloc[:args.rows], generated.iloc[args.rows:]
+    rng = np.random.default_rng(args.seed)
+
+    failures = 0
+    print(f"{'churn':>7}{'replace':>10}{'merge':>10}  changes")
+    for rate in [float(value) for value in args.churn.split(',')]:
+        df, expected = churn(base, args.table, rate, new_rows, rng)
+        with contextlib.redirect_stdout(io.StringIO()):
+            with connector.begin() as connection:
+                connection.exec_driver_sql(f'DROP TABLE IF EXISTS "{args.table}_row_hashes"')
+            connector.merge_to_db(base, args.table)
+            start = time.perf_counter()
+            changes = connector.merge_to_db(df, args.table)
+            merge_seconds = time.perf_counter() - start
+            merged = read_table(connector, args.table)
+            start = time.perf_counter()
+            connector.typed_upload_to_db(df, args.table)
+            replace_seconds = time.perf_counter() - start
+            replaced = read_table(connector, args.table)
+        try:
+            assert {change: changes[change] for change in expected} == expected, f'{changes} != {expected}'
+            pd.testing.assert_frame_equal(merged, replaced)
+            status = ''
+        except AssertionError as error:
+            failures += 1
+            status = f'  NO: {str(error).strip().splitlines()[0]}'
+        print(f'{rate:>7.1%}{replace_seconds:>9.2f}s{merge_seconds:>9.2f}s  {changes}{status}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
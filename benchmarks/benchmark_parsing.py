@@ -0,0 +1,65 @@
+'''
+Time parsing date, price and weight columns by their distinct values against parsing every row.
+
+Dates are compared with pandas.to_datetime on the whole column, which only parses values in the
+format of the first value, and with format="mixed", which infers the format of every row as the
+memoized parse does for values outside the known formats.
+
+Run from the repository root:
+    python -m benchmarks.benchmark_parsing --rows 1000000
+'''
+import argparse
+import time
+import pandas as pd
+from data_cleaning import DataCleaning
+from parsing import parse_dates, report_parse_stats
+from synthetic_data import SyntheticDataGenerator
+
+
+def timed(func, *args, **kwargs):
+    '''
+    Run a function and return its result and wall time.
+    '''
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    generator = SyntheticDataGenerator(seed=args.seed)
+    dates = generator.users(args.rows)['date_of_birth']
+    products = generator.products(args.rows)
+    stats = {}
+
+    print(f"{'parse':<36}{'seconds':>9}{'parsed':>10}")
+    for name, func, kwargs in [
+        ('to_datetime, first value format', pd.to_datetime, {'errors': 'coerce'}),
+        ('to_datetime, format="mixed"', pd.to_datetime, {'errors': 'coerce', 'format': 'mixed'}),
+        ('parse_dates, distinct values', parse_dates, {'name': 'date_of_birth', 'stats': stats}),
+    ]:
+        result, seconds = timed(func, dates, **kwargs)
+        print(f'{name:<36}{seconds:>8.2f}s{int(result.notna().sum()):>10}')
+
+    def prices_every_row(prices):
+        return pd.to_numeric(prices.str.replace('£', '').str.replace(',', '').str.replace('$', ''), errors='coerce')
+    cleaner = DataCleaning(products[['product_price', 'weight']].copy())
+    for name, row_func, memoized_func in [
+        ('product_price', prices_every_row, lambda: cleaner._clean_currency('product_price')),
+        ('weight', cleaner._weights_in_kg, cleaner._convert_product_weights),
+    ]:
+        _, row_seconds = timed(row_func, products[name])
+        _, memoized_seconds = timed(memoized_func)
+        print(f'{name + " every row":<36}{row_seconds:>8.2f}s')
+        print(f'{name + " distinct values":<36}{memoized_seconds:>8.2f}s')
+    stats.update(cleaner.parse_stats)
+    print()
+    report_parse_stats(stats)
+
+
+if __name__ == '__main__':
+    main()
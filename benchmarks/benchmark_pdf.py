@@ -0,0 +1,70 @@
+'''
+Time serial and page-parallel DataExtractor.retrieve_pdf_data on a locally generated card details PDF.
+
+Needs reportlab to generate the PDF, pypdf for the parallel modes and pdfplumber for that backend.
+Run from the repository root:
+    python -m benchmarks.benchmark_pdf --pages 300 --workers 4
+'''
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from data_extraction import DataExtractor
+
+CARD_PROVIDERS = ['VISA 16 digit', 'JCB 16 digit', 'Diners Club / Carte Blanche', 'American Express', 'Maestro', 'Mastercard']
+
+
+def make_card_pdf(path:str, pages:int, rows_per_page:int = 40, seed:int = 0):
+    '''
+    Write a PDF with one card details table per page, repeating the header row on every page.
+
+    Parameters
+    ----------
+    path(str) : Path of the PDF to write
+    pages(int) : Number of pages
+    rows_per_page(int) : Number of card rows per page
+    seed(int) : Random seed
+
+    Returns
+    -------
+    None
+    '''
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import PageBreak, SimpleDocTemplate, Table, TableStyle
+    rng = np.random.default_rng(seed)
+    header = ['card_number', 'expiry_date', 'card_provider', 'date_payment_confirmed']
+    #ruled cells so both the tabula lattice detection and pdfplumber find the table
+    style = TableStyle([('GRID', (0, 0), (-1, -1), 0.5, 'black')])
+    story = []
+    for _ in range(pages):
+        rows = [[str(rng.integers(10**15, 10**16)), f'{rng.integers(1, 13):02d}/{rng.integers(22, 31)}',
+                 CARD_PROVIDERS[rng.integers(0, len(CARD_PROVIDERS))], f'20{rng.integers(10, 23)}-0{rng.integers(1, 10)}-1{rng.integers(0, 10)}']
+                for _ in range(rows_per_page)]
+        story += [Table([header] + rows, style=style), PageBreak()]
+    SimpleDocTemplate(path, pagesize=A4).build(story)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=300)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'card_details.pdf')
+        make_card_pdf(path, args.pages)
+        modes = [
+            ('tabula serial', dict(workers=1, backend='tabula')),
+            (f'tabula x{args.workers}', dict(workers=args.workers, backend='tabula')),
+            (f'pdfplumber x{args.workers}', dict(workers=args.workers, backend='pdfplumber')),
+        ]
+        for name, kwargs in modes:
+            start = time.perf_counter()
+            df = DataExtractor().retrieve_pdf_data(path, **kwargs)
+            elapsed = time.perf_counter() - start
+            print(f'{name:<18}{elapsed:>8.2f}s  {len(df)} rows  {args.pages / elapsed:8.1f} pages/s')
+
+
+if __name__ == '__main__':
+    main()
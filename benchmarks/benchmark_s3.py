@@ -0,0 +1,110 @@
+'''
+Time downloading the products CSV from S3 with one GET against parallel ranged GETs into memory.
+
+CSVs of each size are uploaded to a bucket, then downloaded with a single get_object and with
+DataExtractor.read_s3_object at several part sizes, which fetches byte ranges in parallel into one
+buffer. Every ranged read must give the same bytes as the single GET and extract_from_s3 the same
+table as parsing it, the script exits with status 1 when any differ. Without --endpoint-url a local moto server is started (needs the moto
+package), pass the URL of a MinIO server to measure real network transfers.
+
+Run from the repository root:
+    python -m benchmarks.benchmark_s3 --rows 10000,1000000
+    python -m benchmarks.benchmark_s3 --endpoint-url http://localhost:9000
+'''
+import argparse
+import contextlib
+import logging
+import os
+import sys
+import time
+import boto3
+import pandas as pd
+from data_extraction import DataExtractor
+from staging import PRODUCT_SCHEMA, to_staged_table
+from synthetic_data import SyntheticDataGenerator
+
+BUCKET = 'benchmark-products'
+
+
+@contextlib.contextmanager
+def s3_endpoint(endpoint_url:str = None):
+    '''
+    Yield the endpoint to benchmark against, starting a moto server on a free port when none is given.
+    '''
+    if endpoint_url:
+        yield endpoint_url
+        return
+    from moto.server import ThreadedMotoServer
+    #the server logs every request
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    for name in ['AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY']:
+        os.environ.setdefault(name, 'testing')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    server = ThreadedMotoServer(port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    try:
+        yield f'http://{host}:{port}'
+    finally:
+        server.stop()
+
+
+def single_get(s3, key:str):
+    '''
+    Read an object with one GET straight into pandas, as extract_from_s3 did before the ranged reads.
+    '''
+    response = s3.get_object(Bucket=BUCKET, Key=key)
+    df = pd.read_csv(response['Body'], index_col=[0])
+    df.index.name = 'index'
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='10000,1000000', help='Comma separated row counts of the uploaded CSVs')
+    parser.add_argument('--part-sizes', default='1,8,32', help='Comma separated part sizes in MiB')
+    parser.add_argument('--workers', type=int, default=10)
+    parser.add_argument('--endpoint-url', default=None, help='S3 compatible endpoint, a local moto server by default')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    part_sizes = [int(size) for size in args.part_sizes.split(',')]
+    failures = 0
+    with s3_endpoint(args.endpoint_url) as endpoint_url:
+        s3 = boto3.client('s3', endpoint_url=endpoint_url)
+        with contextlib.suppress(s3.exceptions.BucketAlreadyOwnedByYou):
+            s3.create_bucket(Bucket=BUCKET)
+        print(f"{'rows':>10}{'MiB':>8}  {'download':<24}{'seconds':>9}  equal")
+        for rows in [int(size) for size in args.rows.split(',')]:
+            key = f'products_{rows}.csv'
+            body = SyntheticDataGenerator(seed=args.seed).products(rows).to_csv().encode()
+            s3.put_object(Bucket=BUCKET, Key=key, Body=body)
+            megabytes = len(body) / 1024**2
+
+            start = time.perf_counter()
+            single = s3.get_object(Bucket=BUCKET, Key=key)['Body'].read()
+            seconds = time.perf_counter() - start
+            print(f'{rows:>10}{megabytes:>8.1f}  {"single GET":<24}{seconds:>8.2f}s  {"yes" if single == body else "NO"}')
+            failures += single != body
+            extractor = DataExtractor(max_workers=args.workers, s3_endpoint_url=endpoint_url)
+            for part_size in part_sizes:
+                start = time.perf_counter()
+                ranged = extractor.read_s3_object(BUCKET, key, part_size=part_size * 1024**2).getvalue()
+                seconds = time.perf_counter() - start
+                print(f'{rows:>10}{megabytes:>8.1f}  {f"ranged, {part_size} MiB parts":<24}{seconds:>8.2f}s  {"yes" if ranged == body else "NO"}')
+                failures += ranged != body
+            #the table extract_from_s3 returns must match parsing the single GET, in the staging schema types
+            expected = single_get(s3, key)
+            expected = to_staged_table(expected.reset_index(), PRODUCT_SCHEMA).to_pandas().set_index('index')
+            result = extractor.extract_from_s3(f's3://{BUCKET}/{key}', staging_path=None, part_size=min(part_sizes) * 1024**2)
+            try:
+                pd.testing.assert_frame_equal(result, expected)
+            except AssertionError as error:
+                failures += 1
+                print(f'extract_from_s3 table differs: {str(error).strip().splitlines()[0]}')
+            s3.delete_object(Bucket=BUCKET, Key=key)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+'''
+Compare the CSV handoff between stages with the Arrow IPC staging files: write + read time and file size.
+
+Run from the repository root:
+    python -m benchmarks.benchmark_staging --rows 1000000
+'''
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from staging import PRODUCT_SCHEMA, read_staging, write_staging
+
+
+def make_products(rows:int, seed:int = 0):
+    '''
+    Build a dataframe shaped like the raw products CSV.
+
+    Parameters
+    ----------
+    rows(int) : Number of rows to generate
+    seed(int) : Random seed
+
+    Returns
+    -------
+    df : Pandas Dataframe object
+    '''
+    rng = np.random.default_rng(seed)
+    def pick(values):
+        return np.array(values, dtype=object)[rng.integers(0, len(values), rows)]
+    return pd.DataFrame({
+        'index': np.arange(rows),
+        'product_name': pick(['FurReal Dazzlin Dimples My Dancin Pony', 'Tiffany Sparkle Rose Gold Hoop Earrings', 'Nintendo Switch Lite']),
+        'product_price': pick(['£39.99', '£12.50', '£199.00']),
+        'weight': pick(['1.6kg', '590g', '12 x 100g', '16oz', '77g .']),
+        'category': pick(['toys-and-games', 'sports-and-leisure', 'pets', 'homeware', 'diy']),
+        'EAN': rng.integers(10**12, 10**13, rows).astype(str),
+        'date_added': pick(['2005-12-02', '2006-01-09', '2018 October 22']),
+        'uuid': pick(['83dc0a69-f96f-4c34-bcb7-928acae19a94', '712254d7-aea7-4310-aff8-8bcdd0aec7ff']),
+        'removed': pick(['Still_avaliable', 'Removed']),
+        'product_code': pick(['R7-3126933h', 'C2-7287916l', 'S7-1175877v']),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    df = make_products(args.rows)
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, 'product_data.csv')
+        start = time.perf_counter()
+        df.set_index('index').to_csv(csv_path)
+        csv_write = time.perf_counter() - start
+        start = time.perf_counter()
+        pd.read_csv(csv_path, index_col=[0])
+        csv_read = time.perf_counter() - start
+
+        arrow_path = os.path.join(directory, 'product_data.arrow')
+        start = time.perf_counter()
+        write_staging(df, arrow_path, PRODUCT_SCHEMA)
+        arrow_write = time.perf_counter() - start
+        start = time.perf_counter()
+        read_staging(arrow_path, index_col='index')
+        arrow_read = time.perf_counter() - start
+
+        print(f"{'format':<8}{'write':>10}{'read':>10}{'size':>12}")
+        print(f"{'csv':<8}{csv_write:>9.2f}s{csv_read:>9.2f}s{os.path.getsize(csv_path) / 1024**2:>9.1f} MB")
+        print(f"{'arrow':<8}{arrow_write:>9.2f}s{arrow_read:>9.2f}s{os.path.getsize(arrow_path) / 1024**2:>9.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
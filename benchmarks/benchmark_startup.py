@@ -0,0 +1,53 @@
+'''
+Measure the cold start of each main.py subcommand, the time a new process takes to be ready to run the stage.
+
+For each stage a new interpreter imports main and loads the stage, importing the modules it is registered
+with, without running it. "--help" only imports main, and "every dependency" imports everything main
+imported at load before the stages were registered with their own imports. Each is run several times
+and the fastest and median wall times are printed with the heavy libraries the process loaded.
+
+Run from the repository root:
+    python -m benchmarks.benchmark_startup --repeat 5
+'''
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+import main as pipeline
+
+HEAVY_MODULES = ['pandas', 'sqlalchemy', 'pyarrow', 'requests', 'boto3', 'tabula']
+#main and data_extraction imported all of these at load before the stage registry
+EVERY_DEPENDENCY = 'import boto3, requests, tabula, data_cleaning, data_extraction, database_utils, extraction_cache, integrity, query_plans, sales_aggregates, star_schema'
+
+REPORT = f'import sys; print(",".join(module for module in {HEAVY_MODULES!r} if module in sys.modules))'
+
+
+def cold_start(code:str, repeat:int):
+    '''
+    Run code in new interpreters and return the wall time of each run and the heavy modules it loaded.
+    '''
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', f'{code}\n{REPORT}'], capture_output=True, text=True, check=True)
+        seconds.append(time.perf_counter() - start)
+    return seconds, result.stdout.strip().splitlines()[-1] if result.stdout.strip() else ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    commands = {'python (empty)': 'pass', '--help': 'import main; main.build_parser()'}
+    commands.update({name: f'import main; main.load_stage({name!r})' for name in pipeline.STAGE_REGISTRY})
+    commands['every dependency (before)'] = EVERY_DEPENDENCY
+    print(f"{'subcommand':<28}{'fastest':>9}{'median':>9}  loaded")
+    for name, code in commands.items():
+        seconds, loaded = cold_start(code, args.repeat)
+        print(f'{name:<28}{min(seconds):>8.2f}s{statistics.median(seconds):>8.2f}s  {loaded}')
+
+
+if __name__ == '__main__':
+    main()
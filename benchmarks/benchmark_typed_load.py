@@ -0,0 +1,114 @@
+'''
+Compare reaching the final star schema by loading then running legacy_star_schema_functions.sql against
+creating each table with its final types up front and copying straight into it.
+
+Both flows load the same synthetic star schema with COPY so only the schema work differs.
+Needs a local Postgres, the tables in the star schema are dropped and recreated.
+Run from the repository root:
+    python -m benchmarks.benchmark_typed_load local_db_creds.yaml --orders 120000
+'''
+import argparse
+import os
+import time
+import numpy as np
+from data_cleaning import DataCleaning
+from database_utils import DatabaseConnector
+from star_schema import STAR_SCHEMA
+from synthetic_data import SyntheticDataGenerator
+
+#table, DataCleaning method, rows per order
+DIMENSIONS = [
+    ('dim_users', 'clean_users', 0.1),
+    ('dim_card_details', 'clean_card_data', 0.1),
+    ('dim_store_details', 'clean_store_data', 0.004),
+    ('dim_products', 'clean_products_data', 0.015),
+    ('dim_date_times', 'clean_events_data', 1),
+]
+
+
+def make_star(orders:int, seed:int = 0):
+    '''
+    Clean synthetic tables and point every order at rows that exist in the dimension tables.
+
+    Parameters
+    ----------
+    orders(int) : Number of orders to generate
+    seed(int) : Random seed
+
+    Returns
+    -------
+    tables : dictionary of table name to cleaned Pandas Dataframe object, orders_table last
+    '''
+    generator = SyntheticDataGenerator(seed=seed)
+    rng = np.random.default_rng(seed)
+    tables = {}
+    for table, clean_method, ratio in DIMENSIONS:
+        key = STAR_SCHEMA[table]['primary_key']
+        df = getattr(DataCleaning(generator.table_for(clean_method, max(int(orders * ratio), 10))), clean_method)()
+        tables[table] = df.dropna(subset=[key]).drop_duplicates(subset=[key])
+    orders_df = DataCleaning(generator.table_for('clean_order_data', orders)).clean_order_data().reset_index()
+    for column, referenced in STAR_SCHEMA['orders_table']['foreign_keys'].items():
+        keys = tables[referenced][column].to_numpy()
+        orders_df[column] = keys[rng.integers(0, len(keys), len(orders_df))]
+    tables['orders_table'] = orders_df
+    return tables
+
+
+def drop_star(connector:DatabaseConnector):
+    '''
+    Drop every star schema table.
+    '''
+    with connector.begin() as connection:
+        for table in STAR_SCHEMA:
+            connection.exec_driver_sql(f'DROP TABLE IF EXISTS "{table}" CASCADE')
+
+
+def load_then_alter(connector:DatabaseConnector, tables:dict):
+    '''
+    The old flow, COPY into tables created from the dataframe dtypes then run legacy_star_schema_functions.sql.
+    '''
+    start = time.perf_counter()
+    for table, df in tables.items():
+        connector.bulk_upload_to_db(df, table)
+    loaded = time.perf_counter()
+    with open(os.path.join(os.path.dirname(__file__), 'legacy_star_schema_functions.sql')) as file:
+        statements = file.read()
+    with connector.begin() as connection:
+        connection.exec_driver_sql(statements)
+    return loaded - start, time.perf_counter() - loaded
+
+
+def typed_load(connector:DatabaseConnector, tables:dict):
+    '''
+    The typed flow, COPY into tables created with their final types then add the foreign keys.
+    '''
+    start = time.perf_counter()
+    for table, df in tables.items():
+        connector.typed_upload_to_db(df, table)
+    loaded = time.perf_counter()
+    connector.add_foreign_keys('orders_table')
+    return loaded - start, time.perf_counter() - loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('credentials', help='Path to the local database credentials yaml')
+    parser.add_argument('--orders', type=int, default=120000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    tables = make_star(args.orders, args.seed)
+    connector = DatabaseConnector(args.credentials)
+    results = {}
+    for name, flow in [('load then alter', load_then_alter), ('typed load', typed_load)]:
+        drop_star(connector)
+        results[name] = flow(connector, tables)
+    drop_star(connector)
+
+    print(f"{'flow':<18}{'load':>10}{'schema':>10}{'total':>10}")
+    for name, (load, schema) in results.items():
+        print(f'{name:<18}{load:>9.2f}s{schema:>9.2f}s{load + schema:>9.2f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+'''
+Compare DatabaseConnector.upload_to_db (to_sql) with bulk_upload_to_db (COPY + staging swap).
+
+Run from the repository root against a local Postgres:
+    python -m benchmarks.benchmark_upload local_db_creds.yaml --rows 1000000
+'''
+import argparse
+import time
+import uuid
+import numpy as np
+import pandas as pd
+from database_utils import DatabaseConnector
+
+
+def make_orders(rows:int, seed:int = 0):
+    '''
+    Build a dataframe shaped like the cleaned orders_table.
+
+    Parameters
+    ----------
+    rows(int) : Number of rows to generate
+    seed(int) : Random seed
+
+    Returns
+    -------
+    df : Pandas Dataframe object
+    '''
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'date_uuid': [str(uuid.UUID(int=int(i))) for i in rng.integers(0, 2**63, rows)],
+        'user_uuid': [str(uuid.UUID(int=int(i))) for i in rng.integers(0, 2**63, rows)],
+        'card_number': rng.integers(10**15, 10**16, rows).astype(str),
+        'store_code': pd.Series(rng.integers(0, 450, rows)).map(lambda i: f'WEB-{i:04d}'),
+        'product_code': pd.Series(rng.integers(0, 1850, rows)).map(lambda i: f'A{i}-{i % 97}'),
+        'product_quantity': rng.integers(1, 20, rows),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('credentials', help='Path to the local database credentials yaml')
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    connector = DatabaseConnector(args.credentials)
+    df = make_orders(args.rows)
+    results = {}
+    for name, upload in (('to_sql', connector.upload_to_db), ('copy', connector.bulk_upload_to_db)):
+        start = time.perf_counter()
+        upload(df=df, table='benchmark_orders')
+        results[name] = time.perf_counter() - start
+    with connector.engine.begin() as connection:
+        connection.exec_driver_sql('DROP TABLE IF EXISTS benchmark_orders')
+
+    for name, elapsed in results.items():
+        print(f'{name:>8}: {elapsed:8.2f}s  {args.rows / elapsed:12.0f} rows/s')
+    print(f'speedup: {results["to_sql"] / results["copy"]:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+'''
+Check the vectorised DataCleaning._convert_product_weights against the previous per-row apply
+implementation and time both on a synthetic weight column.
+
+Run from the repository root:
+    python -m benchmarks.benchmark_weights --rows 5000000
+'''
+import argparse
+import time
+import pandas as pd
+from data_cleaning import DataCleaning
+from tests.cleaning_reference import make_weights, reference_convert_product_weights
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5000000)
+    args = parser.parse_args()
+
+    df = make_weights(args.rows)
+
+    start = time.perf_counter()
+    expected = reference_convert_product_weights(df.copy())
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = DataCleaning(df.copy())._convert_product_weights()
+    vectorised_time = time.perf_counter() - start
+
+    pd.testing.assert_series_equal(result['weight'], expected['weight'], check_dtype=False)
+    print(f'rows: {args.rows}, outputs identical')
+    print(f'     apply: {reference_time:8.2f}s')
+    print(f'vectorised: {vectorised_time:8.2f}s')
+    print(f'   speedup: {reference_time / vectorised_time:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
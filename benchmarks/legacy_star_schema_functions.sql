@@ -1,3 +1,8 @@
+-- The schema script of the old flow, which loaded the cleaned tables with pandas' dtypes and then altered them.
+-- The pipeline now creates the tables with their final types, keys and derived columns before loading, see
+-- star_schema.py, so this script fails against them. It is only run by benchmark_typed_load.py, against tables
+-- it loads the old way.
+
 
 ALTER TABLE orders_table
 ALTER COLUMN date_uuid TYPE UUID
@@ -0,0 +1,63 @@
+'''
+Soak test that connection usage stays flat over many loads through DatabaseConnector.
+
+Runs repeated single-table and multi-table transactional loads against a local Postgres and prints
+the pool counts and the server-side connection count as it goes. Exits with status 1 if connections
+are left checked out or the server-side count grows beyond the pool limit.
+
+Run from the repository root:
+    python -m benchmarks.soak_connections local_db_creds.yaml --loads 500
+'''
+import argparse
+import sys
+import pandas as pd
+from database_utils import DatabaseConnector
+
+
+def server_connections(connector:DatabaseConnector):
+    '''
+    Number of connections the server has open to the connector's database.
+    '''
+    with connector.connect() as connection:
+        return connection.exec_driver_sql(
+            'SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()'
+        ).scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('credentials', help='Path to the local database credentials yaml')
+    parser.add_argument('--loads', type=int, default=500)
+    parser.add_argument('--report-every', type=int, default=50)
+    args = parser.parse_args()
+
+    df = pd.DataFrame({'id': range(100), 'value': ['x'] * 100})
+    limits = []
+    for load in range(1, args.loads + 1):
+        #a new connector per load, as each pipeline stage creates its own, must reuse the shared engine
+        connector = DatabaseConnector(args.credentials)
+        if load % 2:
+            connector.upload_to_db(df=df, table='soak_a')
+        else:
+            connector.upload_tables_to_db({'soak_a': df, 'soak_b': df})
+        if load % args.report_every == 0:
+            stats = connector.connection_stats()
+            server = server_connections(connector)
+            limits.append(server)
+            print(f'load {load}: {stats}, server connections {server}')
+
+    with connector.begin() as connection:
+        connection.exec_driver_sql('DROP TABLE IF EXISTS soak_a, soak_b')
+    stats = connector.connection_stats()
+    pool_limit = stats['pool_size'] + connector.engine.pool._max_overflow
+    if stats['checked_out'] != 0:
+        print(f"FAIL: {stats['checked_out']} connections still checked out")
+        sys.exit(1)
+    if max(limits, default=0) > limits[0] + pool_limit:
+        print(f'FAIL: server connections grew from {limits[0]} to {max(limits)}')
+        sys.exit(1)
+    print('connection usage stayed flat')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,80 @@
 import pandas as pd
 import numpy as np 
 import re
+from instrumentation import instrument_class
+from parsing import memoized, parse_dates, parse_numbers
 
+VALID_COUNTRIES = ['United Kingdom','Germany', 'United States' ]
+VALID_COUNTRY_CODES = ['GB','DE', 'US' ]
+VALID_CARD_PROVIDERS = ['VISA 16 digit','JCB 16 digit','VISA 13 digit','JCB 15 digit','VISA 19 digit','Diners Club / Carte Blanche','American Express','Maestro','Discover','Mastercard']
+VALID_REMOVED = ['Still_avaliable', 'Removed']
+VALID_TIME_PERIODS = ['Evening', 'Midday', 'Morning', 'Late_Hours']
+#Complex email regex pattern found: https://ihateregex.io/expr/email-2/
+EMAIL_PATTERN = r'(([^<>()\[\]\\.,;:\s@"]+(\.[^<>()\[\]\\.,;:\s@"]+)*)|(".+"))@((\[[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}])|(([a-zA-Z\-0-9]+\.)+[a-zA-Z]{2,}))'
+
+#Validation rules for each table. Each rule checks one column and can repair it first.
+#column : column name
+#rule : "isin", "match", "fullmatch", "not_match" or "max_length"
+#value : allowed values, regex pattern or maximum length for the rule
+#repair : optional {regex: replacement} applied to the column before it is checked
+USER_RULES = [
+    {'column': 'first_name', 'rule': 'not_match', 'value': r'^\d+$'},
+    {'column': 'last_name', 'rule': 'not_match', 'value': r'^\d+$'},
+    {'column': 'email_address', 'rule': 'match', 'value': EMAIL_PATTERN, 'repair': {'@@': '@'}},
+    {'column': 'country', 'rule': 'isin', 'value': VALID_COUNTRIES},
+    {'column': 'country_code', 'rule': 'isin', 'value': VALID_COUNTRY_CODES, 'repair': {'GG': 'G'}},
+]
+CARD_RULES = [
+    {'column': 'card_number', 'rule': 'max_length', 'value': 19, 'repair': {r'\?': ''}},
+    {'column': 'card_provider', 'rule': 'isin', 'value': VALID_CARD_PROVIDERS},
+    {'column': 'expiry_date', 'rule': 'fullmatch', 'value': r'[0-9]{2}(?:\/)[0-9]{2}'},
+]
+STORE_RULES = [
+    {'column': 'country_code', 'rule': 'isin', 'value': VALID_COUNTRY_CODES, 'repair': {'GG': 'G'}},
+]
+PRODUCT_RULES = [
+    {'column': 'removed', 'rule': 'isin', 'value': VALID_REMOVED},
+]
+EVENT_RULES = [
+    {'column': 'time_period', 'rule': 'isin', 'value': VALID_TIME_PERIODS},
+]
+#Closed vocabulary columns stored as categories in compact mode.
+#None infers the categories from the values present, which is skipped when cleaning in chunks
+#as each chunk would get its own categories and concatenating them falls back to object.
+COMPACT_CATEGORIES = {
+    'country': VALID_COUNTRIES,
+    'country_code': VALID_COUNTRY_CODES,
+    'card_provider': VALID_CARD_PROVIDERS,
+    'removed': VALID_REMOVED,
+    'time_period': VALID_TIME_PERIODS,
+    'continent': None,
+    'store_type': None,
+    'category': None,
+}
+
+#Execution backends for the clean methods, polars needs the optional polars package
+BACKENDS = ['pandas', 'polars']
+
+
+def report_rejections(rejected_rows:dict, rejected_total:int, rows:int):
+    '''
+    Print the number of rows failing each validation rule and in total.
+    
+    Parameters
+    ----------
+    rejected_rows(dict) : Number of rows failing each rule
+    rejected_total(int) : Number of rows failing any rule
+    rows(int) : Number of rows validated
+    
+    Returns 
+    -------
+    None
+    '''
+    for rule_name, rejected in rejected_rows.items():
+        print(f'{rule_name}: {rejected} rows rejected')
+    print(f'{rejected_total} of {rows} rows rejected in total')
+
+@instrument_class
 class DataCleaning:
     """
     A class to clean data.
@@ -11,11 +84,18 @@ class DataCleaning:
     Attributes
     ----------
     self.table : a pandas dataframe object
+    self.rejected_rows : Number of rows failing each validation rule in the last call to apply_rules
+    self.compact : Whether the clean methods convert the cleaned table to compact dtypes
+    self.infer_categories : Whether compact_dtypes also converts the columns with no fixed categories
+    self.backend : "pandas" or "polars", the library the clean methods run on
+    self.parse_stats : Rows, distinct values and time of each column parsed by its distinct values, printed by parsing.report_parse_stats
 
     Methods
     -------
 
     remove_nulls : Remove nulls from the whole table
+    apply_rules : Validate the table against a list of rules and filter it once
+    compact_dtypes : Convert closed vocabulary columns to categories and downcast integers
     clean_users : Clean the users table.
     clean_card_data : Clean the card details table
     clean_store_data : Clean the store details table
@@ -23,94 +103,147 @@ class DataCleaning:
     clean_order_data : Clean the orders table.
     clean_events_data : Clean the events table.
     """
-    def __init__(self, df):
+    def __init__(self, df, compact:bool = False, backend:str = 'pandas', infer_categories:bool = True):
+        if backend not in BACKENDS:
+            raise ValueError(f'Unknown cleaning backend: {backend}, expected one of {BACKENDS}')
         self.table = df
-        pass
+        self.rejected_rows = {}
+        self.compact = compact
+        self.infer_categories = infer_categories
+        self.backend = backend
+        self.parse_stats = {}
     
-    def remove_nulls(self):
+    def _parse(self, column:str, parser):
         '''
-        Remove nulls from the whole table
+        Parse a column by its distinct values, recording how many rows were served from the parsed distinct values in self.parse_stats.
+        
         Parameters
         ----------
-        none
+        column(str) : Column name
+        parser : parsing.parse_dates or parsing.parse_numbers
         
         Returns 
         -------
         self.table
         '''
-        self.table.replace('NULL', np.nan, inplace=True)
-        self.table.dropna(inplace=True, how='all')
+        self.table[column] = parser(self.table[column], column, self.parse_stats)
         return self.table
-               
-    def _validate_countries(self, country_column:str):
+    
+    def _clean_with_polars(self, clean_method:str):
         '''
-        Check countries are "United Kingdom", "Germany" or "United States".
+        Run a clean method with the Polars backend, see polars_cleaning.py.
         
         Parameters
         ----------
-        country_column(str) : column name
+        clean_method(str) : Name of the clean method, e.g. "clean_users"
         
         Returns 
         -------
         self.table
         '''
-        valid_countries = ['United Kingdom','Germany', 'United States' ]
-        self.table = self.table[self.table[country_column].isin(valid_countries)]
+        from polars_cleaning import clean_with_polars
+        self.table, self.rejected_rows = clean_with_polars(self.table, clean_method)
+        if self.compact:
+            self.compact_dtypes()
         return self.table
-        
-    def _validate_names(self, name_column:str):
+    
+    def remove_nulls(self):
         '''
-        Check the characters in a name column are not numeric.
-        
+        Remove nulls from the whole table
         Parameters
         ----------
-        name_column(str) : column name
+        none
         
         Returns 
         -------
         self.table
         '''
-        digit_match = r'^\d+$'
-        first_name_filter = self.table[name_column].str.match(digit_match)
-        self.table = self.table[~first_name_filter]
+        self.table.replace('NULL', np.nan, inplace=True)
+        self.table.dropna(inplace=True, how='all')
         return self.table
+               
+    def _check_rule(self, rule:dict):
+        '''
+        Repair a column if the rule has a repair step then check each row against the rule.
         
-    def _validate_emails(self, email_column:str):
+        Parameters
+        ----------
+        rule(dict) : a validation rule, see USER_RULES
+        
+        Returns 
+        -------
+        passed : numpy boolean array, True where the row passes the rule. Nulls fail.
+        '''
+        column = rule['column']
+        for pattern, replacement in rule.get('repair', {}).items():
+            self.table[column] = self.table[column].str.replace(pattern, replacement, regex=True)
+        values = self.table[column]
+        if rule['rule'] == 'isin':
+            passed = values.isin(rule['value'])
+        elif rule['rule'] == 'match':
+            passed = values.str.match(rule['value'])
+        elif rule['rule'] == 'fullmatch':
+            passed = values.str.fullmatch(rule['value'])
+        elif rule['rule'] == 'not_match':
+            passed = ~values.str.match(rule['value'])
+        elif rule['rule'] == 'max_length':
+            passed = values.str.len() <= rule['value']
+        else:
+            raise ValueError(f"Unknown validation rule: {rule['rule']}")
+        return passed.fillna(False).to_numpy(dtype=bool)
+    
+    def apply_rules(self, rules:list[dict]):
         '''
-        Replace and double "@@" with a singular one then regex match the email to check its valid.
+        Validate the table against a list of rules.
+        All rules are evaluated into one combined mask and the table is filtered once.
+        The number of rows failing each rule is stored in self.rejected_rows and printed.
         
         Parameters
         ----------
-        email_column(str) : column name
+        rules(list[dict]) : validation rules, see USER_RULES
         
         Returns 
         -------
         self.table
         '''
-        self.table[email_column].replace(to_replace = '@@', value = '@',regex=True, inplace=True)
-        #Complex email regex pattern found: https://ihateregex.io/expr/email-2/
-        email_pattern = r'(([^<>()\[\]\\.,;:\s@"]+(\.[^<>()\[\]\\.,;:\s@"]+)*)|(".+"))@((\[[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}])|(([a-zA-Z\-0-9]+\.)+[a-zA-Z]{2,}))'
-        filter = self.table[email_column].str.match(email_pattern)
-        self.table = self.table[filter]
+        keep = np.ones(len(self.table), dtype=bool)
+        self.rejected_rows = {}
+        for rule in rules:
+            passed = self._check_rule(rule)
+            self.rejected_rows[f"{rule['column']} {rule['rule']}"] = int((~passed).sum())
+            keep &= passed
+        
+        report_rejections(self.rejected_rows, int((~keep).sum()), len(keep))
+        
+        #an explicit copy so later assignments into the table never write to, or warn about, a slice of the unfiltered table
+        self.table = self.table[keep].copy()
         return self.table
     
-    def _validate_country_code(self, country_code_column:str):
+    def compact_dtypes(self):
         '''
-        Check countries are "UK", "DE" or "US".
+        Convert the closed vocabulary columns in COMPACT_CATEGORIES to category dtypes and downcast integer columns.
+        Columns with no fixed categories are left as they are unless self.infer_categories is set.
+        Prints the memory used by the table before and after.
         
         Parameters
         ----------
-        country_code_column(str) : column name
+        None
         
         Returns 
         -------
         self.table
         '''
-        self.table[country_code_column].replace(to_replace = 'GG', value = 'G',regex=True, inplace=True)
-        valid_country_codes = ['GB','DE', 'US' ]
-        self.table = self.table[self.table[country_code_column].isin(valid_country_codes)]
+        memory_before = self.table.memory_usage(deep=True).sum()
+        self.table = self.table.copy()
+        for column, categories in COMPACT_CATEGORIES.items():
+            if column in self.table.columns and (categories is not None or self.infer_categories):
+                self.table[column] = self.table[column].astype(pd.CategoricalDtype(categories))
+        for column in self.table.select_dtypes(include='integer').columns:
+            self.table[column] = pd.to_numeric(self.table[column], downcast='integer')
+        memory_after = self.table.memory_usage(deep=True).sum()
+        print(f'memory {memory_before / 1024**2:.2f} MB -> {memory_after / 1024**2:.2f} MB ({memory_before / max(memory_after, 1):.1f}x smaller)')
         return self.table
-        
+    
     def _validate_address(self,address_column:str):
         '''
         Replace "/n" with a space in address column.
@@ -145,94 +278,34 @@ class DataCleaning:
         -------
         self.table
         '''
+        if self.backend == 'polars':
+            return self._clean_with_polars('clean_users')
         #set correct data types
         self.table.set_index('index', inplace=True)
         self.table['first_name'] = self.table['first_name'].astype('string')
         self.table['last_name'] = self.table['last_name'].astype('string')
-        self.table['date_of_birth'] = pd.to_datetime(self.table['date_of_birth'], infer_datetime_format=True, errors='coerce')
+        self._parse('date_of_birth', parse_dates)
         self.table['company'] = self.table['company'].astype('string')
         self.table['email_address'] = self.table['email_address'].astype('string')
         self.table['address'] = self.table['address'].astype('string')
         self.table['country'] = self.table['country'].astype('string')
         self.table['country_code'] = self.table['country_code'].astype('string')
         self.table['phone_number'] = self.table['phone_number'].astype('string')
-        self.table['join_date'] = pd.to_datetime(self.table['join_date'], infer_datetime_format=True, errors='coerce')
-        
-        #validate names
-        self._validate_names(name_column='first_name')
-        self._validate_names(name_column='last_name')
-        
-        #validate emails
-        self._validate_emails(email_column='email_address')
+        self._parse('join_date', parse_dates)
         
         #validate address
         self._validate_address(address_column='address')
         
-        #validate countries
-        self._validate_countries(country_column = 'country')
-        
-        #validate country code
-        self._validate_country_code(country_code_column='country_code')
+        #validate names, emails, countries and country codes
+        self.apply_rules(USER_RULES)
         
         #remove nulls
         self.remove_nulls()
         
+        if self.compact:
+            self.compact_dtypes()
         return self.table
     
-    def _validate_card_providers(self, card_provider_column : str):
-        '''
-        Checks the cards in card providers are in the list of top card providers.
-        
-        Parameters
-        ----------
-        card_provider_column(str) : column name
-        
-        Returns 
-        -------
-        self.table
-        '''
-        #validate card companies
-        valid_card_companies = ['VISA 16 digit','JCB 16 digit','VISA 13 digit','JCB 15 digit','VISA 19 digit','Diners Club / Carte Blanche','American Express','Maestro','Discover','Mastercard']
-        self.table = self.table[self.table[card_provider_column].isin(valid_card_companies)]
-        return self.table
-    
-    def _validate_expiry_dates(self, expiry_date_column: str):
-        '''
-        Checks the expiry dates against a regex.
-        
-        Parameters
-        ----------
-        expiry_date_column(str) : column name
-        
-        Returns 
-        -------
-        self.table
-        '''
-        correct_pattern = r'[0-9]{2}(?:\/)[0-9]{2}'
-        filter = self.table[expiry_date_column].str.fullmatch(correct_pattern)
-        self.table = self.table[filter]
-        return self.table
-    
-    def _validate_card_numbers(self, card_number_column:str):
-        '''
-        Removes ? from rows
-        Drops any row when the card number is not numeric.
-        Drops any value longer than 19 chars long
-        
-        Parameters
-        ----------
-        card_number_column(str) : column name
-        
-        Returns 
-        -------
-        self.table
-        '''
-        self.table[card_number_column] = self.table[card_number_column].str.replace('?','')
-        self.table.drop(self.table[pd.to_numeric(self.table[card_number_column], errors='coerce').notna()].index)
-        mask = self.table[card_number_column].str.len() > 19
-        self.table = self.table[~mask]
-        return self.table
-        
     def clean_card_data(self):
         '''
         Clean the card details table
@@ -250,6 +323,8 @@ class DataCleaning:
         -------
         self.table
         '''
+        if self.backend == 'polars':
+            return self._clean_with_polars('clean_card_data')
         
         self.remove_nulls()
         
@@ -257,17 +332,13 @@ class DataCleaning:
         self.table['card_number'] = self.table['card_number'].astype('string')
         self.table['card_provider'] = self.table['card_provider'].astype('string')
         self.table['expiry_date'] = self.table['expiry_date'].astype('string')
-        self.table['date_payment_confirmed'] = pd.to_datetime(self.table['date_payment_confirmed'], errors='coerce')
-        
-        #validate card numbers
-        self._validate_card_numbers(card_number_column='card_number')
+        self._parse('date_payment_confirmed', parse_dates)
         
-        #validate card companies
-        self._validate_card_providers(card_provider_column='card_provider')
-        
-        #validate expiry dates
-        self._validate_expiry_dates(expiry_date_column='expiry_date')
+        #validate card numbers, card companies and expiry dates
+        self.apply_rules(CARD_RULES)
         
+        if self.compact:
+            self.compact_dtypes()
         return self.table
     
     def _validate_continent(self, continent_column:str):
@@ -327,8 +398,8 @@ class DataCleaning:
         self.table
         '''
         self.table[staff_number_columnn] = self.table[staff_number_columnn].astype(str)
-        self.table[staff_number_columnn] = self.table[staff_number_columnn].fillna('').astype(str)
-        self.table[staff_number_columnn] = self.table[staff_number_columnn].apply(self._get_digits)
+        #strip each distinct value once
+        self.table[staff_number_columnn] = memoized(self.table[staff_number_columnn], lambda values, record: values.map(self._get_digits), f'{staff_number_columnn} digits', self.parse_stats)
         
         return self.table
 
@@ -353,24 +424,26 @@ class DataCleaning:
         -------
         self.table
         '''
+        if self.backend == 'polars':
+            return self._clean_with_polars('clean_store_data')
         #drop the lat column
         self.table = self.table.drop(columns=['lat'])
         #clean staff numbers
         self._clean_staff_numbers('staff_numbers')
         #correct data types
         self.table['address'] = self.table['address'].astype('string')
-        self.table['longitude'] = pd.to_numeric(self.table['longitude'], errors='coerce')
+        self._parse('longitude', parse_numbers)
         self.table['locality'] = self.table['locality'].astype('string')
         self.table['store_code'] = self.table['store_code'].astype('string')
-        self.table['staff_numbers'] = pd.to_numeric(self.table['staff_numbers'], errors='coerce')
-        self.table['opening_date'] = pd.to_datetime(self.table['opening_date'], infer_datetime_format=True, errors='coerce')
+        self._parse('staff_numbers', parse_numbers)
+        self._parse('opening_date', parse_dates)
         self.table['store_type'] = self.table['store_type'].astype('string')
-        self.table['latitude'] = pd.to_numeric(self.table['latitude'], errors='coerce')
+        self._parse('latitude', parse_numbers)
         self.table['country_code'] = self.table['country_code'].astype('string')
         self.table['continent'] = self.table['continent'].astype('string')
         
         #validata country code
-        self._validate_country_code('country_code')
+        self.apply_rules(STORE_RULES)
         #clean continent table
         self._validate_continent(continent_column='continent')
         #validate address
@@ -380,46 +453,44 @@ class DataCleaning:
         self._replace_nulls_if_web()
         #drop null values
         self.remove_nulls()
+        if self.compact:
+            self.compact_dtypes()
         return self.table
     
-    def _split_weight_units(self, x):
-        '''Function to split the weights column into the units and the values.
-        Null values are returned as numpy nulls.
-        Other values are split accordingly
+    def _weights_in_kg(self, weights, record:dict = None):
+        '''
+        Parse weights into values and units in one vectorised pass then convert all values into kg.
+        Handles "kg", "g", "ml" and "oz" units, weights with a trailing " ." and multipacks such as "12 x 100g".
         
         Parameters
         ----------
-        product_price_column(str) : column name
+        weights : Pandas Series of weight strings
+        record(dict) : Parse record, unused
         
         Returns 
         -------
-        np.nan, np.nan
-        or
-        weight , unit 
-        '''
-        try:
-            if pd.isna(x): 
-                return np.nan, np.nan
-
-            if x[-2:] in ('kg', 'ml', 'oz'):
-                unit = x[:-2]
-                weight = x[-2:]
-            elif x[-2:] == ' .':
-                unit = x[:-4]
-                weight = x[-4:-2]
-            elif x[-1:] == 'g':
-                unit = x[:-1]
-                weight = x[-1:]
-            else:
-                return np.nan, np.nan
-
-            return unit, weight
-        except TypeError:
-            return np.nan, np.nan
+        kilograms : numpy array of the weights in kg
+        '''
+        weights = weights.astype('string')
+        #split the weights and the units, the alternatives are tried in order: kg/ml/oz, a trailing " ." then g
+        weight_pattern = r'(?s)^(?:(?P<value>.*)(?P<unit>kg|ml|oz)|(?P<dot_value>.*)(?P<dot_unit>.{2}) \.|(?P<g_value>.*)(?P<g_unit>g))$'
+        parts = weights.str.extract(weight_pattern)
+        values = parts['value'].fillna(parts['dot_value']).fillna(parts['g_value'])
+        units = parts['unit'].fillna(parts['dot_unit']).fillna(parts['g_unit'])
+        
+        #Find weights with multiplications in and take the product of them
+        multipack = values.str.extract(r'^(\d+) x (\d+)')
+        is_multipack = multipack[0].notna()
+        kilograms = values.mask(is_multipack).astype('float')
+        kilograms.loc[is_multipack] = multipack.loc[is_multipack].astype(int).prod(axis=1) / 100
+        
+        #convert all to Kg
+        divisors = units.map({'g': 1000, 'ml': 1000, 'oz': 35.274}).astype('float').fillna(1)
+        return (kilograms / divisors).to_numpy()
     
     def _convert_product_weights(self):
         '''
-        Function to take the weight column and split it then convert all values into kg then drop the added columns
+        Convert the weights column into kg, parsing each distinct weight once as the catalogue repeats a small set of weights across many rows.
         
         Parameters
         ----------
@@ -435,23 +506,7 @@ class DataCleaning:
         #drop null values
         self.remove_nulls()
         
-        #create a tuple of the weights and the units
-        self.table['weights_tuple'] = self.table['weight'].apply(self._split_weight_units)
-        self.table['weights'] = self.table['weights_tuple'].str[0]
-        self.table['unit'] = self.table['weights_tuple'].str[1]
-        
-        #Find weights with multiplications in and convert to kg
-        self.table.loc[self.table['weights'].str.match(r'\d+ x \d+', na=False), 'weights'] = (self.table.loc[self.table['weights'].str.match(r'\d+ x \d+', na=False), 'weights'].str.extract(r'(\d+) x (\d+)').astype(int).prod(axis=1)) / 100
-        
-        #convert all to floats and then convert to Kg
-        self.table['weights'] = self.table['weights'].astype('float')
-        self.table.loc[self.table['unit'] == 'g', 'weights'] /= 1000
-        self.table.loc[self.table['unit'] == 'ml', 'weights'] /= 1000
-        self.table.loc[self.table['unit'] == 'oz', 'weights'] /= 35.274
-        
-        #replace the original weight column with the clean one and remove new columns
-        self.table['weight'] = self.table['weights']
-        self.table.drop(columns=['weights', 'unit', 'weights_tuple'], inplace=True)
+        self.table['weight'] = memoized(self.table['weight'], self._weights_in_kg, 'weight', self.parse_stats)
         
         return self.table
     
@@ -466,26 +521,11 @@ class DataCleaning:
         Returns 
         -------
         self.table'''
-        self.table[product_price_column] = self.table[product_price_column].str.replace('£', '').str.replace(',', '').str.replace('$', '')
-        self.table[product_price_column] = pd.to_numeric(self.table[product_price_column], errors='coerce')
+        def parse_prices(values, record):
+            return pd.to_numeric(values.str.replace('£', '').str.replace(',', '').str.replace('$', ''), errors='coerce')
+        self.table[product_price_column] = memoized(self.table[product_price_column], parse_prices, product_price_column, self.parse_stats)
         return self.table
     
-    def _validate_removed(self, removed_column_name: str):
-        '''
-        Checks the values in the removed column are either removed or still_avaliable.
-        
-        Parameters
-        ----------
-        removed_column_name(str) : column name
-        
-        Returns 
-        -------
-        self.table
-        '''
-        
-        valid_values = ['Still_avaliable', 'Removed']
-        self.table = self.table[self.table[removed_column_name].isin(valid_values)]
-    
     def clean_products_data(self):
         '''Clean the product details table.
         Set correct data types for products table.
@@ -500,6 +540,8 @@ class DataCleaning:
         Returns 
         -------
         self.table'''
+        if self.backend == 'polars':
+            return self._clean_with_polars('clean_products_data')
         
         #drop null values
         self.remove_nulls()
@@ -507,14 +549,14 @@ class DataCleaning:
         #correct data types
         self.table['product_name'] = self.table['product_name'].astype('string')
         self.table['category'] = self.table['category'].astype('string')
-        self.table['date_added'] = pd.to_datetime(self.table['date_added'], infer_datetime_format=True, errors='coerce')
+        self._parse('date_added', parse_dates)
         self.table['EAN'] = self.table['EAN'].astype('string')
         self.table['uuid'] = self.table['uuid'].astype('string')
         self.table['removed'] = self.table['removed'].astype('string')
         self.table['product_code'] = self.table['product_code'].astype('string')
         
         #Validate removed column
-        self._validate_removed('removed')
+        self.apply_rules(PRODUCT_RULES)
                 
         #Convert and correct the weights column
         self._convert_product_weights()
@@ -524,6 +566,8 @@ class DataCleaning:
         
         
         
+        if self.compact:
+            self.compact_dtypes()
         return self.table
 
     def clean_order_data(self):
@@ -537,8 +581,12 @@ class DataCleaning:
         Returns 
         -------
         self.table'''
+        if self.backend == 'polars':
+            return self._clean_with_polars('clean_order_data')
         self.table.set_index('index', inplace=True)
         self.table.drop(columns=['first_name', 'last_name', '1', 'level_0'], inplace=True)
+        if self.compact:
+            self.compact_dtypes()
         return self.table
         
     def clean_events_data(self):
@@ -552,6 +600,30 @@ class DataCleaning:
         Returns 
         -------
         self.table'''
-        valid_time_periods = ['Evening', 'Midday', 'Morning', 'Late_Hours']
-        self.table = self.table[self.table['time_period'].isin(valid_time_periods)]
+        if self.backend == 'polars':
+            return self._clean_with_polars('clean_events_data')
+        self.apply_rules(EVENT_RULES)
+        if self.compact:
+            self.compact_dtypes()
         return self.table
+
+
+def clean_in_chunks(chunks, clean_method: str, compact: bool = False, backend: str = 'pandas'):
+    '''
+    Run one of the DataCleaning clean methods over each chunk of a table in turn.
+    Only one chunk is cleaned at a time so memory is proportional to the chunk size.
+    In compact mode only the columns with fixed categories are converted, so every chunk has the same dtypes.
+    
+    Parameters
+    ----------
+    chunks : Iterable of Pandas Dataframe objects
+    clean_method(str) : Name of the DataCleaning method to run, e.g. "clean_order_data"
+    compact(bool) : Convert each cleaned chunk to compact dtypes
+    backend(str) : "pandas" or "polars"
+    
+    Yields 
+    -------
+    Cleaned Pandas Dataframe object for each chunk
+    '''
+    for chunk in chunks:
+        yield getattr(DataCleaning(chunk, compact=compact, backend=backend, infer_categories=False), clean_method)()
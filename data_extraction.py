@@ -1,35 +1,277 @@
 from database_utils import DatabaseConnector
-from botocore.exceptions import  ClientError
+from extraction_cache import ExtractionCache
+from instrumentation import instrument_class
+from json_stream import read_column_json
+from staging import PRODUCT_SCHEMA, STORE_SCHEMA, read_staging, to_staged_table, write_staging
+from sqlalchemy import text
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-import boto3
+import io
+import tempfile
+import threading
+import time
 import pandas as pd
-import tabula
-import requests
+#tabula, boto3 and requests are imported where they are used, so a stage only loads the libraries of its own source
 
 
+def _read_pdf_pages(path_to_pdf: str, pages: list[int], backend: str):
+    '''
+    Read the tables on a range of PDF pages, run in a worker process.
+    With tabula each call starts its own JVM subprocess, as jpype is not a requirement, so every page range
+    pays the JVM start up. Larger page ranges start fewer JVMs.
+    
+    Parameters
+    ----------
+    path_to_pdf(str) : Local path of the PDF
+    pages(list[int]) : 1-based page numbers to read
+    backend(str) : "tabula" or the pure Python "pdfplumber"
+    
+    Returns 
+    -------
+    tables : List of Pandas Dataframe objects in page order
+    '''
+    if backend == 'tabula':
+        import tabula
+        return tabula.read_pdf(path_to_pdf, pages=pages)
+    if backend == 'pdfplumber':
+        import pdfplumber
+        tables = []
+        with pdfplumber.open(path_to_pdf) as pdf:
+            for page_number in pages:
+                table = pdf.pages[page_number - 1].extract_table()
+                if table:
+                    tables.append(pd.DataFrame(table[1:], columns=table[0]))
+        return tables
+    raise ValueError(f'Unknown PDF backend: {backend}')
+
+
+def _align_pdf_headers(tables: list):
+    '''
+    Give every page table the column headers of the first table.
+    Pages without a header row have their first row read as the header, so it is put back as a data row.
+    
+    Parameters
+    ----------
+    tables(list) : List of Pandas Dataframe objects in page order
+    
+    Returns 
+    -------
+    tables : List of Pandas Dataframe objects with the same columns
+    '''
+    if not tables:
+        return tables
+    columns = list(tables[0].columns)
+    aligned = [tables[0]]
+    for table in tables[1:]:
+        if list(table.columns) != columns and len(table.columns) == len(columns):
+            header_row = pd.DataFrame([list(table.columns)], columns=columns)
+            table = pd.concat([header_row, table.set_axis(columns, axis=1)], ignore_index=True)
+        aligned.append(table)
+    return aligned
+
+
+class _TokenBucket:
+    '''
+    Thread safe token bucket used to rate limit calls to the stores API.
+    
+    Parameters
+    ----------
+    rate(float) : Number of tokens added per second
+    capacity(int) : Maximum number of tokens that can be held, allowing short bursts
+    '''
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        '''
+        Block until a token is available and then take it.
+        
+        Parameters
+        ----------
+        None
+        
+        Returns 
+        -------
+        None
+        '''
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+@instrument_class
 class DataExtractor:
     """
     A Class to extract data from various sources
     
     Attributes
     ----------
-    None
+    self.session : Shared keep-alive requests session with retries on 429/5xx responses, created on first use
+    self.max_workers : Maximum number of concurrent API requests
+    self.rate_limiter : Token bucket limiting the number of API requests per second
+    self.cache : Optional ExtractionCache used for the PDF, JSON and store API sources
+    self.s3_endpoint_url : Optional S3 endpoint, e.g. a local MinIO or moto server, None for AWS
     
     Methods
     -------
     read_rds_table : Extract data from an Amazon RDS table
+    read_rds_table_in_chunks : Stream data from an Amazon RDS table in fixed size chunks
+    read_rds_table_since : Extract only the rows of an Amazon RDS table above a watermark
+    read_rds_max_value : Get the maximum value of a column in an Amazon RDS table
     retrieve_pdf_data : Extract data from a PDF
     list_number_of_stores : List the number of stores from the "Retrieve a store" API
-    retrieve_stores_data_to_csv : Pull each of the stores data by calling the "Return the number of stores" Api once per store and appending to a csv stored in folder where this function is run
+    retrieve_stores_data : Pull each of the stores data concurrently from the "Return a store" Api into a dataframe
+    retrieve_stores_data_to_csv : Pull each of the stores data and write it once to a csv stored in folder where this function is run
+    retrieve_stores_data_to_staging : Pull each of the stores data and stage it as an Arrow IPC file in folder where this function is run
     get_column_headers : Get the column headers from stores api
-    extract_from_s3 : Extract product_data.csv file from an s3 bucket. Creates a file of the same name in the directory this function is run in to store the data
+    read_s3_object : Read an S3 object into memory with parallel byte range GETs
+    extract_from_s3 : Extract the product CSV file from an s3 bucket into memory and optionally stage it as product_data.arrow
+    extract_from_staging : Extract data from an Arrow staging file written by an earlier stage.
     extract_from_csv : Extract data from a CSV file.
     extract_json_from_s3 : Extract JSON data from an AWS S3 bucket.
+    stream_json_from_s3 : Decode column oriented JSON from an AWS S3 bucket as it downloads and yield it in fixed size chunks
     
     """
     
-    def __init__(self):
-        pass
+    def __init__(self, max_workers: int = 10, requests_per_second: float = 20, max_retries: int = 5, backoff_factor: float = 0.5, cache: ExtractionCache = None, s3_endpoint_url: str = None):
+        '''
+        Initialises the shared API session and rate limiter
+        Parameters
+        ----------
+        max_workers(int) : Maximum number of concurrent API requests
+        requests_per_second(float) : Maximum number of API requests per second
+        max_retries(int) : Number of retries on 429 and 5xx responses
+        backoff_factor(float) : Exponential backoff factor between retries in seconds
+        cache(ExtractionCache) : Cache for parsed sources, None to always extract
+        s3_endpoint_url(str) : S3 endpoint to use instead of AWS, e.g. http://localhost:9000 for MinIO
+        '''
+        self.max_workers = max_workers
+        self.cache = cache
+        self.s3_endpoint_url = s3_endpoint_url
+        self._s3_client = None
+        self._s3_lock = threading.Lock()
+        self.rate_limiter = _TokenBucket(rate=requests_per_second, capacity=max_workers)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self._session = None
+        self._session_lock = threading.Lock()
+    
+    @property
+    def session(self):
+        '''
+        The requests session, created on first use so extracting from a database never imports requests.
+        '''
+        with self._session_lock:
+            if self._session is None:
+                self._session = self._init_session(max_retries=self.max_retries, backoff_factor=self.backoff_factor)
+        return self._session
+    
+    def _init_session(self, max_retries: int, backoff_factor: float):
+        '''
+        Create a requests session that keeps connections alive and retries with exponential backoff on 429 and 5xx responses.
+        Every retry takes a token from the rate limiter after its backoff, so retries count towards the request rate too.
+        Parameters
+        ----------
+        max_retries(int) : Number of retries
+        backoff_factor(float) : Exponential backoff factor in seconds
+        
+        Returns 
+        -------
+        session : requests Session object
+        '''
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        rate_limiter = self.rate_limiter
+        class RateLimitedRetry(Retry):
+            def sleep(self, response=None):
+                super().sleep(response)
+                rate_limiter.acquire()
+        retry = RateLimitedRetry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=['GET'],
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers, max_retries=retry)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+    
+    def _get(self, url: str, header_dict: dict[str, str]):
+        '''
+        Rate limited GET request through the shared session
+        Parameters
+        ----------
+        url(str) : The url to request
+        header_dict(dict[str, str]) : The dictionary of headers to be send to the API
+        
+        Returns 
+        -------
+        response : requests Response object
+        '''
+        self.rate_limiter.acquire()
+        return self.session.get(url, headers=header_dict, timeout=30)
+    
+    def _source_fingerprint(self, source: str):
+        '''
+        Cheaply fingerprint a source without downloading it.
+        URLs use the ETag or Last-Modified header from a HEAD request, local files are hashed.
+        
+        Parameters
+        ----------
+        source(str) : URL or path of the source
+        
+        Returns 
+        -------
+        fingerprint : String fingerprint or None if the source has no usable metadata
+        '''
+        if source.startswith(('http://', 'https://')):
+            response = self.session.head(source, timeout=30, allow_redirects=True)
+            if response.status_code != 200:
+                return None
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            return etag or last_modified
+        if Path(source).is_file():
+            return self.cache.file_fingerprint(source)
+        return None
+    
+    def _cached(self, source: str, fingerprint: str, load):
+        '''
+        Return the cached dataframe for a source and fingerprint, or load it and cache the result.
+        
+        Parameters
+        ----------
+        source(str) : URL or path of the source
+        fingerprint(str) : Fingerprint of the source content
+        load : Function with no arguments that extracts the dataframe
+        
+        Returns 
+        -------
+        df : Pandas Dataframe object
+        '''
+        if self.cache is None:
+            return load()
+        df = self.cache.get(source, fingerprint)
+        if df is None:
+            df = load()
+            self.cache.put(source, fingerprint, df)
+        return df
     
     def read_rds_table(self, db_connector : DatabaseConnector, table_name: str):
         '''
@@ -46,19 +288,121 @@ class DataExtractor:
         df = pd.read_sql_table(table_name, db_connector.engine)
         return df
     
-    def retrieve_pdf_data(self, path_to_pdf: str):
+    def read_rds_table_in_chunks(self, db_connector : DatabaseConnector, table_name: str, chunksize: int = 50000):
+        '''
+        Stream data from an Amazon RDS table in fixed size chunks.
+        Uses a server side cursor so only one chunk is held in memory at a time.
+        
+        Parameters
+        ----------
+        db_connector : a DatabaseConnector object
+        table_name(str) : the name of the table to pull from
+        chunksize(int) : the number of rows per chunk
+        
+        Yields 
+        -------
+        df : Pandas Dataframe object of at most chunksize rows
+        '''
+        with db_connector.engine.connect().execution_options(stream_results=True) as connection:
+            for df in pd.read_sql_table(table_name, connection, chunksize=chunksize):
+                yield df
+    
+    def read_rds_table_since(self, db_connector : DatabaseConnector, table_name: str, watermark_column: str, watermark):
+        '''
+        Extract only the rows of an Amazon RDS table whose watermark column is greater than the watermark
+        
+        Parameters
+        ----------
+        db_connector : a DatabaseConnector object
+        table_name(str) : the name of the table to pull from
+        watermark_column(str) : the column to compare against the watermark, e.g. "index"
+        watermark : the highest value already loaded
+        
+        Returns 
+        -------
+        df : Pandas Dataframe object ordered by the watermark column
+        '''
+        query = text(f'SELECT * FROM "{table_name}" WHERE "{watermark_column}" > :watermark ORDER BY "{watermark_column}"')
+        df = pd.read_sql_query(query, db_connector.engine, params={'watermark': watermark})
+        return df
+    
+    def read_rds_max_value(self, db_connector : DatabaseConnector, table_name: str, column: str):
+        '''
+        Get the maximum value of a column in an Amazon RDS table
+        
+        Parameters
+        ----------
+        db_connector : a DatabaseConnector object
+        table_name(str) : the name of the table
+        column(str) : the column name
+        
+        Returns 
+        -------
+        The maximum value of the column
+        '''
+        with db_connector.engine.connect() as connection:
+            return connection.execute(text(f'SELECT MAX("{column}") FROM "{table_name}"')).scalar()
+    
+    def retrieve_pdf_data(self, path_to_pdf: str, workers: int = 1, backend: str = 'tabula', pages_per_task: int = 10):
         '''
         Extract data from a PDF
+        With more than one worker the pages are split into ranges read in parallel by a process pool.
+        With tabula every range starts a new JVM, so the ranges only come out ahead when the pages take
+        longer to read than the JVM takes to start, raise pages_per_task to start fewer.
+        
         Parameters
         ----------
         path_to_pdf(str) : Path or URL of the PDF
+        workers(int) : Number of worker processes, 1 reads all pages in this process
+        backend(str) : "tabula" or the pure Python "pdfplumber"
+        pages_per_task(int) : Number of pages read by a worker per task
         
         Returns 
         -------
         df : Pandas Dataframe object
         '''
-        tables = tabula.read_pdf(path_to_pdf, pages='all')
-        df = pd.concat(tables)
+        def load():
+            if workers == 1 and backend == 'tabula':
+                import tabula
+                tables = tabula.read_pdf(path_to_pdf, pages='all')
+                return pd.concat(tables)
+            return self._read_pdf_parallel(path_to_pdf, workers, backend, pages_per_task)
+        fingerprint = self._source_fingerprint(path_to_pdf) if self.cache is not None else None
+        df = self._cached(path_to_pdf, fingerprint, load)
+        return df
+    
+    def _read_pdf_parallel(self, path_to_pdf: str, workers: int, backend: str, pages_per_task: int):
+        '''
+        Read a PDF's tables by splitting its pages across a process pool then reassemble them in page order
+        with consistent column headers. A PDF given by URL is downloaded once and shared by the workers.
+        
+        Parameters
+        ----------
+        path_to_pdf(str) : Path or URL of the PDF
+        workers(int) : Number of worker processes
+        backend(str) : "tabula" or the pure Python "pdfplumber"
+        pages_per_task(int) : Number of pages read by a worker per task
+        
+        Returns 
+        -------
+        df : Pandas Dataframe object
+        '''
+        from pypdf import PdfReader
+        with tempfile.TemporaryDirectory() as directory:
+            if path_to_pdf.startswith(('http://', 'https://')):
+                local_path = str(Path(directory) / 'source.pdf')
+                response = self.session.get(path_to_pdf, timeout=300)
+                response.raise_for_status()
+                Path(local_path).write_bytes(response.content)
+            else:
+                local_path = path_to_pdf
+            number_of_pages = len(PdfReader(local_path).pages)
+            page_ranges = [list(range(first, min(first + pages_per_task, number_of_pages + 1)))
+                           for first in range(1, number_of_pages + 1, pages_per_task)]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = executor.map(_read_pdf_pages, [local_path] * len(page_ranges), page_ranges, [backend] * len(page_ranges))
+                tables = [table for page_tables in results for table in page_tables]
+        df = pd.concat(_align_pdf_headers(tables))
         return df
     
     def list_number_of_stores(self, endpoint:str, header_dict:dict[str, str]):
@@ -72,48 +416,99 @@ class DataExtractor:
         
         Returns 
         -------
-        stores_data : The number of stores
+        stores_data : The number of stores, an IOError is raised if the request fails after its retries
         '''
-        response = requests.get(endpoint, headers=header_dict)
+        response = self._get(endpoint, header_dict)
+        if response.status_code != 200:
+            raise IOError(f'Could not get the number of stores, request failed with status code {response.status_code}: {response.text}')
+        return response.json()['number_stores']
+    
+    def _retrieve_store(self, url: str, header_dict: dict[str, str]):
+        '''
+        Pull the data for a single store
+        
+        Parameters
+        ----------
+        url(str) : Api endpoint for the store
+        header_dict(dict[str, str]) : The dictionary of headers to be send to the API
+        
+        Returns 
+        -------
+        data : Dictionary of the store data or None if the request failed
+        '''
+        response = self._get(url, header_dict)
         if response.status_code == 200:
-            data = response.json()
-            stores_data = data['number_stores']
-        else:
-            print(f"Request failed with status code: {response.status_code}")
-            print(f"Response Text: {response.text}")
-        return stores_data
+            return response.json()
+        print(f"Request failed with status code: {response.status_code}")
+        print(f"Response Text: {response.text}")
+        return None
+    
+    def retrieve_stores_data(self, number_of_stores: int, endpoint:str, header_dict:dict[str, str]):
+        '''
+        Pull each of the stores data concurrently from the "Return a store" Api.
+        Requests share one keep-alive session, are limited to max_workers in flight and rate limited.
+        With a cache the stores are cached only when every one was retrieved. The API gives no ETag or
+        Last-Modified, so the entry is keyed by the number of stores alone: changes to a store's details
+        are not detected and are only picked up once the cache TTL passes, or with the cache bypassed.
+        
+        Parameters
+        ----------
+        number_of_stores(int) : The number of stores to pull data from
+        endpoint(str) : Api endpoint
+        header_dict(dict[str, str]) : The dictionary of headers to be send to the API
+        
+        Returns 
+        -------
+        df : Pandas Dataframe object with one row per store in store number order,
+             an IOError is raised if any store still fails after its retries so a partial table is never returned
+        '''
+        def load():
+            urls = [f'{endpoint}{i}' for i in range(0, number_of_stores)]
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                stores = list(executor.map(lambda url: self._retrieve_store(url, header_dict), urls))
+            failed = [store_number for store_number, store in enumerate(stores) if store is None]
+            if failed:
+                raise IOError(f'{len(failed)} of {number_of_stores} stores could not be retrieved, store numbers: {failed}')
+            return pd.DataFrame(stores)
+        #load raises before anything is cached when a store is missing, a partial table is never served from the cache
+        df = self._cached(endpoint, f'{number_of_stores} stores', load)
+        return df
     
     def retrieve_stores_data_to_csv(self, number_of_stores: int, endpoint:str, header_dict:dict[str, str], column_header_list:list[str]):
         '''
-        Pull each of the stores data by calling the "Return the number of stores" Api once per store and appending to a csv stored in folder where this function is run
+        Pull each of the stores data and write it once to a csv stored in folder where this function is run
         
         Parameters
         ----------
         number_of_stores(int) : The number of stores to pull data from
         endpoint(str) : Api endpoint
         header_dict(dict[str, str]) : The dictionary of headers to be send to the API
+        column_header_list(list[str]) : The column headers to write to the csv
         
         Returns 
         -------
         none
         '''
-        for i in range(0, number_of_stores):
-            response = requests.get(f'{endpoint}{i}', headers=header_dict)
-            if response.status_code == 200:
-                data = response.json()
-                df_temp = pd.DataFrame([data])
-                
-                if i > 0:
-                    mode = 'a'
-                    header = 0
-                else:
-                    mode = 'w'
-                    header = column_header_list
-                df_temp.to_csv('store.csv', mode=mode, header=header)
-                
-            else:
-                print(f"Request failed with status code: {response.status_code}")
-                print(f"Response Text: {response.text}")
+        df = self.retrieve_stores_data(number_of_stores=number_of_stores, endpoint=endpoint, header_dict=header_dict)
+        df.to_csv('store.csv', header=column_header_list)
+        
+    def retrieve_stores_data_to_staging(self, number_of_stores: int, endpoint:str, header_dict:dict[str, str], staging_path:str = 'store.arrow'):
+        '''
+        Pull each of the stores data and stage it as an Arrow IPC file in the folder where this function is run
+        
+        Parameters
+        ----------
+        number_of_stores(int) : The number of stores to pull data from
+        endpoint(str) : Api endpoint
+        header_dict(dict[str, str]) : The dictionary of headers to be send to the API
+        staging_path(str) : Path of the staging file to write
+        
+        Returns 
+        -------
+        none
+        '''
+        df = self.retrieve_stores_data(number_of_stores=number_of_stores, endpoint=endpoint, header_dict=header_dict)
+        write_staging(df, staging_path, STORE_SCHEMA)
         
     def get_column_headers(self, endpoint:str, header_dict:dict[str, str]):
         '''
@@ -128,7 +523,7 @@ class DataExtractor:
         -------
         column_headers : List of column headers
         '''
-        response = requests.get(f'{endpoint}0', headers=header_dict)
+        response = self._get(f'{endpoint}0', header_dict)
         column_headers = []
         if response.status_code == 200:
                 data = response.json()
@@ -136,31 +531,107 @@ class DataExtractor:
                     column_headers.append(key)
         return column_headers
     
-    def extract_from_s3(self, address:str):
+    def _s3(self):
+        '''
+        The S3 client shared by every request this extractor makes, created on first use.
+        Its connection pool is sized so every ranged GET in flight gets its own connection.
+        '''
+        with self._s3_lock:
+            if self._s3_client is None:
+                import boto3
+                from botocore.config import Config
+                session = boto3.session.Session()
+                self._s3_client = session.client('s3', endpoint_url=self.s3_endpoint_url, config=Config(max_pool_connections=max(10, self.max_workers)))
+        return self._s3_client
+    
+    def read_s3_object(self, bucket: str, key: str, part_size: int = 8 * 1024**2):
         '''
-        Extract product_data.csv file from an s3 bucket. Creates a file of the same name in the directory this function is run in to store the data
+        Read an S3 object into memory without writing it to disk.
+        Objects larger than part_size are fetched as byte ranges in parallel, each part streamed straight into its slot of one buffer.
+        The parts are requested with the object's ETag so they all come from the same version of the object.
         
         Parameters
         ----------
-        address(str): The S3 bucket address
+        bucket(str) : Bucket name
+        key(str) : Object key
+        part_size(int) : Bytes per ranged GET
         
         Returns 
         -------
-        None
+        buffer : BytesIO of the object's content
+        '''
+        s3 = self._s3()
+        head = s3.head_object(Bucket=bucket, Key=key)
+        size = head['ContentLength']
+        if size <= part_size:
+            return io.BytesIO(s3.get_object(Bucket=bucket, Key=key)['Body'].read())
+        buffer = bytearray(size)
+        
+        def fetch(start):
+            end = min(start + part_size, size) - 1
+            body = s3.get_object(Bucket=bucket, Key=key, Range=f'bytes={start}-{end}', IfMatch=head['ETag'])['Body']
+            view = memoryview(buffer)[start:end + 1]
+            offset = 0
+            for chunk in body.iter_chunks(1024**2):
+                view[offset:offset + len(chunk)] = chunk
+                offset += len(chunk)
+            if offset != end + 1 - start:
+                raise IOError(f'Short read of s3://{bucket}/{key} bytes {start}-{end}: got {offset} bytes')
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(fetch, range(0, size, part_size)))
+        return io.BytesIO(buffer)
+    
+    def extract_from_s3(self, address:str, staging_path:str = 'product_data.arrow', part_size: int = 8 * 1024**2):
+        '''
+        Extract the product CSV file from an s3 bucket into memory, optionally staging it as an Arrow IPC file.
+        The columns are returned with the staging schema's types whether or not the file is written.
+        
+        Parameters
+        ----------
+        address(str): The S3 object address, e.g. s3://bucket/products.csv
+        staging_path(str) : Path of the staging file to write, None to only return the data
+        part_size(int) : Bytes per ranged GET, see read_s3_object
+        
+        Returns 
+        -------
+        df : Pandas dataframe of the data or None if the object does not exist
         '''
         components = address.split('/')
         bucket_name = components[2]
-        file_path = components[3]
-        Path("/product_data.csv").mkdir(parents=True, exist_ok=True)
-        s3 = boto3.client('s3')
+        file_path = '/'.join(components[3:])
+        from botocore.exceptions import ClientError
         try:
-            s3.download_file(bucket_name, file_path, 'product_data.csv')
+            buffer = self.read_s3_object(bucket_name, file_path, part_size=part_size)
         except ClientError as e: 
-            if e.response['Error']['Code'] == "404":
+            if e.response['Error']['Code'] in ("404", "NoSuchKey"):
                 print("The object does not exist.")
+                return None
             else:
                 raise
-            
+        df = pd.read_csv(buffer, index_col=[0])
+        df.index.name = 'index'
+        if staging_path is not None:
+            write_staging(df.reset_index(), staging_path, PRODUCT_SCHEMA)
+        #same column types as reading the staging file back
+        return to_staged_table(df.reset_index(), PRODUCT_SCHEMA).to_pandas().set_index('index')
+    
+    def extract_from_staging(self, path_to_staging:str, index_col:str = 'index'):
+        '''
+        Extract data from an Arrow staging file written by an earlier stage.
+        
+        Parameters
+        ----------
+        path_to_staging(str) : The path to the staging file
+        index_col(str) : Column to use as the index
+        
+        Returns 
+        -------
+        df : Pandas dataframe of the data
+        '''
+        df = read_staging(path_to_staging, index_col=index_col)
+        return df
+    
     def extract_from_csv(self, path_to_csv:str):
         '''
         Extract data from a CSV file.
@@ -178,7 +649,8 @@ class DataExtractor:
     
     def extract_json_from_s3(self, address:str):
         '''
-        Extract JSON data from an AWS S3 bucket.
+        Extract column oriented JSON data from an AWS S3 bucket.
+        The file is decoded as it downloads with stream_json_from_s3, giving the same table as pandas.read_json.
         
         Parameters
         ----------
@@ -188,6 +660,38 @@ class DataExtractor:
         -------
         df : Pandas dataframe of the data
         '''
-        df = pd.read_json(address)
+        fingerprint = self._source_fingerprint(address) if self.cache is not None else None
+        df = self._cached(address, fingerprint, lambda: next(self.stream_json_from_s3(address, chunksize=None)))
         return df
+    
+    def _json_blocks(self, address:str, block_size:int):
+        '''
+        Yield the bytes of a URL as they download, or of a local file, a block at a time.
+        '''
+        if address.startswith(('http://', 'https://')):
+            with self.session.get(address, stream=True, timeout=300) as response:
+                response.raise_for_status()
+                yield from response.iter_content(chunk_size=block_size)
+        else:
+            with open(address, 'rb') as file:
+                while block := file.read(block_size):
+                    yield block
+    
+    def stream_json_from_s3(self, address:str, chunksize:int = 50000, block_size:int = 1024**2):
+        '''
+        Decode a column oriented JSON file, such as date_details.json, as it downloads and yield it in chunks.
+        The body is never held whole and no per row objects are built, see json_stream.py.
+        The columns have the dtypes pandas.read_json gives them.
+        
+        Parameters
+        ----------
+        address(str) : The S3 object URL or local path of the JSON file
+        chunksize(int) : Number of rows per chunk, None for the whole table in one chunk
+        block_size(int) : Bytes decoded at a time
+        
+        Yields 
+        -------
+        df : Pandas dataframe of at most chunksize rows
+        '''
+        yield from read_column_json(self._json_blocks(address, block_size), chunksize=chunksize)
         
@@ -1,3 +1,4 @@
+-- The sales questions below can also be answered from the pre-aggregated sales_summary table, see sales_aggregates.py
 -- How many stores does the business have and in which countries?
 SELECT country_code,
     COUNT(*)
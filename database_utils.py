@@ -1,5 +1,60 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import io
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
 import yaml
-from sqlalchemy import create_engine, inspect
+from instrumentation import instrument_class, peak_rss_mb
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.dialects.postgresql import insert
+from star_schema import INDEXES, STAR_SCHEMA, create_table_sql, foreign_key_sql, index_sql, prepare_for_load, referencing_foreign_keys, row_hashes
+
+
+#Engines shared by every DatabaseConnector in this process, keyed by connection url and pool settings
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def _get_engine(url:str, pool_settings:dict):
+    '''
+    Get the shared engine for a connection url and pool settings, creating it on first use.
+    The process id is part of the key so a forked worker never reuses its parent's pooled connections.
+    '''
+    key = (os.getpid(), url, tuple(sorted(pool_settings.items())))
+    with _engines_lock:
+        if key not in _engines:
+            _engines[key] = create_engine(url, **pool_settings)
+        return _engines[key]
+
+
+def _upsert_method(key_columns:list[str]):
+    '''
+    Build a pandas to_sql insert method that upserts with INSERT ... ON CONFLICT DO UPDATE on the key columns.
+    '''
+    def upsert(pd_table, connection, keys, data_iter):
+        rows = [dict(zip(keys, row)) for row in data_iter]
+        statement = insert(pd_table.table).values(rows)
+        update_columns = {key: statement.excluded[key] for key in keys if key not in key_columns}
+        statement = statement.on_conflict_do_update(index_elements=key_columns, set_=update_columns)
+        return connection.execute(statement).rowcount
+    return upsert
+
+
+def _report_load(table:str, rows:int, start:float):
+    '''
+    Print the rows, throughput and peak memory for a finished load.
+    '''
+    elapsed = time.perf_counter() - start
+    rows_per_second = rows / elapsed if elapsed else float('inf')
+    peak_rss = peak_rss_mb()
+    peak = f'{peak_rss:.1f} MB' if peak_rss is not None else 'n/a'
+    print(f'{table}: {rows} rows in {elapsed:.2f}s ({rows_per_second:.0f} rows/s), process peak RSS {peak}')
+
+
+@instrument_class
 class DatabaseConnector:
     """
     A class to connect to various databases
@@ -8,23 +63,46 @@ class DatabaseConnector:
 
     Attributes
     ----------
-    self.engine : stores the SQLalchemy engine based on the credentials given
+    self.engine : stores the SQLalchemy engine based on the credentials given, shared by connectors with the same credentials and pool settings
     self.tables : Empty dictionary populated in the list_db_tables method
     
     Methods
     -------
     list_db_tables : List the schemas and the tables in those schemas
+    connect : Context managed connection from the pool
+    begin : Context managed connection in a transaction that commits on success and rolls back on error
+    connection_stats : Current pool size and connection counts
+    upload_tables_to_db : Uploads several dataframes in one transaction so readers never see a half refreshed schema.
     upload_to_db : Uploads the dataframe to the given table for the engine previously initialised. Will replace any existing table with given name.
+    bulk_upload_to_db : Uploads the dataframe with COPY into a staging table and swaps it in place of the given table in one transaction.
+    typed_upload_to_db : Uploads the dataframe into a star schema table created with its final types and primary key.
+    typed_upload_chunks_to_db : Uploads an iterable of dataframes into a star schema table created with its final types and primary key.
+    merge_to_db : Writes only the inserted, updated and deleted rows of a star schema table, found by comparing row hashes with the last load.
+    merge_chunks_to_db : Merges an iterable of dataframes making up a star schema table as merge_to_db does, one chunk in memory at a time.
+    add_foreign_keys : Add the missing star schema foreign keys of a table.
+    build_indexes : Build indexes after the load several at a time and ANALYZE the indexed tables.
+    upsert_to_db : Inserts or updates the dataframe rows in the given table keyed on the key columns.
+    get_watermark : Get the persisted high-water mark for a table.
+    set_watermark : Persist the high-water mark for a table.
+    clear_watermark : Remove the high-water mark for a table.
+    bump_table_versions : Increase the version stamp of tables whose contents changed, done by every load method.
+    table_versions : Get the version stamp of every loaded table.
+    upload_chunks_to_db : Uploads an iterable of dataframes to the given table, replacing it with the first chunk and appending the rest.
     
     """
-    def __init__(self, path_to_credentials:str):
+    def __init__(self, path_to_credentials:str, pool_size:int = 5, max_overflow:int = 10, pool_pre_ping:bool = True, pool_recycle:int = 1800):
         '''
         Initialises the database engine given the credentials 
         Parameters
         ----------
         path_to_credentials : the file path to the credentials
+        pool_size(int) : Number of connections kept open in the pool
+        max_overflow(int) : Extra connections allowed above pool_size under load
+        pool_pre_ping(bool) : Test connections before use so dropped connections are replaced
+        pool_recycle(int) : Seconds after which a pooled connection is replaced
         '''
-        self.engine = self._init_db_engine(path_to_credentials=path_to_credentials)
+        pool_settings = {'pool_size': pool_size, 'max_overflow': max_overflow, 'pool_pre_ping': pool_pre_ping, 'pool_recycle': pool_recycle}
+        self.engine = self._init_db_engine(path_to_credentials=path_to_credentials, pool_settings=pool_settings)
         self.tables = {}
     
     def _read_db_creds(self, path_to_credentials:str):
@@ -42,12 +120,13 @@ class DatabaseConnector:
             loaded_creds = yaml.safe_load(db_creds)
         return loaded_creds
     
-    def _init_db_engine(self, path_to_credentials:str):
+    def _init_db_engine(self, path_to_credentials:str, pool_settings:dict = None):
         '''
-        Extract the credentials and initialise a SQLalchemy engine object
+        Extract the credentials and get the shared SQLalchemy engine object for them
         Parameters
         ----------
         path_to_credentials(str) : Path to the credentials file
+        pool_settings(dict) : Keyword arguments for the engine's connection pool
         
         Returns 
         -------
@@ -60,11 +139,55 @@ class DatabaseConnector:
         user=credentials['RDS_USER']
         password=credentials['RDS_PASSWORD']
         
-        engine = create_engine(f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{database}")
+        engine = _get_engine(f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{database}", pool_settings or {})
         print(f'{path_to_credentials} engine initialised')
         
         return engine
         
+    @contextmanager
+    def connect(self):
+        '''
+        Context managed connection from the pool, returned to the pool when the block exits
+        
+        Yields 
+        -------
+        SQLalchemy connection
+        '''
+        with self.engine.connect() as connection:
+            yield connection
+    
+    @contextmanager
+    def begin(self):
+        '''
+        Context managed connection in a transaction that commits when the block exits and rolls back on error
+        
+        Yields 
+        -------
+        SQLalchemy connection
+        '''
+        with self.engine.begin() as connection:
+            yield connection
+    
+    def connection_stats(self):
+        '''
+        Current pool size and connection counts, for checking connections are returned to the pool
+        
+        Parameters
+        ----------
+        none
+        
+        Returns 
+        -------
+        stats : dictionary of pool_size, checked_out, checked_in and overflow
+        '''
+        pool = self.engine.pool
+        return {
+            'pool_size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': pool.overflow(),
+        }
+        
     def list_db_tables(self):
         '''
         List the schemas and the tables in those schemas
@@ -104,6 +227,509 @@ class DatabaseConnector:
         -------
         SQLalchemy engine 
         '''
-        connection = self.engine.connect()
-        df.to_sql(table, connection, if_exists='replace', index=False)
-        print('data pushed')
\ No newline at end of file
+        start = time.perf_counter()
+        with self.begin() as connection:
+            df.to_sql(table, connection, if_exists='replace', index=False)
+            self.bump_table_versions([table], connection=connection)
+        print('data pushed')
+        _report_load(table, len(df), start)
+    
+    def upload_tables_to_db(self, tables:dict):
+        '''
+        Uploads several dataframes in one transaction, replacing any existing tables with the given names.
+        Readers see either all of the old tables or all of the new ones.
+        
+        Parameters
+        ----------
+        tables(dict) : Dictionary of table name to Pandas Dataframe object
+        
+        Returns 
+        -------
+        None
+        '''
+        start = time.perf_counter()
+        with self.begin() as connection:
+            for table, df in tables.items():
+                df.to_sql(table, connection, if_exists='replace', index=False)
+            self.bump_table_versions(list(tables), connection=connection)
+        print('data pushed')
+        _report_load(', '.join(tables), sum(len(df) for df in tables.values()), start)
+    
+    def upload_chunks_to_db(self, chunks, table:str):
+        '''
+        Uploads an iterable of dataframes to the given table in a single transaction.
+        The first chunk replaces any existing table with given name, the rest are appended.
+        Only one chunk is held in memory at a time when given a generator.
+        
+        Parameters
+        ----------
+        chunks : Iterable of Pandas Dataframe objects to be uploaded
+        table(str) : Table name to upload the data into 
+        
+        Returns 
+        -------
+        rows : The number of rows uploaded
+        '''
+        start = time.perf_counter()
+        rows = 0
+        with self.engine.begin() as connection:
+            for i, chunk in enumerate(chunks):
+                if_exists = 'replace' if i == 0 else 'append'
+                chunk.to_sql(table, connection, if_exists=if_exists, index=False)
+                rows += len(chunk)
+            self.bump_table_versions([table], connection=connection)
+        print('data pushed')
+        _report_load(table, rows, start)
+        return rows
+    
+    def _copy_dataframe(self, connection, df, table:str, chunksize:int):
+        '''
+        Stream a dataframe into an existing table using Postgres COPY FROM STDIN in CSV format.
+        Each chunk is serialised to an in memory buffer before being sent.
+        
+        Parameters
+        ----------
+        connection : SQLalchemy connection with an open transaction
+        df : Pandas Dataframe object to be copied
+        table(str) : Table name to copy the data into
+        chunksize(int) : Number of rows serialised per COPY
+        
+        Returns 
+        -------
+        None
+        '''
+        columns = ', '.join(f'"{column}"' for column in df.columns)
+        copy_sql = f'COPY "{table}" ({columns}) FROM STDIN WITH (FORMAT csv)'
+        cursor = connection.connection.cursor()
+        try:
+            for start in range(0, len(df), chunksize):
+                buffer = io.StringIO()
+                df.iloc[start:start + chunksize].to_csv(buffer, index=False, header=False)
+                buffer.seek(0)
+                cursor.copy_expert(copy_sql, buffer)
+        finally:
+            cursor.close()
+    
+    def bulk_upload_to_db(self, df, table:str, chunksize:int = 100000):
+        '''
+        Uploads the dataframe with COPY into a staging table then swaps it in place of the given table.
+        The load, drop and rename all happen in one transaction so readers never see the table missing.
+        
+        Parameters
+        ----------
+        df : Pandas Dataframe object to be uploaded
+        table(str) : Table name to upload the data into 
+        chunksize(int) : Number of rows serialised per COPY
+        
+        Returns 
+        -------
+        None
+        '''
+        start = time.perf_counter()
+        staging_table = f'{table}_staging'
+        with self.engine.begin() as connection:
+            #create an empty staging table with the same columns as the dataframe
+            df.head(0).to_sql(staging_table, connection, if_exists='replace', index=False)
+            self._copy_dataframe(connection, df, staging_table, chunksize)
+            connection.exec_driver_sql(f'DROP TABLE IF EXISTS "{table}"')
+            connection.exec_driver_sql(f'ALTER TABLE "{staging_table}" RENAME TO "{table}"')
+            self.bump_table_versions([table], connection=connection)
+        print('data pushed')
+        _report_load(table, len(df), start)
+    
+    def _create_typed_table(self, connection, table:str):
+        '''
+        Replace a star schema table with an empty one created with its final column types and primary key.
+        Tables with foreign keys to it lose them until add_foreign_keys is run.
+        Row hashes stored by merge_to_db no longer describe the table and are dropped with it.
+        '''
+        connection.exec_driver_sql(f'DROP TABLE IF EXISTS "{table}" CASCADE')
+        connection.exec_driver_sql(f'DROP TABLE IF EXISTS "{table}_row_hashes"')
+        connection.exec_driver_sql(create_table_sql(table))
+    
+    def typed_upload_to_db(self, df, table:str, chunksize:int = 100000):
+        '''
+        Uploads the dataframe to a star schema table created with its final types and primary key, replacing any existing table.
+        The create and COPY happen in one transaction so the table is written once and readers never see it empty.
+        
+        Parameters
+        ----------
+        df : Cleaned Pandas Dataframe object to be uploaded
+        table(str) : Star schema table name to upload the data into, e.g. "dim_users"
+        chunksize(int) : Number of rows serialised per COPY
+        
+        Returns 
+        -------
+        None
+        '''
+        start = time.perf_counter()
+        with self.begin() as connection:
+            self._create_typed_table(connection, table)
+            self._copy_dataframe(connection, prepare_for_load(df, table), table, chunksize)
+            self.bump_table_versions([table], connection=connection)
+        print('data pushed')
+        _report_load(table, len(df), start)
+    
+    def typed_upload_chunks_to_db(self, chunks, table:str, chunksize:int = 100000):
+        '''
+        Uploads an iterable of dataframes to a star schema table created with its final types and primary key in a single transaction.
+        Only one chunk is held in memory at a time when given a generator.
+        
+        Parameters
+        ----------
+        chunks : Iterable of cleaned Pandas Dataframe objects to be uploaded
+        table(str) : Star schema table name to upload the data into
+        chunksize(int) : Number of rows serialised per COPY
+        
+        Returns 
+        -------
+        rows : The number of rows uploaded
+        '''
+        start = time.perf_counter()
+        rows = 0
+        with self.begin() as connection:
+            self._create_typed_table(connection, table)
+            for chunk in chunks:
+                self._copy_dataframe(connection, prepare_for_load(chunk, table), table, chunksize)
+                rows += len(chunk)
+            self.bump_table_versions([table], connection=connection)
+        print('data pushed')
+        _report_load(table, rows, start)
+        return rows
+    
+    def _create_row_hashes_table(self, connection, table:str):
+        '''
+        Create the empty table the row hashes of a star schema table are stored in, used when there are no hashes to compare with.
+        '''
+        primary_key = STAR_SCHEMA[table]['primary_key']
+        key_type = dict(STAR_SCHEMA[table]['columns'])[primary_key]
+        connection.exec_driver_sql(f'CREATE TABLE "{table}_row_hashes" ("{primary_key}" {key_type} PRIMARY KEY, row_hash BIGINT NOT NULL)')
+    
+    def _stored_hashes(self, connection, table:str):
+        '''
+        The row hashes stored by the last merge of a table, or None if the table or hashes are missing or its columns have changed.
+        '''
+        inspection = inspect(connection)
+        if not inspection.has_table(table) or not inspection.has_table(f'{table}_row_hashes'):
+            return None
+        if [column['name'] for column in inspection.get_columns(table)] != [name for name, _ in STAR_SCHEMA[table]['columns']]:
+            return None
+        primary_key = STAR_SCHEMA[table]['primary_key']
+        stored = pd.read_sql(text(f'SELECT "{primary_key}"::text AS "{primary_key}", row_hash FROM "{table}_row_hashes"'), connection)
+        return stored.set_index(primary_key)['row_hash']
+    
+    def merge_to_db(self, df, table:str, chunksize:int = 100000):
+        '''
+        Writes only the rows of a star schema table that changed since the last load, see merge_chunks_to_db.
+        
+        Parameters
+        ----------
+        df : Cleaned Pandas Dataframe object with the whole table
+        table(str) : Star schema table name to merge the data into, e.g. "dim_users"
+        chunksize(int) : Number of rows serialised per COPY
+        
+        Returns 
+        -------
+        changes : dictionary of the number of rows inserted, updated, deleted, kept as still referenced and unchanged
+        '''
+        return self.merge_chunks_to_db([df], table, chunksize)
+    
+    def merge_chunks_to_db(self, chunks, table:str, chunksize:int = 100000):
+        '''
+        Writes only the rows of a star schema table that changed since the last load, keyed on its primary key.
+        Each row is hashed and compared with the hashes stored from the last load in the "<table>_row_hashes" table.
+        New and changed rows are copied to a temporary table and upserted, rows no longer present are deleted,
+        so the rows written and locked scale with the changes rather than the table size.
+        The table is loaded in full when it has no stored hashes or its columns have changed.
+        Rows no longer in the source are not deleted while another table, e.g. orders_table, still references them,
+        so orders loaded before never lose their dimension rows. The foreign keys referencing the table are kept,
+        being deferred they check the deletes when the transaction commits.
+        Only one chunk is held in memory at a time when given a generator, along with the stored hashes and the keys seen.
+        
+        Parameters
+        ----------
+        chunks : Iterable of cleaned Pandas Dataframe objects together making up the whole table
+        table(str) : Star schema table name to merge the data into, e.g. "dim_users"
+        chunksize(int) : Number of rows serialised per COPY
+        
+        Returns 
+        -------
+        changes : dictionary of the number of rows inserted, updated, deleted, kept as still referenced and unchanged
+        '''
+        start = time.perf_counter()
+        definition = STAR_SCHEMA[table]
+        primary_key = definition['primary_key']
+        changes = {'inserted': 0, 'updated': 0, 'deleted': 0, 'kept': 0, 'unchanged': 0}
+        with self.begin() as connection:
+            stored = self._stored_hashes(connection, table)
+            if stored is None:
+                self._create_typed_table(connection, table)
+                self._create_row_hashes_table(connection, table)
+            else:
+                #nullable integers so the missing hashes of new rows do not turn the rest into inexact floats
+                stored_hashes = stored.astype('Int64')
+                connection.exec_driver_sql(f'CREATE TEMP TABLE "{table}_changes" (LIKE "{table}") ON COMMIT DROP')
+                connection.exec_driver_sql(f'CREATE TEMP TABLE "{table}_hash_changes" (LIKE "{table}_row_hashes") ON COMMIT DROP')
+            seen = []
+            for chunk in chunks:
+                df = prepare_for_load(chunk, table)
+                hashes = row_hashes(df, table)
+                if stored is None:
+                    self._copy_dataframe(connection, df, table, chunksize)
+                    self._copy_dataframe(connection, hashes.reset_index(), f'{table}_row_hashes', chunksize)
+                    changes['inserted'] += len(df)
+                    continue
+                seen.append(hashes.index.to_numpy())
+                previous = stored_hashes.reindex(hashes.index)
+                inserted = previous.isna().to_numpy()
+                updated = (previous != hashes).fillna(False).to_numpy(dtype=bool) & ~inserted
+                changes['inserted'] += int(inserted.sum())
+                changes['updated'] += int(updated.sum())
+                changes['unchanged'] += int(len(df) - inserted.sum() - updated.sum())
+                changed = inserted | updated
+                if changed.any():
+                    self._copy_dataframe(connection, df[changed], f'{table}_changes', chunksize)
+                    self._copy_dataframe(connection, hashes[changed].reset_index(), f'{table}_hash_changes', chunksize)
+            if stored is not None:
+                deleted = stored.index.difference(pd.Index(np.concatenate(seen) if seen else []))
+                changes['deleted'] = len(deleted)
+                key_type = dict(definition['columns'])[primary_key]
+                if len(deleted):
+                    connection.exec_driver_sql(f'CREATE TEMP TABLE "{table}_deleted" ("{primary_key}" {key_type}) ON COMMIT DROP')
+                    self._copy_dataframe(connection, pd.DataFrame({primary_key: deleted}), f'{table}_deleted', chunksize)
+                    #rows still referenced, e.g. by orders loaded incrementally before, are kept so the foreign keys can be added back
+                    for referencing, column in referencing_foreign_keys(table):
+                        if connection.exec_driver_sql(f"SELECT to_regclass('\"{referencing}\"')").scalar() is not None:
+                            changes['kept'] += connection.exec_driver_sql(
+                                f'DELETE FROM "{table}_deleted" d USING "{referencing}" r WHERE r."{column}" = d."{primary_key}"'
+                            ).rowcount
+                    changes['deleted'] -= changes['kept']
+                if changes['deleted']:
+                    for target in [table, f'{table}_row_hashes']:
+                        connection.exec_driver_sql(f'DELETE FROM "{target}" t USING "{table}_deleted" d WHERE t."{primary_key}" = d."{primary_key}"')
+                if changes['inserted'] or changes['updated']:
+                    for target, source, columns in [
+                        (table, f'{table}_changes', [name for name, _ in definition['columns']]),
+                        (f'{table}_row_hashes', f'{table}_hash_changes', [primary_key, 'row_hash']),
+                    ]:
+                        updates = ', '.join(f'"{column}" = EXCLUDED."{column}"' for column in columns if column != primary_key)
+                        connection.exec_driver_sql(f'INSERT INTO "{target}" SELECT * FROM "{source}" ON CONFLICT ("{primary_key}") DO UPDATE SET {updates}')
+            if changes['inserted'] or changes['updated'] or changes['deleted']:
+                self.bump_table_versions([table], connection=connection)
+        print(f"{table}: {changes['inserted']} inserted, {changes['updated']} updated, {changes['deleted']} deleted, {changes['unchanged']} unchanged")
+        if changes['kept']:
+            print(f"{table}: {changes['kept']} rows no longer in the source were kept, they are still referenced")
+        _report_load(table, changes['inserted'] + changes['updated'] + changes['deleted'], start)
+        return changes
+    
+    def add_foreign_keys(self, table:str = 'orders_table'):
+        '''
+        Add the star schema foreign keys of a table that are missing, e.g. after a referenced dimension table was replaced.
+        Each new constraint is validated against the loaded rows with one scan rather than a table rewrite.
+        
+        Parameters
+        ----------
+        table(str) : Star schema table name holding the foreign keys
+        
+        Returns 
+        -------
+        added : list of the constraint names added
+        '''
+        added = []
+        with self.begin() as connection:
+            existing = set(connection.execute(
+                text("SELECT constraint_name FROM information_schema.table_constraints WHERE table_name = :table AND constraint_type = 'FOREIGN KEY'"),
+                {'table': table},
+            ).scalars())
+            for name, statement in foreign_key_sql(table).items():
+                if name not in existing:
+                    connection.exec_driver_sql(statement)
+                    added.append(name)
+        print(f'{table}: added foreign keys {added}' if added else f'{table}: foreign keys in place')
+        return added
+    
+    def _build_index(self, statement:str):
+        '''
+        Run one CREATE INDEX statement on its own pooled connection and return the build time in seconds.
+        '''
+        start = time.perf_counter()
+        with self.begin() as connection:
+            connection.exec_driver_sql(statement)
+        return time.perf_counter() - start
+    
+    def build_indexes(self, indexes:list = INDEXES, workers:int = 4):
+        '''
+        Build indexes after the bulk load, several at a time, then ANALYZE the indexed tables so the planner sees the new rows.
+        Building after the load sorts each column once instead of updating the index row by row during COPY.
+        Indexes that already exist are skipped.
+        
+        Parameters
+        ----------
+        indexes(list) : List of (table, columns) pairs, the star schema indexes by default
+        workers(int) : Number of indexes built at the same time, each on its own connection
+        
+        Returns 
+        -------
+        timings : dictionary of index name to build time in seconds, with "ANALYZE" for the statistics run
+        '''
+        statements = dict(index_sql(table, columns) for table, columns in indexes)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            timings = dict(zip(statements, executor.map(self._build_index, statements.values())))
+        start = time.perf_counter()
+        with self.begin() as connection:
+            for table in dict.fromkeys(table for table, _ in indexes):
+                connection.exec_driver_sql(f'ANALYZE "{table}"')
+        timings['ANALYZE'] = time.perf_counter() - start
+        for name, seconds in timings.items():
+            print(f'{name}: {seconds:.2f}s')
+        return timings
+    
+    def upsert_to_db(self, df, table:str, key_columns:list[str], chunksize:int = 10000):
+        '''
+        Inserts new rows and updates existing rows of the given table using INSERT ... ON CONFLICT on the key columns.
+        Creates the table and a unique index on the key columns if they do not exist yet.
+        
+        Parameters
+        ----------
+        df : Pandas Dataframe object to be upserted
+        table(str) : Table name to upsert the data into 
+        key_columns(list[str]) : Columns that uniquely identify a row
+        chunksize(int) : Number of rows per INSERT statement
+        
+        Returns 
+        -------
+        None
+        '''
+        start = time.perf_counter()
+        key_list = ', '.join(f'"{column}"' for column in key_columns)
+        with self.engine.begin() as connection:
+            if not inspect(connection).has_table(table):
+                df.head(0).to_sql(table, connection, index=False)
+            connection.exec_driver_sql(f'CREATE UNIQUE INDEX IF NOT EXISTS "{table}_upsert_key" ON "{table}" ({key_list})')
+            df.to_sql(table, connection, if_exists='append', index=False, chunksize=chunksize, method=_upsert_method(key_columns))
+            self.bump_table_versions([table], connection=connection)
+        print('data pushed')
+        _report_load(table, len(df), start)
+    
+    def _create_watermark_table(self, connection):
+        '''
+        Create the etl_watermarks table used to persist high-water marks if it does not exist.
+        '''
+        connection.exec_driver_sql(
+            'CREATE TABLE IF NOT EXISTS etl_watermarks ('
+            'table_name TEXT PRIMARY KEY, column_name TEXT NOT NULL, value TEXT NOT NULL)'
+        )
+    
+    def get_watermark(self, table:str):
+        '''
+        Get the persisted high-water mark for a table.
+        
+        Parameters
+        ----------
+        table(str) : Table name the watermark belongs to
+        
+        Returns 
+        -------
+        value : The watermark as a string or None if the table has not been loaded yet
+        '''
+        with self.engine.begin() as connection:
+            self._create_watermark_table(connection)
+            value = connection.execute(
+                text('SELECT value FROM etl_watermarks WHERE table_name = :table'), {'table': table}
+            ).scalar()
+        return value
+    
+    def set_watermark(self, table:str, column:str, value, connection=None):
+        '''
+        Persist the high-water mark for a table.
+        
+        Parameters
+        ----------
+        table(str) : Table name the watermark belongs to
+        column(str) : Column the watermark is taken from
+        value : The highest value of the column loaded so far
+        connection : Connection with an open transaction to write the watermark in, a new transaction is used if None
+        
+        Returns 
+        -------
+        None
+        '''
+        if connection is None:
+            with self.begin() as connection:
+                return self.set_watermark(table, column, value, connection=connection)
+        self._create_watermark_table(connection)
+        connection.execute(
+            text(
+                'INSERT INTO etl_watermarks (table_name, column_name, value) VALUES (:table, :column, :value) '
+                'ON CONFLICT (table_name) DO UPDATE SET column_name = EXCLUDED.column_name, value = EXCLUDED.value'
+            ),
+            {'table': table, 'column': column, 'value': str(value)},
+        )
+    
+    def clear_watermark(self, table:str):
+        '''
+        Remove the high-water mark for a table so the next incremental load starts from scratch.
+        
+        Parameters
+        ----------
+        table(str) : Table name the watermark belongs to
+        
+        Returns 
+        -------
+        None
+        '''
+        with self.begin() as connection:
+            self._create_watermark_table(connection)
+            connection.execute(text('DELETE FROM etl_watermarks WHERE table_name = :table'), {'table': table})
+    
+    def _create_versions_table(self, connection):
+        '''
+        Create the etl_table_versions table holding the version stamp of each loaded table if it does not exist.
+        '''
+        connection.exec_driver_sql(
+            'CREATE TABLE IF NOT EXISTS etl_table_versions ('
+            'table_name TEXT PRIMARY KEY, version BIGINT NOT NULL, updated_at TIMESTAMPTZ NOT NULL DEFAULT now())'
+        )
+    
+    def bump_table_versions(self, tables:list[str], connection=None):
+        '''
+        Increase the version stamp of tables whose contents changed, so results cached from them are no longer used.
+        
+        Parameters
+        ----------
+        tables(list[str]) : Names of the changed tables
+        connection : Connection with an open transaction to write the versions in, so they change with the data, a new transaction is used if None
+        
+        Returns
+        -------
+        None
+        '''
+        if connection is None:
+            with self.begin() as connection:
+                return self.bump_table_versions(tables, connection=connection)
+        self._create_versions_table(connection)
+        for table in tables:
+            connection.execute(
+                text(
+                    'INSERT INTO etl_table_versions (table_name, version) VALUES (:table, 1) '
+                    'ON CONFLICT (table_name) DO UPDATE SET version = etl_table_versions.version + 1, updated_at = now()'
+                ),
+                {'table': table},
+            )
+    
+    def table_versions(self):
+        '''
+        Get the version stamp of every loaded table.
+        
+        Parameters
+        ----------
+        none
+        
+        Returns 
+        -------
+        versions : dictionary of table name to version, tables never loaded are missing
+        '''
+        with self.begin() as connection:
+            self._create_versions_table(connection)
+            rows = connection.exec_driver_sql('SELECT table_name, version FROM etl_table_versions').all()
+        return dict(rows)
@@ -0,0 +1,157 @@
+from pathlib import Path
+import hashlib
+import json
+import os
+import time
+import pandas as pd
+
+
+class ExtractionCache:
+    """
+    A class to cache extracted dataframes on disk as Parquet files
+
+    ...
+
+    Entries are keyed by the source (URL or path) plus a fingerprint of its content such as an ETag,
+    Last-Modified header or file hash, so a changed source is never served from the cache.
+    Each entry is stored as <key>.parquet with its metadata in <key>.json.
+
+    Attributes
+    ----------
+    self.cache_dir : Directory the entries are stored in
+    self.ttl_seconds : Entries older than this are treated as missing, None to never expire
+    self.max_bytes : Least recently used entries are evicted when the cache grows beyond this size
+    self.bypass : When True every lookup misses, fresh results are still written to the cache
+
+    Methods
+    -------
+    get : Get a cached dataframe for a source and fingerprint
+    put : Cache a dataframe for a source and fingerprint
+    file_fingerprint : Hash the content of a local file
+
+    """
+    def __init__(self, cache_dir:str = '.extraction_cache', ttl_seconds:float = None, max_bytes:int = 1024**3, bypass:bool = False):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.bypass = bypass
+
+    def _key(self, source:str, fingerprint:str):
+        '''
+        Hash the source and fingerprint into the entry key.
+        '''
+        return hashlib.sha256(f'{source}\n{fingerprint}'.encode()).hexdigest()
+
+    def _write_metadata(self, path:Path, metadata:dict):
+        '''
+        Atomically write an entry's metadata so concurrent stages never read a partial file.
+        '''
+        temp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        temp_path.write_text(json.dumps(metadata))
+        os.replace(temp_path, path)
+
+    def get(self, source:str, fingerprint:str = None):
+        '''
+        Get a cached dataframe for a source and fingerprint.
+
+        Parameters
+        ----------
+        source(str) : URL or path the data was extracted from
+        fingerprint(str) : Fingerprint of the source content, None when only the TTL decides freshness
+
+        Returns
+        -------
+        df : Pandas Dataframe object or None on a cache miss
+        '''
+        if self.bypass:
+            return None
+        key = self._key(source, fingerprint)
+        metadata_path = self.cache_dir / f'{key}.json'
+        data_path = self.cache_dir / f'{key}.parquet'
+        try:
+            metadata = json.loads(metadata_path.read_text())
+            if self.ttl_seconds is not None and time.time() - metadata['created'] > self.ttl_seconds:
+                return None
+            df = pd.read_parquet(data_path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        metadata['last_access'] = time.time()
+        self._write_metadata(metadata_path, metadata)
+        print(f'{source} read from cache')
+        return df
+
+    def put(self, source:str, fingerprint:str, df):
+        '''
+        Cache a dataframe for a source and fingerprint then evict least recently used entries over max_bytes.
+
+        Parameters
+        ----------
+        source(str) : URL or path the data was extracted from
+        fingerprint(str) : Fingerprint of the source content, None when only the TTL decides freshness
+        df : Pandas Dataframe object to cache
+
+        Returns
+        -------
+        None
+        '''
+        key = self._key(source, fingerprint)
+        data_path = self.cache_dir / f'{key}.parquet'
+        temp_path = data_path.with_name(f'{data_path.name}.{os.getpid()}.tmp')
+        self._parquet_safe(df).to_parquet(temp_path)
+        os.replace(temp_path, data_path)
+        now = time.time()
+        metadata = {'source': source, 'fingerprint': fingerprint, 'created': now, 'last_access': now, 'size': data_path.stat().st_size}
+        self._write_metadata(self.cache_dir / f'{key}.json', metadata)
+        self._evict()
+
+    def _parquet_safe(self, df):
+        '''
+        Store object columns holding a mix of types, such as numbers and strings read from a PDF, as strings
+        since Parquet columns must have a single type. Nulls are kept.
+        '''
+        mixed_columns = [column for column in df.select_dtypes(include='object').columns
+                         if pd.api.types.infer_dtype(df[column], skipna=True).startswith('mixed')]
+        if not mixed_columns:
+            return df
+        df = df.copy()
+        for column in mixed_columns:
+            df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+        return df
+
+    def _evict(self):
+        '''
+        Delete least recently used entries until the cache is no bigger than max_bytes.
+        '''
+        entries = []
+        for metadata_path in self.cache_dir.glob('*.json'):
+            try:
+                metadata = json.loads(metadata_path.read_text())
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+            entries.append((metadata['last_access'], metadata['size'], metadata_path))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, metadata_path in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            metadata_path.with_suffix('.parquet').unlink(missing_ok=True)
+            metadata_path.unlink(missing_ok=True)
+            total_size -= size
+
+    def file_fingerprint(self, path:str):
+        '''
+        Hash the content of a local file.
+
+        Parameters
+        ----------
+        path(str) : Path to the file
+
+        Returns
+        -------
+        The sha256 hex digest of the file
+        '''
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
@@ -0,0 +1,203 @@
+'''
+Per call performance records for the pipeline classes.
+
+Each instrumented call is recorded as one JSON line with its wall time, CPU time, rows in and out,
+the size of its result and the peak memory of the whole process so far. Recording is off until configure
+is given a path.
+'''
+from contextlib import contextmanager
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+_settings = {'path': None}
+_local = threading.local()
+_write_lock = threading.Lock()
+
+
+def peak_rss_mb():
+    '''
+    Peak resident set size of this process in MB, or None where the resource module is unavailable.
+    '''
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    #ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return peak / divisor
+
+
+def configure(path:str = None, trace_memory:bool = False):
+    '''
+    Turn recording on by giving the JSON lines file records are appended to, or off with None.
+
+    Parameters
+    ----------
+    path(str) : Path of the JSON lines file, None to turn recording off
+    trace_memory(bool) : Also record the peak Python heap of each call with tracemalloc, this slows the pipeline down
+
+    Returns
+    -------
+    None
+    '''
+    _settings['path'] = path
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def enabled():
+    '''
+    Whether records are being written.
+    '''
+    return _settings['path'] is not None
+
+
+def _write(record:dict):
+    '''
+    Append a record as one JSON line, the file is shared by threads and worker processes.
+    '''
+    line = json.dumps(record, default=str) + '\n'
+    with _write_lock:
+        with open(_settings['path'], 'a') as file:
+            file.write(line)
+
+
+def _size(value):
+    '''
+    Rows and shallow memory usage of a dataframe, object columns counted by their pointers only, or the
+    content length of an HTTP response.
+    '''
+    if hasattr(value, 'memory_usage') and hasattr(value, 'columns'):
+        return len(value), int(value.memory_usage(index=True, deep=False).sum())
+    content = getattr(value, 'content', None)
+    if isinstance(content, bytes):
+        return None, len(content)
+    return None, None
+
+
+@contextmanager
+def span(name:str, **fields):
+    '''
+    Record the wall time, CPU time and peak memory of the code inside the with block.
+    Extra fields, and any added to the yielded record, are written with it.
+
+    Parameters
+    ----------
+    name(str) : Name of the span, e.g. "DataCleaning.clean_users"
+    fields : Extra values to record
+
+    Yields
+    -------
+    record : The dictionary that will be written
+    '''
+    if not enabled():
+        yield {}
+        return
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    record = {'span': name, 'parent': stack[-1]['span'] if stack else None, 'pid': os.getpid(), **fields}
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        #carry the outer span's peak so far before resetting the peak for this span
+        if stack:
+            stack[-1]['_child_peak'] = max(stack[-1].get('_child_peak', 0), tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+    stack.append(record)
+    record['start'] = time.time()
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield record
+    finally:
+        record['wall_s'] = time.perf_counter() - wall_start
+        record['cpu_s'] = time.thread_time() - cpu_start
+        #ru_maxrss is the high water mark of the whole process since it started, not of this span
+        record['process_peak_rss_mb'] = peak_rss_mb()
+        stack.pop()
+        if tracing:
+            peak = max(tracemalloc.get_traced_memory()[1], record.pop('_child_peak', 0))
+            record['peak_traced_mb'] = peak / 1024**2
+            if stack:
+                stack[-1]['_child_peak'] = max(stack[-1].get('_child_peak', 0), peak)
+        _write(record)
+
+
+def instrument(func):
+    '''
+    Decorator recording a span for each call of a function or method.
+    Rows in are taken from self.table or the first dataframe argument, rows out and result_bytes from the result,
+    result_bytes being the shallow memory usage of a dataframe or the content length of a response.
+    '''
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not enabled():
+            return func(*args, **kwargs)
+        rows_in = None
+        for value in list(args) + list(kwargs.values()):
+            table = getattr(value, 'table', value)
+            rows, _ = _size(table)
+            if rows is not None:
+                rows_in = rows
+                break
+        with span(name, rows_in=rows_in) as record:
+            result = func(*args, **kwargs)
+            record['rows_out'], record['result_bytes'] = _size(result)
+        return result
+    return wrapper
+
+
+def instrument_class(cls):
+    '''
+    Class decorator instrumenting the public methods defined on the class apart from generator and context manager methods.
+    Private methods are left alone as helpers such as DataCleaning._get_digits run once per value, where writing a
+    record would cost more than the call. Generator and @contextmanager methods are left alone as a span around the
+    call cannot cover the caller's iteration or with block, it would only time creating the generator.
+    '''
+    for attribute, value in list(vars(cls).items()):
+        if attribute.startswith('_') or not inspect.isfunction(value) or inspect.isgeneratorfunction(value):
+            continue
+        if inspect.isgeneratorfunction(getattr(value, '__wrapped__', None)):
+            continue
+        setattr(cls, attribute, instrument(value))
+    return cls
+
+
+def summarise(path:str):
+    '''
+    Print a summary table of the records in a JSON lines file, one row per span name.
+
+    Parameters
+    ----------
+    path(str) : Path of the JSON lines file
+
+    Returns
+    -------
+    summary : dictionary of span name to aggregated values
+    '''
+    summary = {}
+    with open(path) as file:
+        for line in file:
+            record = json.loads(line)
+            totals = summary.setdefault(record['span'], {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'rows_out': 0, 'result_bytes': 0, 'process_peak_rss_mb': 0.0})
+            totals['calls'] += 1
+            totals['wall_s'] += record['wall_s']
+            totals['cpu_s'] += record['cpu_s']
+            totals['rows_out'] += record.get('rows_out') or 0
+            totals['result_bytes'] += record.get('result_bytes') or 0
+            totals['process_peak_rss_mb'] = max(totals['process_peak_rss_mb'], record.get('process_peak_rss_mb') or 0)
+    #the RSS column is the process high water mark when the span ended, it can include memory used by earlier spans
+    print(f"{'span':<45}{'calls':>7}{'wall':>10}{'cpu':>10}{'rows out':>12}{'result MB':>11}{'process peak RSS MB':>21}")
+    for name, totals in sorted(summary.items(), key=lambda item: item[1]['wall_s'], reverse=True):
+        print(f"{name:<45}{totals['calls']:>7}{totals['wall_s']:>9.2f}s{totals['cpu_s']:>9.2f}s"
+              f"{totals['rows_out']:>12}{totals['result_bytes'] / 1024**2:>11.1f}{totals['process_peak_rss_mb']:>21.1f}")
+    return summary
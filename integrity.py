@@ -0,0 +1,143 @@
+'''
+Referential integrity check of a star schema table against its dimension tables before it is written.
+
+Every foreign key of the orders must match a primary key in its dimension table or adding the
+foreign keys after the load fails. The primary keys of each dimension are put in a hashed index
+once and every foreign key column of the orders is looked up in its index, so orphaned keys, often
+left when a cleaner drops a dimension row, are found before anything is written. The orphaned rows
+are dropped, quarantined to a side table or stop the load, depending on the policy.
+'''
+import time
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from star_schema import STAR_SCHEMA, key_text, prepare_for_load
+
+ORPHAN_POLICIES = ('drop', 'quarantine', 'fail')
+
+
+def key_indexes_from_frames(frames:dict, table:str = 'orders_table'):
+    '''
+    Build the hashed key index of each dimension referenced by a table from the cleaned dimension frames.
+
+    Parameters
+    ----------
+    frames(dict) : Dictionary of dimension table name to its cleaned Pandas Dataframe object
+    table(str) : Star schema table holding the foreign keys
+
+    Returns
+    -------
+    key_indexes : dictionary of foreign key column to a Pandas Index of the referenced keys as text
+    '''
+    key_indexes = {}
+    for column, referenced in STAR_SCHEMA[table]['foreign_keys'].items():
+        primary_key = STAR_SCHEMA[referenced]['primary_key']
+        keys = frames[referenced][primary_key].dropna()
+        key_indexes[column] = pd.Index(key_text(keys, dict(STAR_SCHEMA[referenced]['columns'])[primary_key])).unique()
+    return key_indexes
+
+
+def load_key_indexes(db_connector, table:str = 'orders_table'):
+    '''
+    Build the hashed key index of each dimension referenced by a table from the loaded dimension tables.
+
+    Parameters
+    ----------
+    db_connector : DatabaseConnector for the database holding the dimension tables
+    table(str) : Star schema table holding the foreign keys
+
+    Returns
+    -------
+    key_indexes : dictionary of foreign key column to a Pandas Index of the referenced keys as text
+    '''
+    key_indexes = {}
+    with db_connector.connect() as connection:
+        for column, referenced in STAR_SCHEMA[table]['foreign_keys'].items():
+            primary_key = STAR_SCHEMA[referenced]['primary_key']
+            keys = connection.execute(text(f'SELECT "{primary_key}"::text FROM "{referenced}"')).scalars().all()
+            key_indexes[column] = pd.Index(keys, dtype=object)
+    return key_indexes
+
+
+def find_orphans(df, key_indexes:dict, table:str = 'orders_table'):
+    '''
+    Flag the foreign keys of each row that have no match in their dimension, nulls are not orphans.
+
+    Parameters
+    ----------
+    df : Pandas Dataframe object prepared for the table with prepare_for_load
+    key_indexes(dict) : Dictionary of foreign key column to the Pandas Index of referenced keys
+    table(str) : Star schema table holding the foreign keys
+
+    Returns
+    -------
+    orphaned : Pandas Dataframe object of booleans with a column per foreign key and the same index as df
+    '''
+    sql_types = dict(STAR_SCHEMA[table]['columns'])
+    orphaned = {}
+    for column, keys in key_indexes.items():
+        values = df[column]
+        #get_indexer looks every value up in the index's hash table, built once per index
+        found = keys.get_indexer(key_text(values, sql_types[column])) >= 0
+        orphaned[column] = values.notna().to_numpy() & ~found
+    return pd.DataFrame(orphaned, index=df.index)
+
+
+def quarantine_orphans(db_connector, orphans, orphaned, table:str = 'orders_table'):
+    '''
+    Append orphaned rows to the "<table>_orphans" side table with the keys that had no match and when they were quarantined.
+
+    Parameters
+    ----------
+    db_connector : DatabaseConnector for the database to write to
+    orphans : Pandas Dataframe object of the orphaned rows
+    orphaned : Pandas Dataframe object of booleans from find_orphans for the same rows
+    table(str) : Star schema table the rows were meant for
+
+    Returns
+    -------
+    None
+    '''
+    orphans = orphans.copy()
+    #every row has at least one orphaned key, multiplying by the flags keeps the names of those that are
+    labels = orphaned.dot(np.array([f'{column}, ' for column in orphaned.columns], dtype=object))
+    orphans['orphaned_keys'] = labels.str[:-2]
+    orphans['quarantined_at'] = pd.Timestamp.now()
+    with db_connector.begin() as connection:
+        orphans.to_sql(f'{table}_orphans', connection, if_exists='append', index=False)
+
+
+def enforce_integrity(df, key_indexes:dict, policy:str = 'quarantine', db_connector = None, table:str = 'orders_table'):
+    '''
+    Check every foreign key of a table's rows against the dimension keys and apply the orphan policy.
+    Prints the number of orphaned keys per foreign key column.
+
+    Parameters
+    ----------
+    df : Cleaned Pandas Dataframe object for the table
+    key_indexes(dict) : Dictionary of foreign key column to the Pandas Index of referenced keys
+    policy(str) : "drop" to leave the orphaned rows out, "quarantine" to also write them to the "<table>_orphans" table,
+                  "fail" to raise a ValueError before anything is written
+    db_connector : DatabaseConnector to quarantine to, needed for the "quarantine" policy
+    table(str) : Star schema table holding the foreign keys
+
+    Returns
+    -------
+    df : The cleaned Pandas Dataframe object without the orphaned rows
+    '''
+    if policy not in ORPHAN_POLICIES:
+        raise ValueError(f'Unknown orphan policy: {policy}, expected one of {ORPHAN_POLICIES}')
+    start = time.perf_counter()
+    prepared = prepare_for_load(df, table)
+    orphaned = find_orphans(prepared, key_indexes, table)
+    rows = orphaned.any(axis=1).to_numpy()
+    counts = orphaned.sum().to_dict()
+    print(f'{table}: {int(rows.sum())} of {len(df)} rows orphaned ({", ".join(f"{column} {count}" for column, count in counts.items())}) in {time.perf_counter() - start:.2f}s')
+    if not rows.any():
+        return df
+    if policy == 'fail':
+        raise ValueError(f'{table} has {int(rows.sum())} rows with foreign keys missing from their dimensions: {counts}')
+    if policy == 'quarantine':
+        quarantine_orphans(db_connector, prepared[rows], orphaned[rows], table)
+        print(f'{table}: {int(rows.sum())} orphaned rows quarantined to {table}_orphans')
+    return df[~rows]
@@ -0,0 +1,186 @@
+'''
+Incremental decoding of column oriented JSON, the layout of date_details.json.
+
+The file is one object per column mapping row labels to values:
+    {"timestamp": {"0": "22:00:06", "1": ...}, "month": {"0": "9", ...}, ...}
+with strings, numbers, booleans or nulls as the values, nested arrays and objects are not supported.
+The response is decoded a block at a time as it arrives. Each block is cut after its last complete
+label and value pair, the pairs before the cut are decoded together by the json module's C scanner
+and their values appended to one buffer per column. Neither the whole body nor a tree
+of per row objects is ever held. Rows can only be yielded once the last column has been read, as
+every column holds part of every row, so memory peaks at about the size of the decoded columns.
+Columns get the dtypes pandas.read_json would give them, inferred over the whole column so every
+chunk has the same dtypes.
+'''
+import codecs
+import json
+import re
+import numpy as np
+import pandas as pd
+
+#text that can not be decoded yet, a longer run means the document is not valid column oriented JSON
+MAX_PENDING = 64 * 1024**2
+_STRING = r'"(?:[^"\\]|\\.)*"'
+#the start of a column, or the end of the document
+COLUMN_START = re.compile(rf'\s*([{{,])\s*({_STRING})\s*:\s*\{{|\s*(?:\{{\s*)?\}}\s*$')
+
+
+def _infer_dtype(values:list):
+    '''
+    Convert a decoded column as pandas.read_json does. The dtype is inferred from the values, then columns
+    left as objects are converted to float64 and floats to int64 where no value changes.
+    '''
+    column = pd.Series(values).to_numpy()
+    if column.dtype == object:
+        try:
+            column = column.astype('float64')
+        except (TypeError, ValueError):
+            return column
+    if column.dtype == 'float64' and len(column) and not np.isnan(column).any() and np.abs(column).max() < 2**63:
+        integers = column.astype('int64')
+        if (integers == column).all():
+            return integers
+    return column
+
+
+class ColumnJSONDecoder:
+    '''
+    Decode a column oriented JSON document fed to it a block of text at a time.
+
+    Attributes
+    ----------
+    self.labels : Row labels of the first column, in order
+    self.columns : Dictionary of column name to its list of decoded values
+
+    Methods
+    -------
+    feed : Decode as much of the text received so far as is complete
+    frames : Yield the decoded table in chunks once the whole document has been fed
+    '''
+    def __init__(self):
+        self.labels = []
+        self.columns = {}
+        self._labels = None
+        self._values = None
+        self._distinct = None
+        self._buffer = ''
+        self._column = None
+        self._finished = False
+
+    def _add_pairs(self, text:str):
+        '''
+        Decode a run of label and value pairs and append them to the current column.
+        Returns None, or the position of the error and adds nothing if the text is not a complete run of pairs.
+        '''
+        try:
+            pairs = json.loads('{' + text + '}')
+        except json.JSONDecodeError as error:
+            return max(error.pos - 1, 0)
+        values = pairs.values()
+        self._labels.extend(pairs.keys())
+        #repeated values share one object, most columns hold a small set of distinct values
+        self._values.extend(map(self._distinct.setdefault, values, values))
+        return None
+
+    def _end_column(self):
+        '''
+        Store the current column, realigning it to the first column's row labels if they differ.
+        '''
+        if not self.columns:
+            self.labels = self._labels
+        elif self._labels != self.labels:
+            self._values = pd.Series(self._values, index=self._labels, dtype=object).reindex(self.labels).tolist()
+        self.columns[self._column] = self._values
+        self._column = self._distinct = None
+
+    def feed(self, text:str):
+        '''
+        Decode as much of the text received so far as is complete, keeping the rest for the next block.
+
+        Parameters
+        ----------
+        text(str) : Next block of the document
+
+        Returns
+        -------
+        None
+        '''
+        buffer = self._buffer + text
+        position = 0
+        while True:
+            if self._column is None:
+                match = COLUMN_START.match(buffer, position)
+                if match is None:
+                    break
+                if match.group(1) is None:
+                    self._finished = True
+                    position = match.end()
+                    break
+                first_column = not self.columns
+                if (match.group(1) == '{') != first_column:
+                    raise ValueError(f'Expected a column oriented JSON object at: {buffer[position:position + 80]!r}')
+                self._column = json.loads(match.group(2))
+                self._labels, self._values, self._distinct = [], [], {}
+                position = match.end()
+            #the first closing brace that decodes is the end of the column, one inside a string fails to decode
+            end = buffer.find('}', position)
+            while end != -1 and (error := self._add_pairs(buffer[position:end])) is not None:
+                end = buffer.find('}', max(end, position + error) + 1)
+            if end != -1:
+                position = end + 1
+                self._end_column()
+                continue
+            #otherwise decode up to the last comma before the pair cut off by the end of the block
+            end = buffer.rfind(',', position)
+            while end != -1 and (error := self._add_pairs(buffer[position:end])) is not None:
+                end = buffer.rfind(',', position, position + error)
+            if end != -1:
+                position = end + 1
+            break
+        self._buffer = buffer[position:]
+        if len(self._buffer) > MAX_PENDING:
+            raise ValueError(f'No complete JSON value in {MAX_PENDING} characters at: {self._buffer[:80]!r}')
+
+    def frames(self, chunksize:int = None):
+        '''
+        Yield the decoded table, in chunks of chunksize rows if given.
+
+        Parameters
+        ----------
+        chunksize(int) : Number of rows per chunk, None for the whole table in one frame
+
+        Yields
+        -------
+        Pandas Dataframe object of at most chunksize rows
+        '''
+        if not self._finished or self._buffer.strip():
+            raise ValueError('The JSON document ended before it was complete')
+        index = pd.Index(_infer_dtype(self.labels))
+        #each list of values is freed as soon as it is converted
+        columns = {name: _infer_dtype(self.columns.pop(name)) for name in list(self.columns)}
+        self.labels = []
+        chunksize = chunksize or max(len(index), 1)
+        for start in range(0, max(len(index), 1), chunksize):
+            yield pd.DataFrame({name: values[start:start + chunksize] for name, values in columns.items()}, index=index[start:start + chunksize])
+
+
+def read_column_json(blocks, chunksize:int = None, encoding:str = 'utf-8'):
+    '''
+    Decode a column oriented JSON document from an iterable of byte blocks, e.g. a streamed HTTP response.
+
+    Parameters
+    ----------
+    blocks : Iterable of bytes
+    chunksize(int) : Number of rows per yielded frame, None for the whole table in one frame
+    encoding(str) : Text encoding of the document
+
+    Yields
+    -------
+    Pandas Dataframe object of at most chunksize rows
+    '''
+    decoder = ColumnJSONDecoder()
+    text_decoder = codecs.getincrementaldecoder(encoding)()
+    for block in blocks:
+        decoder.feed(text_decoder.decode(block))
+    decoder.feed(text_decoder.decode(b'', final=True))
+    yield from decoder.frames(chunksize)
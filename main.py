@@ -1,90 +1,317 @@
-from data_cleaning import DataCleaning
-from data_extraction import DataExtractor
-from database_utils import DatabaseConnector
-import pandas as pd
-from decouple import config
+'''
+Command line entry point of the pipeline, with a subcommand per stage and "all" to run every stage.
 
-def __init__(self):
+    python main.py clean_events_data --chunksize 100000
+    python main.py clean_order_data --full-refresh
+    python main.py all --workers 4
+
+Each stage is registered with the modules it needs, which are imported only when that stage runs, so
+refreshing one table never starts tabula's JVM or loads botocore. Stages from other modules are added
+by listing them in PIPELINE_PLUGINS, they register themselves with stage_scheduler.register_stage.
+'''
+from functools import cached_property, partial
+import argparse
+import inspect
+import json
+import sys
+import instrumentation
+from stage_scheduler import STAGE_REGISTRY, StageScheduler, load_plugins, load_stage, register_stage
+from decouple import config, Csv
+
+#Store closed vocabulary columns as categories and downcast integers before upload
+COMPACT_DTYPES = config('COMPACT_DTYPES', default=False, cast=bool)
+#Library the clean methods run on, "pandas" or "polars" (needs the polars package)
+CLEANING_BACKEND = config('CLEANING_BACKEND', default='pandas')
+#Number of stages run at the same time
+PIPELINE_WORKERS = config('PIPELINE_WORKERS', default=4, cast=int)
+#Parsed PDF, JSON and store API data is cached on disk, refreshed when the source changes or the TTL passes
+CACHE_TTL_SECONDS = config('CACHE_TTL_SECONDS', default=24 * 60 * 60, cast=float)
+BYPASS_CACHE = config('BYPASS_CACHE', default=False, cast=bool)
+#Per call timings, rows and memory are appended to this JSON lines file when it is set
+INSTRUMENTATION_PATH = config('INSTRUMENTATION_PATH', default=None)
+instrumentation.configure(path=INSTRUMENTATION_PATH, trace_memory=config('TRACE_MEMORY', default=False, cast=bool))
+#Explain the data_queries.sql queries after the indexes are built and print the indexes each one uses
+CHECK_QUERY_PLANS = config('CHECK_QUERY_PLANS', default=False, cast=bool)
+#Product CSV read straight into memory with parallel ranged GETs, S3_ENDPOINT_URL points at MinIO or another S3 compatible store
+PRODUCTS_S3_ADDRESS = config('PRODUCTS_S3_ADDRESS', default='s3://data-handling-public/products.csv')
+S3_ENDPOINT_URL = config('S3_ENDPOINT_URL', default=None)
+#Store API endpoints, the store number is appended to STORE_ENDPOINT, HEADER_DICT is a JSON object of request headers e.g. {"x-api-key": "..."}
+NUMBER_OF_STORES_ENDPOINT = config('NUMBER_OF_STORES_ENDPOINT', default='https://aqj7u5id95.execute-api.eu-west-1.amazonaws.com/prod/number_stores')
+STORE_ENDPOINT = config('STORE_ENDPOINT', default='https://aqj7u5id95.execute-api.eu-west-1.amazonaws.com/prod/store_details/')
+#Orders whose keys are missing from a dimension are dropped, quarantined to orders_table_orphans or fail the load
+ORPHAN_POLICY = config('ORPHAN_POLICY', default='quarantine')
+
+#Modules defining extra stages, imported before the command line is read
+PIPELINE_PLUGINS = config('PIPELINE_PLUGINS', default='', cast=Csv())
+
+#modules every stage that extracts, cleans and uploads a source needs
+ETL_IMPORTS = ('pandas', 'data_extraction', 'data_cleaning', 'database_utils')
+
+def cached_extractor():
     '''
-    Initialises the database engine given the credentials 
-    Parameters
-    ----------
-    path_to_credentials : the file path to the credentials
+    DataExtractor that reads unchanged sources from the extraction cache
     '''
-    #AWS database credentials file name
-    aws_creds = config('AWS_CREDS')
-    #Local database credentials file name
-    local_creds = config('LOCAL_CREDS')
-    #initialise engine to connect to local database
-    self.local_engine = DatabaseConnector(local_creds)
-    # #initialise engine to connect to aws database
-    self.aws_engine = DatabaseConnector(aws_creds)
-
-def clean_user_data(self):
+    from data_extraction import DataExtractor
+    from extraction_cache import ExtractionCache
+    return DataExtractor(cache=ExtractionCache(ttl_seconds=CACHE_TTL_SECONDS, bypass=BYPASS_CACHE))
+
+class PipelineContext:
+    """
+    The database connectors a stage runs with, each one created the first time it is used
+
+    ...
+
+    Attributes
+    ----------
+    self.local_engine : DatabaseConnector for the local database, from the LOCAL_CREDS credentials file
+    self.aws_engine : DatabaseConnector for the AWS RDS database, from the AWS_CREDS credentials file
+
+    """
+    @cached_property
+    def local_engine(self):
+        from database_utils import DatabaseConnector
+        return DatabaseConnector(config('LOCAL_CREDS'))
+
+    @cached_property
+    def aws_engine(self):
+        from database_utils import DatabaseConnector
+        return DatabaseConnector(config('AWS_CREDS'))
+
+@register_stage(imports=ETL_IMPORTS)
+def clean_user_data(context, chunksize:int = None):
+    from data_cleaning import DataCleaning, clean_in_chunks
+    from data_extraction import DataExtractor
+    from parsing import report_parse_stats
+    #stream the user data in chunks when a chunk size is given
+    if chunksize:
+        dirty_chunks = DataExtractor().read_rds_table_in_chunks(table_name='legacy_users', db_connector=context.aws_engine, chunksize=chunksize)
+        #merged like the whole table so users that loaded orders still reference are kept
+        context.local_engine.merge_chunks_to_db(chunks=clean_in_chunks(dirty_chunks, 'clean_users', compact=COMPACT_DTYPES, backend=CLEANING_BACKEND), table='dim_users')
+        return
     #get user data from aws
-    dirty_user_data = DataExtractor().read_rds_table(table_name='legacy_users', db_connector=self.aws_engine)
+    dirty_user_data = DataExtractor().read_rds_table(table_name='legacy_users', db_connector=context.aws_engine)
     #clean the data
-    user_data_cleaner = DataCleaning(dirty_user_data)
+    user_data_cleaner = DataCleaning(dirty_user_data, compact=COMPACT_DTYPES, backend=CLEANING_BACKEND)
     cleaned_data = user_data_cleaner.clean_users()
-    #send to local
-    self.local_engine.upload_to_db(df=cleaned_data, table='dim_users')
+    report_parse_stats(user_data_cleaner.parse_stats)
+    #send to local, writing only the rows that changed since the last run
+    context.local_engine.merge_to_db(df=cleaned_data, table='dim_users')
 
 
-def clean_card_data(self):
+@register_stage(imports=('tabula', 'requests') + ETL_IMPORTS)
+def clean_card_data(context):
+    from data_cleaning import DataCleaning
+    from parsing import report_parse_stats
     #get the card data from pdf
-    dirty_pdf_data = DataExtractor().retrieve_pdf_data('https://data-handling-public.s3.eu-west-1.amazonaws.com/card_details.pdf')
+    dirty_pdf_data = cached_extractor().retrieve_pdf_data('https://data-handling-public.s3.eu-west-1.amazonaws.com/card_details.pdf')
     #clean the card data
-    pdf_data_cleaner = DataCleaning(dirty_pdf_data)
+    pdf_data_cleaner = DataCleaning(dirty_pdf_data, compact=COMPACT_DTYPES, backend=CLEANING_BACKEND)
     cleaned_pdf_data = pdf_data_cleaner.clean_card_data()
+    report_parse_stats(pdf_data_cleaner.parse_stats)
     #send card data to local
-    self.local_engine.upload_to_db(df=cleaned_pdf_data, table='dim_card_details')
+    context.local_engine.merge_to_db(df=cleaned_pdf_data, table='dim_card_details')
     
-def pull_store_data():
-    # Pull data from API - Commented out so not to spend 4mins pulling each time
-    api_pulling_extractor = DataExtractor()
-    number_of_stores = api_pulling_extractor.list_number_of_stores()
-    headers_dict = config("HEADER_DICT")
-    endpoint = config("ENDPOINT")
-    column_headers_list = api_pulling_extractor.get_column_headers(endpoint=endpoint, header_dict=headers_dict )
-    api_pulling_extractor.retrieve_stores_data_to_csv(number_of_stores=number_of_stores, endpoint=endpoint, header_dict=headers_dict, column_header_list=column_headers_list)
-
-def clean_store_data(self):
-    #get store data from csv
-    dirty_api_data = pd.read_csv('store.csv', index_col='index')
+@register_stage(imports=('requests', 'data_extraction'))
+def pull_store_data(context):
+    #pull every store from the API and stage it, served from the extraction cache within the TTL
+    api_pulling_extractor = cached_extractor()
+    headers_dict = json.loads(config('HEADER_DICT'))
+    number_of_stores = api_pulling_extractor.list_number_of_stores(endpoint=NUMBER_OF_STORES_ENDPOINT, header_dict=headers_dict)
+    api_pulling_extractor.retrieve_stores_data_to_staging(number_of_stores=number_of_stores, endpoint=STORE_ENDPOINT, header_dict=headers_dict)
+
+@register_stage(depends_on=['pull_store_data'], imports=ETL_IMPORTS)
+def clean_store_data(context):
+    from data_cleaning import DataCleaning
+    from data_extraction import DataExtractor
+    from parsing import report_parse_stats
+    #get store data staged by pull_store_data
+    dirty_api_data = DataExtractor().extract_from_staging('store.arrow')
     #clean store data
-    api_data_cleaner = DataCleaning(dirty_api_data)
+    api_data_cleaner = DataCleaning(dirty_api_data, compact=COMPACT_DTYPES, backend=CLEANING_BACKEND)
     cleaned_api_data = api_data_cleaner.clean_store_data()
+    report_parse_stats(api_data_cleaner.parse_stats)
     #push store data to local
-    self.local_engine.upload_to_db(df=cleaned_api_data, table='dim_store_details')
+    context.local_engine.merge_to_db(df=cleaned_api_data, table='dim_store_details')
     
-def clean_product_data(self):
-    #Pull order data from s3 bucket and save csv
-    dirty_product_data = DataExtractor().extract_from_csv('product_data.csv')
+@register_stage(imports=('boto3',) + ETL_IMPORTS)
+def clean_product_data(context):
+    from data_cleaning import DataCleaning
+    from data_extraction import DataExtractor
+    from parsing import report_parse_stats
+    #read the product data from S3 into memory, no staging file is written
+    dirty_product_data = DataExtractor(s3_endpoint_url=S3_ENDPOINT_URL).extract_from_s3(PRODUCTS_S3_ADDRESS, staging_path=None)
     #pass the dirty product data into data cleaning instance and then run the function to clean the data
-    product_data_cleaner = DataCleaning(dirty_product_data)
+    product_data_cleaner = DataCleaning(dirty_product_data, compact=COMPACT_DTYPES, backend=CLEANING_BACKEND)
     clean_product_data = product_data_cleaner.clean_products_data()
-    self.local_engine.upload_to_db(df=clean_product_data, table='dim_products')
-
-def clean_order_data(self):
-    #Get orders table from AWS
-    dirty_order_data = DataExtractor().read_rds_table(table_name='orders_table', db_connector=self.aws_engine)
-    #clean order data
-    order_data_cleaner = DataCleaning(dirty_order_data)
-    clean_order_data = order_data_cleaner.clean_order_data()
-    #push order data to local
-    self.local_engine.upload_to_db(df=clean_order_data, table='orders_table')
-
-def clean_events_data(self):
-    dirty_events_data = DataExtractor().extract_json_from_s3('https://data-handling-public.s3.eu-west-1.amazonaws.com/date_details.json')
-    event_data_cleaner = DataCleaning(dirty_events_data)
+    report_parse_stats(product_data_cleaner.parse_stats)
+    context.local_engine.merge_to_db(df=clean_product_data, table='dim_products')
+
+@register_stage(depends_on=['clean_user_data', 'clean_card_data', 'clean_store_data', 'clean_product_data', 'clean_events_data'], imports=ETL_IMPORTS + ('integrity', 'sales_aggregates', 'star_schema'))
+def clean_order_data(context, chunksize:int = None, full_refresh:bool = False):
+    from data_cleaning import DataCleaning, clean_in_chunks
+    from data_extraction import DataExtractor
+    from integrity import enforce_integrity, load_key_indexes
+    from parsing import report_parse_stats
+    from sales_aggregates import SalesAggregates
+    from star_schema import prepare_for_load
+    extractor = DataExtractor()
+    #the dimension keys the orders are checked against before they are written
+    key_indexes = load_key_indexes(context.local_engine)
+    def check_keys(orders):
+        return enforce_integrity(orders, key_indexes, policy=ORPHAN_POLICY, db_connector=context.local_engine)
+    watermark = None if full_refresh else context.local_engine.get_watermark('orders_table')
+    if watermark is not None:
+        #only pull the orders added since the last run and upsert them on the index
+        dirty_order_data = extractor.read_rds_table_since(table_name='orders_table', db_connector=context.aws_engine, watermark_column='index', watermark=watermark)
+        if dirty_order_data.empty:
+            print('orders_table up to date')
+            return
+        clean_order_data = DataCleaning(dirty_order_data, compact=COMPACT_DTYPES, backend=CLEANING_BACKEND).clean_order_data().reset_index()
+        context.local_engine.upsert_to_db(df=prepare_for_load(check_keys(clean_order_data), 'orders_table'), table='orders_table', key_columns=['index'])
+        #orphaned orders are past the watermark too, they are not pulled again
+        context.local_engine.set_watermark('orders_table', 'index', clean_order_data['index'].max())
+        return
+    #take the watermark before extracting so orders added during the load are picked up next run
+    new_watermark = extractor.read_rds_max_value(table_name='orders_table', db_connector=context.aws_engine, column='index')
+    #stream the orders table in chunks when a chunk size is given
+    if chunksize:
+        dirty_chunks = extractor.read_rds_table_in_chunks(table_name='orders_table', db_connector=context.aws_engine, chunksize=chunksize)
+        clean_chunks = (check_keys(chunk.reset_index()) for chunk in clean_in_chunks(dirty_chunks, 'clean_order_data', compact=COMPACT_DTYPES, backend=CLEANING_BACKEND))
+        context.local_engine.typed_upload_chunks_to_db(chunks=clean_chunks, table='orders_table')
+    else:
+        #Get orders table from AWS
+        dirty_order_data = extractor.read_rds_table(table_name='orders_table', db_connector=context.aws_engine)
+        #clean order data, keeping the index column as the key for incremental upserts
+        order_data_cleaner = DataCleaning(dirty_order_data, compact=COMPACT_DTYPES, backend=CLEANING_BACKEND)
+        clean_order_data = check_keys(order_data_cleaner.clean_order_data().reset_index())
+        report_parse_stats(order_data_cleaner.parse_stats)
+        #push order data to local
+        context.local_engine.typed_upload_to_db(df=clean_order_data, table='orders_table')
+    context.local_engine.set_watermark('orders_table', 'index', new_watermark)
+    #every order was reloaded so the sales summary has to be rebuilt rather than added to
+    SalesAggregates(context.local_engine).invalidate()
+
+@register_stage(imports=('requests',) + ETL_IMPORTS)
+def clean_events_data(context, chunksize:int = None):
+    from data_cleaning import DataCleaning, clean_in_chunks
+    from data_extraction import DataExtractor
+    from parsing import report_parse_stats
+    events_url = 'https://data-handling-public.s3.eu-west-1.amazonaws.com/date_details.json'
+    #decode the events JSON as it downloads and clean and upload it in chunks when a chunk size is given
+    if chunksize:
+        dirty_chunks = DataExtractor().stream_json_from_s3(events_url, chunksize=chunksize)
+        context.local_engine.typed_upload_chunks_to_db(chunks=clean_in_chunks(dirty_chunks, 'clean_events_data', compact=COMPACT_DTYPES, backend=CLEANING_BACKEND), table='dim_date_times')
+        return
+    dirty_events_data = cached_extractor().extract_json_from_s3(events_url)
+    event_data_cleaner = DataCleaning(dirty_events_data, compact=COMPACT_DTYPES, backend=CLEANING_BACKEND)
     clean_events_data = event_data_cleaner.clean_events_data()
-    self.local_engine.upload_to_db(df=clean_events_data, table='dim_date_times')
-
-if __name__ == "__main__":    
-    clean_user_data()
-    clean_card_data()
-    pull_store_data()
-    clean_store_data()
-    clean_product_data()
-    clean_order_data()
-    clean_events_data()
+    report_parse_stats(event_data_cleaner.parse_stats)
+    context.local_engine.typed_upload_to_db(df=clean_events_data, table='dim_date_times')
+
+@register_stage(depends_on=['clean_order_data'], imports=('database_utils',))
+def add_foreign_keys(context):
+    #replacing a dimension table drops the foreign keys from the orders to it
+    context.local_engine.add_foreign_keys('orders_table')
+
+@register_stage(depends_on=['add_foreign_keys'], imports=('database_utils', 'query_plans'))
+def build_indexes(context):
+    from query_plans import check_index_usage
+    #index the foreign keys and the columns the analytics queries group on, after the bulk load
+    context.local_engine.build_indexes()
+    if CHECK_QUERY_PLANS:
+        check_index_usage(context.local_engine)
+
+@register_stage(depends_on=['clean_order_data'], imports=('database_utils', 'sales_aggregates'))
+def refresh_sales_summary(context):
+    from sales_aggregates import SalesAggregates
+    #add the newly loaded orders to the pre-aggregated sales used by the analytics queries
+    SalesAggregates(context.local_engine).refresh()
+
+def stage_options(name:str):
+    '''
+    The keyword options of a stage function, those after the context, as (name, type, default) triples
+    '''
+    options = []
+    for parameter in list(inspect.signature(STAGE_REGISTRY[name][0]).parameters.values())[1:]:
+        option_type = parameter.annotation
+        #unannotated options take the type of their default, or are read as text
+        if option_type is inspect.Parameter.empty:
+            option_type = str if parameter.default in (None, inspect.Parameter.empty) else type(parameter.default)
+        options.append((parameter.name, option_type, parameter.default))
+    return options
+
+def run_stage(name:str, **options):
+    '''
+    Import the modules a stage needs and run it with its own database connectors, used to run stages in worker processes
+    Parameters
+    ----------
+    name : name of a registered stage
+    options : keyword options passed to the stage function
+    '''
+    load_stage(name)(PipelineContext(), **options)
+
+def build_scheduler(options:dict = None):
+    '''
+    Schedule every registered stage after the stages it depends on.
+    The store data must be pulled before it is cleaned, the orders land after every dimension table
+    and the foreign keys, indexes and sales summary are added once the orders have landed.
+    Parameters
+    ----------
+    options : keyword options passed to every stage that takes them, e.g. chunksize
+    '''
+    options = options or {}
+    scheduler = StageScheduler()
+    for name, (_, _, depends_on) in STAGE_REGISTRY.items():
+        accepted = {option: options[option] for option, _, _ in stage_options(name) if option in options}
+        scheduler.add_stage(name, partial(run_stage, name, **accepted), depends_on=depends_on)
+    return scheduler
+
+def build_parser():
+    '''
+    Command line parser with a subcommand per registered stage, taking that stage's options, and "all".
+    '''
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='stage', required=True, metavar='stage')
+    every_option = {}
+    for name, (_, _, depends_on) in STAGE_REGISTRY.items():
+        after = f', in "all" it runs after {", ".join(depends_on)}' if depends_on else ''
+        subparser = subparsers.add_parser(name, help=f'run {name} on its own{after}')
+        for option, option_type, default in stage_options(name):
+            every_option[option] = (option_type, default)
+            _add_option(subparser, option, option_type, default)
+    subparser = subparsers.add_parser('all', help='run every stage, each one once its dependencies have finished')
+    subparser.add_argument('--workers', type=int, default=PIPELINE_WORKERS, help='number of stages run at the same time')
+    for option, (option_type, default) in every_option.items():
+        _add_option(subparser, option, option_type, default)
+    return parser
+
+def _add_option(parser, option:str, option_type, default):
+    '''
+    Add a stage option to a parser, booleans become flags
+    '''
+    flag = '--' + option.replace('_', '-')
+    if option_type is bool:
+        parser.add_argument(flag, dest=option, action='store_true')
+    elif default is inspect.Parameter.empty:
+        parser.add_argument(flag, dest=option, type=option_type, required=True)
+    else:
+        parser.add_argument(flag, dest=option, type=option_type, default=default)
+
+def main(argv:list[str] = None):
+    '''
+    Run the stage named on the command line, or every stage when none is given
+    '''
+    argv = sys.argv[1:] if argv is None else argv
+    load_plugins(PIPELINE_PLUGINS)
+    args = vars(build_parser().parse_args(argv or ['all']))
+    stage = args.pop('stage')
+    if stage == 'all':
+        workers = args.pop('workers')
+        build_scheduler(args).run(max_workers=workers)
+    else:
+        run_stage(stage, **args)
+    if INSTRUMENTATION_PATH:
+        instrumentation.summarise(INSTRUMENTATION_PATH)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+'''
+Parse columns by their distinct values.
+
+Date, price, weight and number columns repeat a small set of values across many rows. Each column is
+factorized, only the distinct values are parsed and the results are mapped back onto the rows by their
+codes. Dates are tried against a list of known formats, those matching most of a sample of the column
+first, before falling back to pandas inferring the format of each remaining value on its own.
+'''
+import time
+import pandas as pd
+
+#Date formats seen in the sources, no value matches more than one so the order they are tried in only changes the time taken
+KNOWN_DATE_FORMATS = ['%Y-%m-%d', '%Y %B %d', '%B %Y %d', '%Y/%m/%d', '%Y-%m-%d %H:%M:%S']
+FORMAT_SAMPLE_SIZE = 1000
+
+
+def memoized(series, parse, name:str = None, stats:dict = None):
+    '''
+    Parse the distinct values of a series and map the results back onto its rows.
+    Nulls are not passed to parse and come back as missing values.
+
+    Parameters
+    ----------
+    series : Pandas Series to parse
+    parse : function taking a Series of the distinct values as objects and a record dictionary it may add counts to,
+            returning an array like of the parsed values in the same order
+    name(str) : Name the record is stored under, the series name by default
+    stats(dict) : Dictionary the record of rows, distinct values and seconds is added to
+
+    Returns
+    -------
+    parsed : Pandas Series with the parsed value of each row and the same index
+    '''
+    start = time.perf_counter()
+    codes, distinct = pd.factorize(series)
+    record = {'rows': len(series), 'distinct': len(distinct)}
+    parsed = pd.Series(parse(pd.Series(distinct, dtype=object), record)).to_numpy()
+    #code -1 marks a missing value and takes NaN or NaT
+    values = pd.api.extensions.take(parsed, codes, allow_fill=True)
+    record['seconds'] = time.perf_counter() - start
+    if stats is not None:
+        stats[name or series.name] = record
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+def _format_order(values):
+    '''
+    Order the known date formats by how many of a sample of the values each parses, most first, ties keep their list order.
+    '''
+    sample = values.iloc[:FORMAT_SAMPLE_SIZE]
+    hits = {date_format: pd.to_datetime(sample, format=date_format, errors='coerce').notna().sum() for date_format in KNOWN_DATE_FORMATS}
+    return sorted(KNOWN_DATE_FORMATS, key=lambda date_format: -hits[date_format])
+
+
+def _parse_distinct_dates(values, record:dict):
+    '''
+    Parse distinct date strings with the known formats then infer the format of any left over, one value at a time.
+    '''
+    values = values.astype(str)
+    parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    remaining = values
+    for date_format in _format_order(values):
+        if remaining.empty:
+            break
+        attempt = pd.to_datetime(remaining, format=date_format, errors='coerce')
+        hits = attempt.notna()
+        if hits.any():
+            parsed[hits[hits].index] = attempt[hits]
+            remaining = remaining[~hits]
+    record['known_format'] = len(values) - len(remaining)
+    inferred = 0
+    for index, value in remaining.items():
+        timestamp = pd.to_datetime(value, errors='coerce')
+        if timestamp is not pd.NaT and timestamp.tzinfo is None:
+            parsed[index] = timestamp
+            inferred += 1
+    record['inferred'] = inferred
+    return parsed
+
+
+def parse_dates(series, name:str = None, stats:dict = None):
+    '''
+    Parse a column of dates by its distinct values, unparseable values become NaT.
+    Unlike pandas.to_datetime on the whole column, values in a different format from the first are still parsed.
+
+    Parameters
+    ----------
+    series : Pandas Series of date strings
+    name(str) : Name the parse record is stored under
+    stats(dict) : Dictionary the parse record is added to
+
+    Returns
+    -------
+    dates : datetime64 Pandas Series
+    '''
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    return memoized(series, _parse_distinct_dates, name, stats)
+
+
+def parse_numbers(series, name:str = None, stats:dict = None):
+    '''
+    Convert a column to numbers by its distinct values as pandas.to_numeric with errors="coerce" does.
+
+    Parameters
+    ----------
+    series : Pandas Series to convert
+    name(str) : Name the parse record is stored under
+    stats(dict) : Dictionary the parse record is added to
+
+    Returns
+    -------
+    numbers : numeric Pandas Series
+    '''
+    return memoized(series, lambda values, record: pd.to_numeric(values, errors='coerce'), name, stats)
+
+
+def report_parse_stats(stats:dict):
+    '''
+    Print the rows, distinct values, memo hit ratio and time of each parsed column.
+
+    Parameters
+    ----------
+    stats(dict) : Dictionary of parse records from memoized
+
+    Returns
+    -------
+    None
+    '''
+    for name, record in stats.items():
+        hit_ratio = 1 - record['distinct'] / record['rows'] if record['rows'] else 0
+        line = f"{name}: {record['rows']} rows, {record['distinct']} distinct ({hit_ratio:.1%} memo hits) in {record['seconds']:.2f}s"
+        if 'known_format' in record:
+            line += f", {record['known_format']} by known format, {record['inferred']} inferred"
+        print(line)
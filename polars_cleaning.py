@@ -0,0 +1,260 @@
+'''
+Polars backend for the DataCleaning clean methods.
+
+Each clean method is written as a Polars lazy query with the same validation rules, repairs and
+type conversions as the pandas methods in data_cleaning.py, so the string operations are planned
+together and run across all cores. The pandas table is converted in and out, keeping its index,
+and the cleaned columns are given the dtypes the pandas backend returns.
+
+Dates are parsed by parsing.parse_dates inside the query, so the date formats accepted are exactly
+those of the pandas backend. Needs the optional polars package, DataCleaning only imports this module
+when the polars backend is chosen.
+'''
+import pandas as pd
+import polars as pl
+from data_cleaning import CARD_RULES, EVENT_RULES, PRODUCT_RULES, STORE_RULES, USER_RULES, report_rejections
+from parsing import parse_dates
+
+#name given to the pandas index while the table is in Polars
+INDEX = '__index__'
+WEIGHT_PATTERN = r'(?s)^(?:(?P<value>.*)(?P<unit>kg|ml|oz)|(?P<dot_value>.*)(?P<dot_unit>.{2}) \.|(?P<g_value>.*)(?P<g_unit>g))$'
+
+
+def _to_lazy(df):
+    '''
+    Convert a pandas table to a LazyFrame, keeping the index as a column.
+    Object columns holding a mix of strings and other values are converted to strings first as Polars columns have one type.
+    '''
+    df = df.reset_index(names=INDEX)
+    for column in df.columns[df.dtypes == object]:
+        if pd.api.types.infer_dtype(df[column], skipna=True) not in ('string', 'empty'):
+            df[column] = df[column].astype('string')
+    return pl.from_pandas(df).lazy()
+
+
+def _to_pandas(frame, index_column:str, index_name, string_columns:list[str]):
+    '''
+    Convert a cleaned Polars frame back to pandas with the given index and the pandas backend's string columns.
+    '''
+    df = frame.to_pandas()
+    if index_column != INDEX:
+        df = df.drop(columns=[INDEX])
+    df = df.set_index(index_column)
+    df.index.name = index_name if index_column == INDEX else index_column
+    for column in string_columns:
+        df[column] = df[column].astype('string')
+    return df
+
+
+def _strings(*columns):
+    '''
+    Cast columns to strings, as astype("string") does in the pandas backend.
+    '''
+    return [pl.col(column).cast(pl.String) for column in columns]
+
+
+def _to_datetime(column:str):
+    '''
+    Parse a column with parsing.parse_dates so dates are parsed exactly as in the pandas backend.
+    '''
+    return pl.col(column).map_batches(
+        lambda series: pl.from_pandas(parse_dates(series.to_pandas())),
+        return_dtype=pl.Datetime('ns'),
+    )
+
+
+def _to_numeric(column:str):
+    '''
+    Convert a column to floats with unparseable values as nulls, as pandas.to_numeric with errors="coerce" does.
+    '''
+    return pl.col(column).cast(pl.String).str.strip_chars().cast(pl.Float64, strict=False)
+
+
+def _validate_address(column:str):
+    '''
+    Strip leading and trailing whitespace and replace new lines with a space.
+    '''
+    return pl.col(column).str.replace(r'\s+$', '').str.replace(r'^\s+', '').str.replace_all(r'\n', ' ')
+
+
+def _remove_nulls(lf, exclude:list[str]):
+    '''
+    Replace "NULL" strings with nulls and drop rows where every column outside exclude is null.
+    '''
+    schema = lf.collect_schema()
+    columns = [column for column in schema.names() if column not in exclude]
+    lf = lf.with_columns([
+        pl.when(pl.col(column) == 'NULL').then(None).otherwise(pl.col(column)).alias(column)
+        for column in columns if schema[column] == pl.String
+    ])
+    return lf.filter(pl.any_horizontal([pl.col(column).is_not_null() for column in columns]))
+
+
+def _rule_passes(rule:dict):
+    '''
+    Expression that is True where a row passes a validation rule, nulls fail.
+    '''
+    values = pl.col(rule['column'])
+    if rule['rule'] == 'isin':
+        passed = values.is_in(rule['value'])
+    elif rule['rule'] == 'match':
+        passed = values.str.contains(f"^(?:{rule['value']})")
+    elif rule['rule'] == 'fullmatch':
+        passed = values.str.contains(f"^(?:{rule['value']})$")
+    elif rule['rule'] == 'not_match':
+        passed = ~values.str.contains(f"^(?:{rule['value']})")
+    elif rule['rule'] == 'max_length':
+        passed = values.str.len_chars() <= rule['value']
+    else:
+        raise ValueError(f"Unknown validation rule: {rule['rule']}")
+    return passed.fill_null(False)
+
+
+def _apply_rules(lf, rules:list[dict]):
+    '''
+    Repair and validate the columns in the rules, collect the query so far and filter it once.
+
+    Returns
+    -------
+    lf : LazyFrame of the rows passing every rule
+    rejected_rows : dictionary of rule name to the number of rows failing it
+    '''
+    flags = []
+    for i, rule in enumerate(rules):
+        column = pl.col(rule['column']).cast(pl.String)
+        for pattern, replacement in rule.get('repair', {}).items():
+            column = column.str.replace_all(pattern, replacement)
+        flags.append(f'__rule_{i}')
+        lf = lf.with_columns(column.alias(rule['column'])).with_columns(_rule_passes(rule).alias(flags[-1]))
+    frame = lf.collect()
+    rejected_rows = {f"{rule['column']} {rule['rule']}": frame.height - int(frame[flag].sum()) for rule, flag in zip(rules, flags)}
+    kept = frame.filter(pl.all_horizontal(flags)).drop(flags)
+    report_rejections(rejected_rows, frame.height - kept.height, frame.height)
+    return kept.lazy(), rejected_rows
+
+
+def clean_users(lf):
+    '''
+    DataCleaning.clean_users as a lazy query.
+    '''
+    string_columns = ['first_name', 'last_name', 'company', 'email_address', 'address', 'country', 'country_code', 'phone_number']
+    lf = lf.with_columns(
+        *_strings(*string_columns),
+        _to_datetime('date_of_birth'),
+        _to_datetime('join_date'),
+    ).with_columns(_validate_address('address'))
+    lf, rejected_rows = _apply_rules(lf, USER_RULES)
+    lf = _remove_nulls(lf, exclude=[INDEX, 'index'])
+    return lf.collect(), 'index', string_columns, rejected_rows
+
+
+def clean_card_data(lf):
+    '''
+    DataCleaning.clean_card_data as a lazy query.
+    '''
+    string_columns = ['card_number', 'card_provider', 'expiry_date']
+    lf = _remove_nulls(lf, exclude=[INDEX])
+    lf = lf.with_columns(*_strings(*string_columns), _to_datetime('date_payment_confirmed'))
+    lf, rejected_rows = _apply_rules(lf, CARD_RULES)
+    return lf.collect(), INDEX, string_columns, rejected_rows
+
+
+def clean_store_data(lf):
+    '''
+    DataCleaning.clean_store_data as a lazy query, _replace_nulls_if_web is left out as it does not change the table.
+    '''
+    string_columns = ['address', 'locality', 'store_code', 'store_type', 'country_code', 'continent']
+    staff_numbers = pl.col('staff_numbers').cast(pl.String).str.replace_all(r'\D', '').cast(pl.Int64, strict=False)
+    lf = lf.drop('lat').with_columns(
+        *_strings(*string_columns),
+        staff_numbers,
+        #pandas.to_numeric gives floats if any staff number is missing before the rows are filtered
+        staff_numbers.is_null().any().alias('__staff_numbers_missing'),
+        _to_numeric('longitude'),
+        _to_numeric('latitude'),
+        _to_datetime('opening_date'),
+    )
+    lf, rejected_rows = _apply_rules(lf, STORE_RULES)
+    lf = lf.with_columns(pl.col('continent').str.replace_all('ee', ''), _validate_address('address'))
+    frame = _remove_nulls(lf, exclude=[INDEX, '__staff_numbers_missing']).collect()
+    if frame.height == 0 or frame['__staff_numbers_missing'][0]:
+        frame = frame.with_columns(pl.col('staff_numbers').cast(pl.Float64))
+    return frame.drop('__staff_numbers_missing'), INDEX, string_columns, rejected_rows
+
+
+def _weight_in_kg(column:str):
+    '''
+    Parse weights into values and units and convert them to kg, matching DataCleaning._convert_product_weights.
+    '''
+    weights = pl.col(column)
+    #groups 1, 3 and 5 are the values and 2, 4 and 6 the units of the three alternatives in WEIGHT_PATTERN
+    value = pl.coalesce(*[weights.str.extract(WEIGHT_PATTERN, group) for group in (1, 3, 5)])
+    unit = pl.coalesce(*[weights.str.extract(WEIGHT_PATTERN, group) for group in (2, 4, 6)])
+    count = value.str.extract(r'^(\d+) x (\d+)', 1).cast(pl.Int64)
+    size = value.str.extract(r'^(\d+) x (\d+)', 2).cast(pl.Int64)
+    weight = pl.when(count.is_not_null()).then(count * size / 100).otherwise(value.cast(pl.Float64, strict=False))
+    divisor = unit.replace_strict({'g': 1000.0, 'ml': 1000.0, 'oz': 35.274}, default=1.0, return_dtype=pl.Float64)
+    return weight / divisor
+
+
+def clean_products_data(lf):
+    '''
+    DataCleaning.clean_products_data as a lazy query.
+    '''
+    string_columns = ['product_name', 'category', 'EAN', 'uuid', 'removed', 'product_code']
+    lf = _remove_nulls(lf, exclude=[INDEX])
+    lf = lf.with_columns(*_strings(*string_columns), _to_datetime('date_added'))
+    lf, rejected_rows = _apply_rules(lf, PRODUCT_RULES)
+    lf = _remove_nulls(lf.with_columns(pl.col('weight').cast(pl.String)), exclude=[INDEX])
+    price = pl.col('product_price').cast(pl.String)
+    for symbol in ['£', ',', '$']:
+        price = price.str.replace_all(symbol, '', literal=True)
+    #parse each distinct weight once and join the kg values back, the catalogue repeats a small set of weights
+    kilograms = lf.select(pl.col('weight').unique()).with_columns(_weight_in_kg('weight').alias('__kilograms'))
+    lf = lf.join(kilograms, on='weight', how='left', nulls_equal=True, maintain_order='left')
+    lf = lf.with_columns(pl.col('__kilograms').alias('weight'), price.alias('product_price')).with_columns(_to_numeric('product_price'))
+    return lf.drop('__kilograms').collect(), INDEX, string_columns, rejected_rows
+
+
+def clean_order_data(lf):
+    '''
+    DataCleaning.clean_order_data as a lazy query.
+    '''
+    return lf.drop('first_name', 'last_name', '1', 'level_0').collect(), 'index', [], {}
+
+
+def clean_events_data(lf):
+    '''
+    DataCleaning.clean_events_data as a lazy query.
+    '''
+    lf, rejected_rows = _apply_rules(lf, EVENT_RULES)
+    return lf.collect(), INDEX, [], rejected_rows
+
+
+#each returns the collected frame, the column to use as the index, the string columns and the rejected rows
+CLEAN_METHODS = {
+    'clean_users': clean_users,
+    'clean_card_data': clean_card_data,
+    'clean_store_data': clean_store_data,
+    'clean_products_data': clean_products_data,
+    'clean_order_data': clean_order_data,
+    'clean_events_data': clean_events_data,
+}
+
+
+def clean_with_polars(df, clean_method:str):
+    '''
+    Run a clean method on a pandas table with the Polars backend.
+
+    Parameters
+    ----------
+    df : Pandas Dataframe object to clean
+    clean_method(str) : Name of the DataCleaning method, e.g. "clean_users"
+
+    Returns
+    -------
+    df : The cleaned Pandas Dataframe object
+    rejected_rows : Number of rows failing each validation rule
+    '''
+    frame, index_column, string_columns, rejected_rows = CLEAN_METHODS[clean_method](_to_lazy(df))
+    return _to_pandas(frame, index_column, df.index.name, string_columns), rejected_rows
@@ -0,0 +1,84 @@
+'''
+EXPLAIN based check of which indexes the analytics queries in data_queries.sql use.
+
+Each SELECT in the file is explained, not run, and the index names found anywhere in its plan are
+reported next to the question comment above it. Indexes no query uses are listed at the end.
+'''
+from star_schema import INDEXES, index_sql
+
+
+def split_queries(sql:str):
+    '''
+    Split a SQL file on ";" into (question, statement) pairs, the question being the last comment line before
+    the statement's first line. A statement with no comment of its own, like one of several answering the same
+    question, takes the last comment above it in the file.
+
+    Parameters
+    ----------
+    sql(str) : Contents of the SQL file
+
+    Returns
+    -------
+    queries : list of (question, statement) pairs
+    '''
+    queries = []
+    last_comment = None
+    for chunk in sql.split(';'):
+        question = None
+        lines = []
+        for line in (line.strip() for line in chunk.splitlines()):
+            if line.startswith('--'):
+                last_comment = line.lstrip('- ')
+            elif line:
+                if not lines:
+                    question = last_comment
+                lines.append(line)
+        if lines:
+            queries.append((question or lines[0], '\n'.join(lines)))
+    return queries
+
+
+def _plan_indexes(node:dict):
+    '''
+    Names of the indexes scanned anywhere in a JSON plan node and its children.
+    '''
+    names = {node['Index Name']} if 'Index Name' in node else set()
+    for child in node.get('Plans', []):
+        names |= _plan_indexes(child)
+    return names
+
+
+def check_index_usage(db_connector, sql_path:str = 'data_queries.sql', indexes:list = INDEXES):
+    '''
+    Explain every SELECT in a SQL file and print the indexes each plan uses.
+    Statements that are not queries, or fail to plan, are skipped.
+
+    Parameters
+    ----------
+    db_connector : DatabaseConnector for the database holding the star schema
+    sql_path(str) : Path of the SQL file
+    indexes(list) : List of (table, columns) pairs expected to be used
+
+    Returns
+    -------
+    usage : dictionary of question to the set of index names its plan uses
+    '''
+    with open(sql_path) as file:
+        queries = split_queries(file.read())
+    usage = {}
+    for question, statement in queries:
+        if not statement.upper().startswith(('SELECT', 'WITH')):
+            continue
+        try:
+            with db_connector.begin() as connection:
+                plan = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {statement}').scalar()
+        except Exception as error:
+            print(f'skipped "{question}": {str(error).splitlines()[0]}')
+            continue
+        usage[question] = _plan_indexes(plan[0]['Plan'])
+        print(f'{question}: {", ".join(sorted(usage[question])) or "no indexes"}')
+    used = set().union(*usage.values())
+    unused = [name for name, _ in (index_sql(table, columns) for table, columns in indexes) if name not in used]
+    if unused:
+        print(f'indexes not used by any query: {", ".join(unused)}')
+    return usage
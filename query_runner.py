@@ -0,0 +1,241 @@
+'''
+Concurrent runner for the analytics queries in data_queries.sql with a cache of their results.
+
+Each query is named by the question comment above it. Results are cached on disk keyed by the query
+text and the version stamps of the tables it reads. Every load method bumps the versions of the tables
+it writes, so a query is only run again once one of its tables has changed. The queries run
+concurrently, each on its own pooled connection. EXPLAIN (ANALYZE, BUFFERS) gives each query's planning
+and execution time and the pages it read from the shared buffers and from disk, for a performance report.
+
+Run from the repository root:
+    python query_runner.py local_db_creds.yaml
+    python query_runner.py local_db_creds.yaml --report
+'''
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import hashlib
+import json
+import re
+import time
+import pandas as pd
+from extraction_cache import ExtractionCache
+from instrumentation import instrument_class
+from query_plans import split_queries
+
+#tables read by a statement, CTE names are removed afterwards
+TABLE_REFERENCE = re.compile(r'\b(?:FROM|JOIN)\s+"?(\w+)', re.IGNORECASE)
+CTE_NAME = re.compile(r'\b(\w+)\s+AS\s*\(', re.IGNORECASE)
+
+
+def read_queries(sql_path:str = 'data_queries.sql'):
+    '''
+    Read the queries of a SQL file by name, the name being the question comment above each one.
+    Statements that are not queries are left out, a second query under the same question is named "<question> (2)".
+
+    Parameters
+    ----------
+    sql_path(str) : Path of the SQL file
+
+    Returns
+    -------
+    queries : dictionary of question to statement, in file order
+    '''
+    with open(sql_path) as file:
+        queries = split_queries(file.read())
+    named = {}
+    for question, statement in queries:
+        if not statement.upper().startswith(('SELECT', 'WITH')):
+            continue
+        name, count = question, 1
+        while name in named:
+            count += 1
+            name = f'{question} ({count})'
+        named[name] = statement
+    return named
+
+
+def query_tables(statement:str):
+    '''
+    Names of the tables a statement reads.
+
+    Parameters
+    ----------
+    statement(str) : SQL query
+
+    Returns
+    -------
+    tables : sorted list of table names
+    '''
+    ctes = {name.lower() for name in CTE_NAME.findall(statement)}
+    return sorted({name.lower() for name in TABLE_REFERENCE.findall(statement)} - ctes)
+
+
+@instrument_class
+class QueryRunner:
+    """
+    A class to run the analytics queries of a SQL file concurrently and cache their results
+
+    ...
+
+    Attributes
+    ----------
+    self.db_connector : DatabaseConnector for the database holding the star schema
+    self.queries : Dictionary of question to statement read from the SQL file
+    self.cache : ExtractionCache the results are stored in
+    self.max_workers : Number of queries run at the same time, at most the connector's pool size plus overflow
+
+    Methods
+    -------
+    run_query : Get the result of one query, from the cache when none of its tables changed since it was stored
+    run_all : Get the results of several queries, running those not cached concurrently
+    explain : Run one query under EXPLAIN (ANALYZE, BUFFERS) and get its timings and buffer usage
+    performance_report : Explain several queries concurrently and print their timings, slowest first
+
+    """
+    def __init__(self, db_connector, sql_path:str = 'data_queries.sql', cache:ExtractionCache = None, max_workers:int = 4):
+        '''
+        Parameters
+        ----------
+        db_connector : DatabaseConnector for the database holding the star schema
+        sql_path(str) : Path of the SQL file
+        cache(ExtractionCache) : Cache for the query results, one in .query_cache if None
+        max_workers(int) : Number of queries run at the same time
+        '''
+        self.db_connector = db_connector
+        self.queries = read_queries(sql_path)
+        self.cache = cache if cache is not None else ExtractionCache(cache_dir='.query_cache')
+        self.max_workers = max_workers
+
+    def _statement(self, name:str):
+        '''
+        Get the statement of a named query.
+        '''
+        if name not in self.queries:
+            raise ValueError(f'Unknown query: {name}')
+        return self.queries[name]
+
+    def _fingerprint(self, statement:str, versions:dict):
+        '''
+        Hash the query text with the version of every table it reads, a table never loaded has no version.
+        '''
+        stamps = {table: versions.get(table) for table in query_tables(statement)}
+        return hashlib.sha256(f'{statement}\n{json.dumps(stamps, sort_keys=True)}'.encode()).hexdigest()
+
+    def _run(self, name:str, versions:dict):
+        '''
+        Get a query's result from the cache, or run it and cache it.
+        '''
+        statement = self._statement(name)
+        fingerprint = self._fingerprint(statement, versions)
+        df = self.cache.get(name, fingerprint)
+        if df is not None:
+            return df
+        with self.db_connector.connect() as connection:
+            df = pd.read_sql(statement, connection)
+        self.cache.put(name, fingerprint, df)
+        return df
+
+    def run_query(self, name:str):
+        '''
+        Get the result of one query, running it only when one of its tables changed since the result was cached.
+
+        Parameters
+        ----------
+        name(str) : Question comment of the query
+
+        Returns
+        -------
+        df : Pandas Dataframe of the query result
+        '''
+        #versions are read before the query, a load committed in between only stores newer data under the older stamp
+        return self._run(name, self.db_connector.table_versions())
+
+    def run_all(self, names:list = None):
+        '''
+        Get the results of several queries, the uncached ones run concurrently on pooled connections.
+
+        Parameters
+        ----------
+        names(list) : Question comments of the queries, every query in the file if None
+
+        Returns
+        -------
+        results : dictionary of question to Pandas Dataframe of its result
+        '''
+        names = list(self.queries) if names is None else names
+        versions = self.db_connector.table_versions()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {name: executor.submit(self._run, name, versions) for name in names}
+            results = {name: future.result() for name, future in futures.items()}
+        print(f'{len(results)} queries answered in {time.perf_counter() - start:.2f}s')
+        return results
+
+    def explain(self, name:str):
+        '''
+        Run one query under EXPLAIN (ANALYZE, BUFFERS) and get its timings and buffer usage.
+        The query is executed, its result is not returned or cached.
+
+        Parameters
+        ----------
+        name(str) : Question comment of the query
+
+        Returns
+        -------
+        timings : dictionary of planning_ms, execution_ms, rows, shared_hit_blocks and shared_read_blocks
+        '''
+        statement = self._statement(name)
+        with self.db_connector.connect() as connection:
+            plan = connection.exec_driver_sql(f'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}').scalar()[0]
+        #the top plan node's buffer counts include those of every node below it
+        return {
+            'planning_ms': plan['Planning Time'],
+            'execution_ms': plan['Execution Time'],
+            'rows': plan['Plan']['Actual Rows'],
+            'shared_hit_blocks': plan['Plan'].get('Shared Hit Blocks', 0),
+            'shared_read_blocks': plan['Plan'].get('Shared Read Blocks', 0),
+        }
+
+    def performance_report(self, names:list = None):
+        '''
+        Explain several queries concurrently and print their timings, slowest first.
+        Queries that fail to run are reported and left out.
+
+        Parameters
+        ----------
+        names(list) : Question comments of the queries, every query in the file if None
+
+        Returns
+        -------
+        report : Pandas Dataframe of the timings indexed by question
+        '''
+        names = list(self.queries) if names is None else names
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {name: executor.submit(self.explain, name) for name in names}
+        timings = {}
+        for name, future in futures.items():
+            try:
+                timings[name] = future.result()
+            except Exception as error:
+                print(f'skipped "{name}": {str(error).splitlines()[0]}')
+        report = pd.DataFrame.from_dict(timings, orient='index', columns=['planning_ms', 'execution_ms', 'rows', 'shared_hit_blocks', 'shared_read_blocks'])
+        report.index.name = 'query'
+        report = report.sort_values('execution_ms', ascending=False)
+        print(report.to_string())
+        return report
+
+
+if __name__ == '__main__':
+    from database_utils import DatabaseConnector
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('credentials', help='Path to the database credentials yaml')
+    parser.add_argument('--sql', default='data_queries.sql', help='Path of the SQL file of queries')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--report', action='store_true', help='Print EXPLAIN (ANALYZE, BUFFERS) timings instead of the results')
+    args = parser.parse_args()
+    runner = QueryRunner(DatabaseConnector(args.credentials), sql_path=args.sql, max_workers=args.workers)
+    if args.report:
+        runner.performance_report()
+    else:
+        for question, df in runner.run_all().items():
+            print(f'-- {question}\n{df.to_string()}\n')
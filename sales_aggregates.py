@@ -0,0 +1,205 @@
+'''
+Pre-aggregated sales layer answering the data_queries.sql sales questions without scanning orders_table.
+
+The sales_summary table holds total sales, order count and product quantity per year, month, store type
+and country code. It is rebuilt from orders_table after a full load and otherwise only the orders added
+since the last refresh are aggregated and added on, tracked by a watermark on the orders index column.
+Every order is counted, the dimensions are left joined: an order whose date is missing from dim_date_times
+gets year and month NO_DATE, one whose store is missing gets store type and country code NO_STORE, and
+one whose product is missing adds nothing to the total sales. Each query filters these out where the
+matching data_queries.sql question inner joins that dimension, so the answers are the same.
+'''
+import pandas as pd
+from instrumentation import instrument_class
+from sqlalchemy import text
+
+SUMMARY_TABLE = 'sales_summary'
+#year and month of orders with no matching date, store type and country code of orders with no matching store
+NO_DATE = 0
+NO_STORE = 'No store'
+
+CREATE_SUMMARY = f'''
+CREATE TABLE IF NOT EXISTS {SUMMARY_TABLE} (
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    store_type TEXT NOT NULL,
+    country_code TEXT NOT NULL,
+    total_sales NUMERIC NOT NULL,
+    order_count BIGINT NOT NULL,
+    product_quantity BIGINT NOT NULL,
+    PRIMARY KEY (year, month, store_type, country_code)
+)
+'''
+
+#aggregate the orders with an index in (:low, :high] and add them on to the existing summary rows
+REFRESH_SUMMARY = f'''
+INSERT INTO {SUMMARY_TABLE} (year, month, store_type, country_code, total_sales, order_count, product_quantity)
+SELECT COALESCE(CAST(dim_date_times.year AS INTEGER), {NO_DATE}),
+    COALESCE(CAST(dim_date_times.month AS INTEGER), {NO_DATE}),
+    CASE WHEN dim_store_details.store_code IS NULL THEN '{NO_STORE}' ELSE COALESCE(dim_store_details.store_type, 'Unknown') END,
+    CASE WHEN dim_store_details.store_code IS NULL THEN '{NO_STORE}' ELSE COALESCE(dim_store_details.country_code, 'Unknown') END,
+    COALESCE(SUM(CAST(dim_products.product_price AS NUMERIC) * orders_table.product_quantity), 0),
+    COUNT(*),
+    SUM(orders_table.product_quantity)
+FROM orders_table
+    LEFT JOIN dim_products ON dim_products.product_code = orders_table.product_code
+    LEFT JOIN dim_date_times ON dim_date_times.date_uuid = orders_table.date_uuid
+    LEFT JOIN dim_store_details ON dim_store_details.store_code = orders_table.store_code
+WHERE orders_table."index" > :low AND orders_table."index" <= :high
+GROUP BY 1, 2, 3, 4
+ON CONFLICT (year, month, store_type, country_code) DO UPDATE SET
+    total_sales = {SUMMARY_TABLE}.total_sales + EXCLUDED.total_sales,
+    order_count = {SUMMARY_TABLE}.order_count + EXCLUDED.order_count,
+    product_quantity = {SUMMARY_TABLE}.product_quantity + EXCLUDED.product_quantity
+'''
+
+
+@instrument_class
+class SalesAggregates:
+    """
+    A class to build, refresh and query the pre-aggregated sales_summary table
+
+    ...
+
+    Attributes
+    ----------
+    self.db_connector : DatabaseConnector for the database holding the star schema
+
+    Methods
+    -------
+    refresh : Aggregate the orders added since the last refresh, or rebuild the summary from every order
+    invalidate : Force the next refresh to rebuild the summary, called after orders_table is fully reloaded
+    sales_by_month : Total sales per month across every year
+    sales_by_location : Number of sales and products sold online and offline
+    store_type_share : Total sales and percentage of the total per store type
+    top_months : The year and month pairs with the highest sales
+    store_type_sales : Total sales per store type in a country
+
+    """
+    def __init__(self, db_connector):
+        self.db_connector = db_connector
+
+    def invalidate(self):
+        '''
+        Force the next refresh to rebuild the summary, the aggregated orders no longer match a reloaded orders_table.
+        '''
+        self.db_connector.clear_watermark(SUMMARY_TABLE)
+
+    def refresh(self, full:bool = False):
+        '''
+        Aggregate the orders added since the last refresh into the summary.
+        The summary is rebuilt from every order when full is set or it has not been built yet.
+        Changes to dimension rows, e.g. a product's price, are only picked up by a full rebuild.
+
+        Parameters
+        ----------
+        full(bool) : Rebuild the summary from every order
+
+        Returns
+        -------
+        rows : The number of summary rows inserted or updated
+        '''
+        watermark = None if full else self.db_connector.get_watermark(SUMMARY_TABLE)
+        with self.db_connector.begin() as connection:
+            connection.exec_driver_sql(CREATE_SUMMARY)
+            high = connection.exec_driver_sql('SELECT MAX("index") FROM orders_table').scalar()
+            if watermark is None:
+                connection.exec_driver_sql(f'TRUNCATE {SUMMARY_TABLE}')
+                low = -1
+            else:
+                low = int(watermark)
+            if high is None or high <= low:
+                print(f'{SUMMARY_TABLE} up to date')
+                return 0
+            rows = connection.execute(text(REFRESH_SUMMARY), {'low': low, 'high': high}).rowcount
+            #the watermark is written in the same transaction so a failed refresh is retried from the same point
+            self.db_connector.set_watermark(SUMMARY_TABLE, 'index', high, connection=connection)
+            self.db_connector.bump_table_versions([SUMMARY_TABLE], connection=connection)
+        print(f'{SUMMARY_TABLE}: {"rebuilt" if low == -1 else "refreshed"} with orders up to index {high}, {rows} rows changed')
+        return rows
+
+    def _query(self, sql:str, params:dict = None):
+        '''
+        Run a query against the summary and return the result as a dataframe.
+        '''
+        with self.db_connector.connect() as connection:
+            return pd.read_sql(text(sql), connection, params=params)
+
+    def sales_by_month(self):
+        '''
+        Total sales per month across every year, largest first.
+
+        Returns
+        -------
+        df : Pandas Dataframe with month and total_sales
+        '''
+        return self._query(
+            f'SELECT month, ROUND(SUM(total_sales), 2) AS total_sales FROM {SUMMARY_TABLE} '
+            f'WHERE month <> {NO_DATE} GROUP BY month ORDER BY total_sales DESC'
+        )
+
+    def sales_by_location(self):
+        '''
+        Number of sales and products sold through the web portal and offline stores.
+
+        Returns
+        -------
+        df : Pandas Dataframe with number_of_sales, product_quantity_count and location
+        '''
+        return self._query(
+            'SELECT SUM(order_count) AS number_of_sales, SUM(product_quantity) AS product_quantity_count, '
+            "CASE WHEN store_type = 'Web Portal' THEN 'Web' ELSE 'Offline' END AS location "
+            f"FROM {SUMMARY_TABLE} WHERE store_type <> '{NO_STORE}' GROUP BY location"
+        )
+
+    def store_type_share(self):
+        '''
+        Total sales and percentage of all sales per store type, largest first.
+
+        Returns
+        -------
+        df : Pandas Dataframe with store_type, total_sales and percentage_total
+        '''
+        #the percentage is of every order's sales, including those whose store is missing
+        return self._query(
+            'SELECT store_type, total_sales, percentage_total FROM ('
+            'SELECT store_type, ROUND(SUM(total_sales), 2) AS total_sales, '
+            'ROUND(SUM(total_sales) * 100 / SUM(SUM(total_sales)) OVER (), 2) AS percentage_total '
+            f"FROM {SUMMARY_TABLE} GROUP BY store_type) AS shares WHERE store_type <> '{NO_STORE}' ORDER BY total_sales DESC"
+        )
+
+    def top_months(self, limit:int = 10):
+        '''
+        The year and month pairs with the highest sales.
+
+        Parameters
+        ----------
+        limit(int) : Number of months to return
+
+        Returns
+        -------
+        df : Pandas Dataframe with total_sales, year and month
+        '''
+        return self._query(
+            f'SELECT ROUND(SUM(total_sales), 2) AS total_sales, year, month FROM {SUMMARY_TABLE} '
+            f'WHERE year <> {NO_DATE} GROUP BY year, month ORDER BY total_sales DESC LIMIT :limit',
+            {'limit': limit},
+        )
+
+    def store_type_sales(self, country_code:str):
+        '''
+        Total sales per store type in one country, smallest first.
+
+        Parameters
+        ----------
+        country_code(str) : Two letter country code, e.g. "DE"
+
+        Returns
+        -------
+        df : Pandas Dataframe with total_sales, store_type and country_code
+        '''
+        return self._query(
+            f'SELECT ROUND(SUM(total_sales), 2) AS total_sales, store_type, country_code FROM {SUMMARY_TABLE} '
+            'WHERE country_code = :country_code GROUP BY store_type, country_code ORDER BY total_sales',
+            {'country_code': country_code},
+        )
@@ -0,0 +1,221 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import importlib
+import time
+
+#stage name to (function, imports, dependencies) of every registered stage, filled as the modules defining stages are imported
+STAGE_REGISTRY = {}
+
+
+def register_stage(name:str = None, depends_on:list[str] = (), imports:list[str] = ()):
+    '''
+    Decorator registering a pipeline stage, a module level function taking the pipeline context.
+    Its heavy dependencies are named rather than imported so listing or running other stages never loads them.
+
+    Parameters
+    ----------
+    name(str) : Unique stage name, the function name if None
+    depends_on(list[str]) : Names of the stages that must finish before this one starts
+    imports(list[str]) : Modules the stage needs, imported by load_stage just before it runs
+
+    Returns
+    -------
+    The decorator, which returns the function unchanged
+    '''
+    def register(func):
+        STAGE_REGISTRY[name or func.__name__] = (func, tuple(imports), tuple(depends_on))
+        return func
+    return register
+
+
+def load_stage(name:str):
+    '''
+    Import the modules a registered stage needs and get its function.
+
+    Parameters
+    ----------
+    name(str) : Name of a registered stage
+
+    Returns
+    -------
+    func : The stage function
+    '''
+    if name not in STAGE_REGISTRY:
+        raise ValueError(f'Unknown stage: {name}, registered stages are {list(STAGE_REGISTRY)}')
+    func, imports, _ = STAGE_REGISTRY[name]
+    for module in imports:
+        importlib.import_module(module)
+    return func
+
+
+def load_plugins(modules:list[str]):
+    '''
+    Import modules defining extra stages so they register themselves with register_stage.
+
+    Parameters
+    ----------
+    modules(list[str]) : Importable module names
+
+    Returns
+    -------
+    None
+    '''
+    for module in modules:
+        importlib.import_module(module)
+
+
+def _run_stage(func, args):
+    '''
+    Run a stage in a worker process and return its start and end wall clock times.
+    '''
+    start = time.time()
+    func(*args)
+    return start, time.time()
+
+
+class StageScheduler:
+    """
+    A class to run pipeline stages concurrently in a process pool while respecting their dependencies
+
+    ...
+
+    Attributes
+    ----------
+    self.stages : Dictionary of stage name to (function, args, dependencies)
+    self.timings : Dictionary of stage name to (start, end) wall clock times, populated by run
+
+    Methods
+    -------
+    add_stage : Add a stage and the stages it depends on
+    run : Run every stage, starting each one as soon as its dependencies have finished
+    critical_path : The chain of dependent stages with the longest total wall time
+    print_timeline : Print the start, end and wall time of each stage and the critical path
+
+    """
+    def __init__(self):
+        self.stages = {}
+        self.timings = {}
+
+    def add_stage(self, name:str, func, args:tuple = (), depends_on:list[str] = ()):
+        '''
+        Add a stage and the stages it depends on.
+
+        Parameters
+        ----------
+        name(str) : Unique stage name
+        func : Module level function to run for the stage, it must be picklable
+        args(tuple) : Arguments passed to func
+        depends_on(list[str]) : Names of the stages that must finish before this one starts
+
+        Returns
+        -------
+        None
+        '''
+        self.stages[name] = (func, tuple(args), tuple(depends_on))
+
+    def _check_dependencies(self):
+        '''
+        Raise a ValueError for unknown dependencies or dependency cycles.
+        '''
+        for name, (_, _, depends_on) in self.stages.items():
+            unknown = [dependency for dependency in depends_on if dependency not in self.stages]
+            if unknown:
+                raise ValueError(f'Stage {name} depends on unknown stages: {unknown}')
+        visited = set()
+        visiting = set()
+        def visit(name):
+            if name in visiting:
+                raise ValueError(f'Dependency cycle through stage {name}')
+            if name not in visited:
+                visiting.add(name)
+                for dependency in self.stages[name][2]:
+                    visit(dependency)
+                visiting.remove(name)
+                visited.add(name)
+        for name in self.stages:
+            visit(name)
+
+    def run(self, max_workers:int = 4):
+        '''
+        Run every stage in a process pool, starting each one as soon as all of its dependencies have finished.
+        If a stage fails no new stages are started and the error is raised once the running stages finish.
+
+        Parameters
+        ----------
+        max_workers(int) : Maximum number of stages run at the same time
+
+        Returns
+        -------
+        self.timings
+        '''
+        self._check_dependencies()
+        self.timings = {}
+        self.run_start = time.time()
+        pending = dict(self.stages)
+        running = {}
+        error = None
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            while pending or running:
+                if error is None:
+                    ready = [name for name, (_, _, depends_on) in pending.items() if all(dependency in self.timings for dependency in depends_on)]
+                    for name in ready:
+                        func, args, _ = pending.pop(name)
+                        running[executor.submit(_run_stage, func, args)] = name
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.timings[name] = future.result()
+                    except Exception as e:
+                        print(f'Stage {name} failed: {e}')
+                        error = error or e
+        self.run_end = time.time()
+        self.print_timeline()
+        if error is not None:
+            raise error
+        return self.timings
+
+    def critical_path(self):
+        '''
+        The chain of dependent stages with the longest total wall time.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        path : list of stage names from first to last
+        '''
+        longest = {}
+        def visit(name):
+            if name not in longest:
+                start, end = self.timings[name]
+                dependencies = [dependency for dependency in self.stages[name][2] if dependency in self.timings]
+                best = max((visit(dependency) for dependency in dependencies), key=lambda path: path[0], default=(0, []))
+                longest[name] = (best[0] + end - start, best[1] + [name])
+            return longest[name]
+        paths = [visit(name) for name in self.timings]
+        return max(paths, key=lambda path: path[0], default=(0, []))[1]
+
+    def print_timeline(self):
+        '''
+        Print the start and end offsets and wall time of each finished stage, the critical path and the total run time.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        '''
+        print(f"{'stage':<20}{'start':>10}{'end':>10}{'wall':>10}")
+        for name, (start, end) in sorted(self.timings.items(), key=lambda item: item[1][0]):
+            print(f'{name:<20}{start - self.run_start:>9.2f}s{end - self.run_start:>9.2f}s{end - start:>9.2f}s')
+        path = self.critical_path()
+        path_time = sum(self.timings[name][1] - self.timings[name][0] for name in path)
+        serial_time = sum(end - start for start, end in self.timings.values())
+        print(f"critical path: {' -> '.join(path)} ({path_time:.2f}s)")
+        print(f'total: {self.run_end - self.run_start:.2f}s (stages run serially: {serial_time:.2f}s)')
@@ -0,0 +1,104 @@
+'''
+Arrow IPC staging files used to hand raw data between pipeline stages.
+
+Each staged table has an explicit schema, but only the index column has a real type. The raw source
+columns stay strings: prices carry currency signs, weights units, dates several formats, and the store
+API returns junk rows in every column. Typing them would mean cleaning them here, and the cleaners
+need the dirty values to decide which rows to drop. Files are written uncompressed and memory-mapped
+on read, which avoids a copy of the file but not of the strings, since to_pandas builds a Python
+object for each value. The files are larger than the equivalent CSV, because every string column
+also stores its offsets. They are faster to write and read than CSV because nothing is parsed.
+'''
+import pandas as pd
+import pyarrow as pa
+
+STORE_SCHEMA = pa.schema([
+    ('index', pa.int64()),
+    ('address', pa.string()),
+    ('longitude', pa.string()),
+    ('lat', pa.string()),
+    ('locality', pa.string()),
+    ('store_code', pa.string()),
+    ('staff_numbers', pa.string()),
+    ('opening_date', pa.string()),
+    ('store_type', pa.string()),
+    ('latitude', pa.string()),
+    ('country_code', pa.string()),
+    ('continent', pa.string()),
+])
+
+PRODUCT_SCHEMA = pa.schema([
+    ('index', pa.int64()),
+    ('product_name', pa.string()),
+    ('product_price', pa.string()),
+    ('weight', pa.string()),
+    ('category', pa.string()),
+    ('EAN', pa.string()),
+    ('date_added', pa.string()),
+    ('uuid', pa.string()),
+    ('removed', pa.string()),
+    ('product_code', pa.string()),
+])
+
+
+def to_staged_table(df, schema:pa.Schema):
+    '''
+    Convert a dataframe to an Arrow table with the given schema, as it is written to a staging file.
+
+    Parameters
+    ----------
+    df : Pandas Dataframe object with a column for every field in the schema
+    schema(pa.Schema) : Schema of the staged table
+
+    Returns
+    -------
+    table : pyarrow Table
+    '''
+    columns = {}
+    for field in schema:
+        column = df[field.name]
+        if pa.types.is_string(field.type):
+            #store every non null value as text, the source mixes numbers and strings in the same column
+            column = column.where(column.isna(), column.astype(str))
+        columns[field.name] = column
+    return pa.Table.from_pandas(pd.DataFrame(columns), schema=schema, preserve_index=False)
+
+
+def write_staging(df, path:str, schema:pa.Schema):
+    '''
+    Write a dataframe to an Arrow IPC staging file with the given schema.
+
+    Parameters
+    ----------
+    df : Pandas Dataframe object with a column for every field in the schema
+    path(str) : Path of the staging file
+    schema(pa.Schema) : Schema of the staged table
+
+    Returns
+    -------
+    None
+    '''
+    table = to_staged_table(df, schema)
+    with pa.OSFile(path, 'wb') as sink:
+        with pa.ipc.new_file(sink, schema) as writer:
+            writer.write_table(table)
+
+
+def read_staging(path:str, index_col:str = None):
+    '''
+    Read an Arrow IPC staging file through a memory map, the string columns are copied into Python objects.
+
+    Parameters
+    ----------
+    path(str) : Path of the staging file
+    index_col(str) : Column to use as the index
+
+    Returns
+    -------
+    df : Pandas Dataframe object
+    '''
+    with pa.memory_map(path, 'r') as source:
+        df = pa.ipc.open_file(source).read_all().to_pandas()
+    if index_col is not None:
+        df = df.set_index(index_col)
+    return df
@@ -0,0 +1,285 @@
+'''
+Final column types, keys and derived columns of the star schema tables.
+
+The loader creates each table with these types before copying the cleaned data in, so the schema
+that the old flow reached with ALTER TABLE rewrites, see benchmarks/legacy_star_schema_functions.sql, is written in a single pass.
+Foreign keys are added once the orders have landed as the dimension tables can be replaced on a run,
+followed by the indexes the foreign keys and the analytics queries in data_queries.sql join and group on.
+The dimension tables with natural keys are merged rather than replaced, by comparing row hashes with
+the hashes stored from the previous load.
+'''
+import numpy as np
+import pandas as pd
+
+#column name, Postgres type, in table order
+STAR_SCHEMA = {
+    'dim_users': {
+        'columns': [
+            ('first_name', 'VARCHAR(255)'),
+            ('last_name', 'VARCHAR(255)'),
+            ('date_of_birth', 'DATE'),
+            ('company', 'TEXT'),
+            ('email_address', 'TEXT'),
+            ('address', 'TEXT'),
+            ('country', 'TEXT'),
+            ('country_code', 'VARCHAR(2)'),
+            ('phone_number', 'TEXT'),
+            ('join_date', 'DATE'),
+            ('user_uuid', 'UUID'),
+        ],
+        'primary_key': 'user_uuid',
+    },
+    'dim_card_details': {
+        'columns': [
+            ('card_number', 'VARCHAR(19)'),
+            ('expiry_date', 'VARCHAR(5)'),
+            ('card_provider', 'TEXT'),
+            ('date_payment_confirmed', 'DATE'),
+        ],
+        'primary_key': 'card_number',
+    },
+    'dim_store_details': {
+        'columns': [
+            ('address', 'TEXT'),
+            ('longitude', 'FLOAT'),
+            ('locality', 'VARCHAR(255)'),
+            ('store_code', 'VARCHAR(255)'),
+            ('staff_numbers', 'SMALLINT'),
+            ('opening_date', 'DATE'),
+            ('store_type', 'VARCHAR(255)'),
+            ('latitude', 'FLOAT'),
+            ('country_code', 'VARCHAR(2)'),
+            ('continent', 'VARCHAR(255)'),
+        ],
+        'primary_key': 'store_code',
+    },
+    'dim_products': {
+        'columns': [
+            ('product_name', 'TEXT'),
+            ('product_price', 'FLOAT'),
+            ('weight', 'FLOAT'),
+            ('category', 'TEXT'),
+            ('EAN', 'VARCHAR(255)'),
+            ('date_added', 'DATE'),
+            ('uuid', 'UUID'),
+            ('still_available', 'BOOL'),
+            ('product_code', 'VARCHAR(255)'),
+            ('weight_class', 'VARCHAR(30)'),
+        ],
+        'primary_key': 'product_code',
+    },
+    'dim_date_times': {
+        'columns': [
+            ('timestamp', 'TEXT'),
+            ('month', 'VARCHAR(2)'),
+            ('year', 'VARCHAR(4)'),
+            ('day', 'VARCHAR(2)'),
+            ('time_period', 'VARCHAR(255)'),
+            ('date_uuid', 'UUID'),
+        ],
+        'primary_key': 'date_uuid',
+    },
+    'orders_table': {
+        'columns': [
+            ('index', 'BIGINT'),
+            ('date_uuid', 'UUID'),
+            ('user_uuid', 'UUID'),
+            ('card_number', 'VARCHAR(19)'),
+            ('store_code', 'VARCHAR(20)'),
+            ('product_code', 'VARCHAR(20)'),
+            ('product_quantity', 'SMALLINT'),
+        ],
+        'primary_key': 'index',
+        'foreign_keys': {
+            'date_uuid': 'dim_date_times',
+            'user_uuid': 'dim_users',
+            'card_number': 'dim_card_details',
+            'store_code': 'dim_store_details',
+            'product_code': 'dim_products',
+        },
+    },
+}
+
+#table and columns of the indexes built after the load, the dimension keys are already indexed by their primary keys
+INDEXES = [
+    ('orders_table', ['date_uuid']),
+    ('orders_table', ['user_uuid']),
+    ('orders_table', ['card_number']),
+    ('orders_table', ['store_code']),
+    ('orders_table', ['product_code']),
+    ('dim_date_times', ['year', 'month']),
+    ('dim_store_details', ['store_type', 'country_code']),
+    ('dim_store_details', ['country_code']),
+]
+
+
+def create_table_sql(table:str):
+    '''
+    CREATE TABLE statement with the final column types and primary key of a star schema table.
+
+    Parameters
+    ----------
+    table(str) : Name of the star schema table
+
+    Returns
+    -------
+    sql(str) : The statement
+    '''
+    definition = STAR_SCHEMA[table]
+    columns = [f'"{name}" {sql_type}' for name, sql_type in definition['columns']]
+    columns.append(f'PRIMARY KEY ("{definition["primary_key"]}")')
+    return f'CREATE TABLE "{table}" ({", ".join(columns)})'
+
+
+def foreign_key_sql(table:str):
+    '''
+    ALTER TABLE statements adding the foreign keys of a star schema table, one per referenced table.
+    The constraints are deferrable so rows can be loaded in any order inside a transaction.
+
+    Parameters
+    ----------
+    table(str) : Name of the star schema table
+
+    Returns
+    -------
+    statements : dictionary of constraint name to statement
+    '''
+    statements = {}
+    for column, referenced in STAR_SCHEMA[table].get('foreign_keys', {}).items():
+        name = f'{table}_{column}_fkey'
+        statements[name] = (
+            f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" FOREIGN KEY ("{column}") '
+            f'REFERENCES "{referenced}" ("{STAR_SCHEMA[referenced]["primary_key"]}") DEFERRABLE INITIALLY DEFERRED'
+        )
+    return statements
+
+
+def referencing_foreign_keys(table:str):
+    '''
+    The foreign keys of other star schema tables that reference a table.
+
+    Parameters
+    ----------
+    table(str) : Name of the referenced star schema table
+
+    Returns
+    -------
+    foreign_keys : list of (referencing table, foreign key column) pairs
+    '''
+    return [
+        (referencing, column)
+        for referencing in STAR_SCHEMA
+        for column, referenced in STAR_SCHEMA[referencing].get('foreign_keys', {}).items()
+        if referenced == table
+    ]
+
+
+def index_sql(table:str, columns:list[str]):
+    '''
+    Name and CREATE INDEX statement for an index on the given columns of a table.
+
+    Parameters
+    ----------
+    table(str) : Table name
+    columns(list[str]) : Indexed columns in order
+
+    Returns
+    -------
+    name(str) : The index name
+    sql(str) : The statement
+    '''
+    name = f'{table}_{"_".join(columns)}_idx'
+    column_list = ', '.join(f'"{column}"' for column in columns)
+    return name, f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({column_list})'
+
+
+def row_hashes(df, table:str):
+    '''
+    Hash of every row of a dataframe prepared for a star schema table, indexed by the table's primary key.
+    The hash is computed over the final column types so the same values hash the same on every run.
+
+    Parameters
+    ----------
+    df : Pandas Dataframe object returned by prepare_for_load
+    table(str) : Name of the star schema table
+
+    Returns
+    -------
+    hashes : int64 Pandas Series of row hashes
+    '''
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy().view('int64')
+    return pd.Series(hashes, index=primary_key_values(df, table), name='row_hash')
+
+
+def primary_key_values(df, table:str):
+    '''
+    Primary key of each row of a star schema table as text, in the form Postgres returns it when cast to text.
+
+    Parameters
+    ----------
+    df : Pandas Dataframe object with the table's primary key column
+    table(str) : Name of the star schema table
+
+    Returns
+    -------
+    keys : Pandas Index of strings
+    '''
+    primary_key = STAR_SCHEMA[table]['primary_key']
+    return pd.Index(key_text(df[primary_key], dict(STAR_SCHEMA[table]['columns'])[primary_key]), name=primary_key)
+
+
+def key_text(values, sql_type:str):
+    '''
+    Key values as text in the form Postgres returns them when cast to text, UUIDs are lower case.
+
+    Parameters
+    ----------
+    values : Pandas Series of key values
+    sql_type(str) : Postgres type of the key column
+
+    Returns
+    -------
+    keys : Pandas Series of strings
+    '''
+    keys = values.astype(str)
+    if sql_type == 'UUID':
+        keys = keys.str.lower()
+    return keys
+
+
+def _weight_class(weight):
+    '''
+    Weight band of each product, matching the CASE in the old flow's schema script including its gaps.
+    '''
+    conditions = [weight < 2, weight.between(2, 40), weight.between(41, 140)]
+    return np.select(conditions, ['Light', 'Mid_size', 'Heavy'], default='Truck_required')
+
+
+def prepare_for_load(df, table:str):
+    '''
+    Add the derived columns and convert a cleaned dataframe to the final column types and order of a star schema table.
+
+    Parameters
+    ----------
+    df : Cleaned Pandas Dataframe object
+    table(str) : Name of the star schema table
+
+    Returns
+    -------
+    df : Pandas Dataframe object with exactly the table's columns
+    '''
+    df = df.copy()
+    if table == 'dim_products':
+        df['weight_class'] = _weight_class(df['weight'])
+        df['still_available'] = df.pop('removed') == 'Still_avaliable'
+    for name, sql_type in STAR_SCHEMA[table]['columns']:
+        if sql_type in ('SMALLINT', 'BIGINT'):
+            #nullable integers so missing values are not written as floats
+            df[name] = pd.to_numeric(df[name], errors='coerce').round().astype('Int64')
+        elif sql_type == 'BOOL':
+            df[name] = df[name].astype('boolean')
+        elif sql_type == 'DATE':
+            df[name] = pd.to_datetime(df[name], errors='coerce').dt.date
+        elif sql_type.startswith('VARCHAR') and not pd.api.types.is_string_dtype(df[name]):
+            df[name] = df[name].astype('string')
+    return df[[name for name, _ in STAR_SCHEMA[table]['columns']]]
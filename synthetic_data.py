@@ -0,0 +1,307 @@
+import numpy as np
+import pandas as pd
+
+FIRST_NAMES = ['Sophie', 'Jonas', 'Emily', 'Liam', 'Hannah', 'Noah', 'Olivia', 'Lukas', 'Amelia', 'Jacob']
+LAST_NAMES = ['Smith', 'Müller', 'Johnson', 'Schmidt', 'Brown', 'Schneider', 'Taylor', 'Fischer', 'Davies', 'Williams']
+COMPANIES = ['Heller Ltd', 'Rubenstein and Sons', 'Dickinson-Wolf', 'Schmidt GmbH', 'Bauer AG', 'Price-Adams']
+STREETS = ['Heath Road', 'Hauptstraße', 'Main Street', 'Kirchweg', 'Station Road', 'Oak Avenue']
+TOWNS = ['London', 'Berlin', 'New York', 'Leeds', 'Munich', 'Chicago']
+COUNTRIES = ['United Kingdom', 'Germany', 'United States']
+COUNTRY_CODES = ['GB', 'DE', 'US']
+CARD_PROVIDERS = ['VISA 16 digit', 'JCB 16 digit', 'VISA 13 digit', 'JCB 15 digit', 'VISA 19 digit',
+                  'Diners Club / Carte Blanche', 'American Express', 'Maestro', 'Discover', 'Mastercard']
+STORE_TYPES = ['Local', 'Super Store', 'Mall Kiosk', 'Outlet']
+CATEGORIES = ['toys-and-games', 'sports-and-leisure', 'pets', 'homeware', 'health-and-beauty', 'food-and-drink', 'diy']
+WEIGHTS = ['1.6kg', '0.5kg', '590g', '100g', '400ml', '1000ml', '16oz', '2.2oz', '12 x 100g', '8 x 85g', '77g .', '16oz .']
+TIME_PERIODS = ['Evening', 'Midday', 'Morning', 'Late_Hours']
+JUNK = ['NULL', 'I7G4DMDZOZ', 'AJ1ENKS3QL', '3YGQOKGPB0', 'XGI7FM0VBJ']
+
+
+class SyntheticDataGenerator:
+    """
+    A class to generate synthetic dirty versions of every source table
+
+    ...
+
+    The tables reproduce the quirks the DataCleaning methods handle: "NULL" rows, junk rows,
+    numeric names, "@@" emails, "GGB" country codes, "eeEurope" continents, "?" in card numbers,
+    mixed date formats, multipack and " ." weights, "£" prices and letters in staff numbers.
+    The same seed always gives the same tables.
+
+    Attributes
+    ----------
+    self.seed : the random seed
+    self.dirty_fraction : fraction of rows given each quirk
+
+    Methods
+    -------
+    users : Generate the legacy_users table
+    cards : Generate the card details table
+    stores : Generate the store details table
+    products : Generate the products table
+    orders : Generate the orders_table
+    date_events : Generate the date events table
+    table_for : Generate the table cleaned by a DataCleaning method
+
+    """
+    def __init__(self, seed:int = 0, dirty_fraction:float = 0.01):
+        self.seed = seed
+        self.dirty_fraction = dirty_fraction
+
+    def _rng(self, table:str):
+        '''
+        Random generator seeded per table so each table is reproducible on its own.
+        '''
+        return np.random.default_rng([self.seed, sum(table.encode())])
+
+    def _pick(self, rng, values:list, rows:int):
+        '''
+        Draw rows values from a list.
+        '''
+        return np.array(values, dtype=object)[rng.integers(0, len(values), rows)]
+
+    def _dirty(self, rng, rows:int, fraction:float = None):
+        '''
+        Boolean mask selecting the dirty fraction of rows.
+        '''
+        return rng.random(rows) < (self.dirty_fraction if fraction is None else fraction)
+
+    def _uuids(self, rng, rows:int):
+        '''
+        Random version 4 style uuid strings.
+        '''
+        digits = [f'{a:016x}{b:016x}' for a, b in rng.integers(0, 2**63, size=(rows, 2))]
+        return np.array([f'{h[:8]}-{h[8:12]}-4{h[13:16]}-a{h[17:20]}-{h[20:]}' for h in digits], dtype=object)
+
+    def _dates(self, rng, rows:int, start:str, end:str):
+        '''
+        Random dates as strings, mostly ISO with some "1968 October 16" and "October 1968 16" style values.
+        '''
+        days = pd.to_datetime(start) + pd.to_timedelta(rng.integers(0, (pd.to_datetime(end) - pd.to_datetime(start)).days, rows), unit='D')
+        dates = days.strftime('%Y-%m-%d').to_numpy(dtype=object)
+        long_format = self._dirty(rng, rows)
+        dates[long_format] = days[long_format].strftime('%Y %B %d')
+        other_format = self._dirty(rng, rows)
+        dates[other_format] = days[other_format].strftime('%B %Y %d')
+        return dates
+
+    def _junk_rows(self, rng, df):
+        '''
+        Overwrite a dirty fraction of rows with "NULL" and another with random junk in every column.
+        '''
+        rows = len(df)
+        null_rows = self._dirty(rng, rows)
+        df.loc[null_rows, :] = 'NULL'
+        junk_rows = self._dirty(rng, rows) & ~null_rows
+        for column in df.columns:
+            df.loc[junk_rows, column] = self._pick(rng, JUNK[1:], int(junk_rows.sum()))
+        return df
+
+    def users(self, rows:int):
+        '''
+        Generate the legacy_users table.
+
+        Parameters
+        ----------
+        rows(int) : Number of rows
+
+        Returns
+        -------
+        df : Pandas Dataframe object
+        '''
+        rng = self._rng('users')
+        first_names = self._pick(rng, FIRST_NAMES, rows)
+        last_names = self._pick(rng, LAST_NAMES, rows)
+        country_index = rng.integers(0, len(COUNTRIES), rows)
+        emails = first_names + '.' + last_names + '@example.com'
+        double_at = self._dirty(rng, rows)
+        emails[double_at] = first_names[double_at] + '@@example.com'
+        country_codes = np.array(COUNTRY_CODES, dtype=object)[country_index]
+        country_codes[self._dirty(rng, rows) & (country_codes == 'GB')] = 'GGB'
+        df = pd.DataFrame({
+            'first_name': first_names,
+            'last_name': last_names,
+            'date_of_birth': self._dates(rng, rows, '1940-01-01', '2005-12-31'),
+            'company': self._pick(rng, COMPANIES, rows),
+            'email_address': emails,
+            'address': rng.integers(1, 999, rows).astype(str).astype(object) + ' ' + self._pick(rng, STREETS, rows) + '\n' + self._pick(rng, TOWNS, rows),
+            'country': np.array(COUNTRIES, dtype=object)[country_index],
+            'country_code': country_codes,
+            'phone_number': rng.integers(10**9, 10**10, rows).astype(str).astype(object),
+            'join_date': self._dates(rng, rows, '1992-01-01', '2022-12-31'),
+            'user_uuid': self._uuids(rng, rows),
+        })
+        self._junk_rows(rng, df)
+        numeric_names = self._dirty(rng, rows)
+        df.loc[numeric_names, 'first_name'] = rng.integers(0, 10**6, int(numeric_names.sum())).astype(str)
+        df.insert(0, 'index', np.arange(rows))
+        return df
+
+    def cards(self, rows:int):
+        '''
+        Generate the card details table read from the PDF.
+
+        Parameters
+        ----------
+        rows(int) : Number of rows
+
+        Returns
+        -------
+        df : Pandas Dataframe object
+        '''
+        rng = self._rng('cards')
+        card_numbers = rng.integers(10**15, 10**16, rows).astype(str).astype(object)
+        question_marks = self._dirty(rng, rows)
+        card_numbers[question_marks] = '???' + card_numbers[question_marks]
+        df = pd.DataFrame({
+            'card_number': card_numbers,
+            'expiry_date': np.char.add(np.char.add(np.char.zfill(rng.integers(1, 13, rows).astype(str), 2), '/'), rng.integers(22, 31, rows).astype(str)).astype(object),
+            'card_provider': self._pick(rng, CARD_PROVIDERS, rows),
+            'date_payment_confirmed': self._dates(rng, rows, '1992-01-01', '2022-12-31'),
+        })
+        return self._junk_rows(rng, df)
+
+    def stores(self, rows:int):
+        '''
+        Generate the store details table returned by the stores API, indexed like the staged table.
+
+        Parameters
+        ----------
+        rows(int) : Number of rows
+
+        Returns
+        -------
+        df : Pandas Dataframe object
+        '''
+        rng = self._rng('stores')
+        country_index = rng.integers(0, len(COUNTRY_CODES), rows)
+        continents = np.where(country_index == 2, 'America', 'Europe').astype(object)
+        ee_continents = self._dirty(rng, rows)
+        continents[ee_continents] = 'ee' + continents[ee_continents]
+        staff_numbers = rng.integers(1, 100, rows).astype(str).astype(object)
+        lettered = self._dirty(rng, rows)
+        staff_numbers[lettered] = 'J' + staff_numbers[lettered]
+        df = pd.DataFrame({
+            'address': rng.integers(1, 999, rows).astype(str).astype(object) + ' ' + self._pick(rng, STREETS, rows) + '\n' + self._pick(rng, TOWNS, rows),
+            'longitude': rng.uniform(-120, 15, rows).round(5).astype(str).astype(object),
+            'lat': None,
+            'locality': self._pick(rng, TOWNS, rows),
+            'store_code': np.char.add('ST-', np.arange(rows).astype(str)).astype(object),
+            'staff_numbers': staff_numbers,
+            'opening_date': self._dates(rng, rows, '1990-01-01', '2022-12-31'),
+            'store_type': self._pick(rng, STORE_TYPES, rows),
+            'latitude': rng.uniform(25, 60, rows).round(5).astype(str).astype(object),
+            'country_code': np.array(COUNTRY_CODES, dtype=object)[country_index],
+            'continent': continents,
+        })
+        df = self._junk_rows(rng, df)
+        web_portal = np.arange(rows) == 0
+        df.loc[web_portal, ['address', 'longitude', 'locality', 'latitude']] = 'N/A'
+        df.loc[web_portal, 'store_type'] = 'Web Portal'
+        df.index.name = 'index'
+        return df
+
+    def products(self, rows:int):
+        '''
+        Generate the products table read from S3, indexed like the staged table.
+
+        Parameters
+        ----------
+        rows(int) : Number of rows
+
+        Returns
+        -------
+        df : Pandas Dataframe object
+        '''
+        rng = self._rng('products')
+        prices = np.char.add('£', (rng.integers(100, 100000, rows) / 100).astype(str)).astype(object)
+        thousands = self._dirty(rng, rows)
+        prices[thousands] = '£1,' + rng.integers(100, 999, int(thousands.sum())).astype(str).astype(object) + '.99'
+        df = pd.DataFrame({
+            'product_name': self._pick(rng, ['FurReal Dazzlin Dimples My Dancin Pony', 'Tiffany Sparkle Hoop Earrings', 'Nintendo Switch Lite', 'Dog Bed'], rows),
+            'product_price': prices,
+            'weight': self._pick(rng, WEIGHTS, rows),
+            'category': self._pick(rng, CATEGORIES, rows),
+            'EAN': rng.integers(10**12, 10**13, rows).astype(str).astype(object),
+            'date_added': self._dates(rng, rows, '2000-01-01', '2022-12-31'),
+            'uuid': self._uuids(rng, rows),
+            'removed': self._pick(rng, ['Still_avaliable', 'Still_avaliable', 'Removed'], rows),
+            'product_code': np.char.add('P', np.arange(rows).astype(str)).astype(object),
+        })
+        df = self._junk_rows(rng, df)
+        df.index.name = 'index'
+        return df
+
+    def orders(self, rows:int):
+        '''
+        Generate the orders_table read from RDS.
+
+        Parameters
+        ----------
+        rows(int) : Number of rows
+
+        Returns
+        -------
+        df : Pandas Dataframe object
+        '''
+        rng = self._rng('orders')
+        return pd.DataFrame({
+            'level_0': np.arange(rows),
+            'index': np.arange(rows),
+            'date_uuid': self._uuids(rng, rows),
+            'first_name': None,
+            'last_name': None,
+            'user_uuid': self._uuids(rng, rows),
+            'card_number': rng.integers(10**15, 10**16, rows),
+            'store_code': np.char.add('ST-', rng.integers(0, 450, rows).astype(str)).astype(object),
+            'product_code': np.char.add('P', rng.integers(0, 1850, rows).astype(str)).astype(object),
+            '1': np.nan,
+            'product_quantity': rng.integers(1, 20, rows),
+        })
+
+    def date_events(self, rows:int):
+        '''
+        Generate the date events table read from the JSON file.
+
+        Parameters
+        ----------
+        rows(int) : Number of rows
+
+        Returns
+        -------
+        df : Pandas Dataframe object
+        '''
+        rng = self._rng('date_events')
+        seconds = rng.integers(0, 24 * 60 * 60, rows)
+        df = pd.DataFrame({
+            'timestamp': pd.to_datetime(seconds, unit='s').strftime('%H:%M:%S').to_numpy(dtype=object),
+            'month': rng.integers(1, 13, rows).astype(str).astype(object),
+            'year': rng.integers(1992, 2023, rows).astype(str).astype(object),
+            'day': rng.integers(1, 29, rows).astype(str).astype(object),
+            'time_period': self._pick(rng, TIME_PERIODS, rows),
+            'date_uuid': self._uuids(rng, rows),
+        })
+        return self._junk_rows(rng, df)
+
+    def table_for(self, clean_method:str, rows:int):
+        '''
+        Generate the table cleaned by a DataCleaning method.
+
+        Parameters
+        ----------
+        clean_method(str) : Name of the DataCleaning method, e.g. "clean_users"
+        rows(int) : Number of rows
+
+        Returns
+        -------
+        df : Pandas Dataframe object
+        '''
+        tables = {
+            'clean_users': self.users,
+            'clean_card_data': self.cards,
+            'clean_store_data': self.stores,
+            'clean_products_data': self.products,
+            'clean_order_data': self.orders,
+            'clean_events_data': self.date_events,
+        }
+        return tables[clean_method](rows)
@@ -0,0 +1,99 @@
+'''
+Reference implementations and fixtures shared by the cleaning tests and the benchmarks that time them.
+
+The tests check the cleaning optimisations against these, the benchmarks import them from here so
+editing a benchmark never changes what the tests check.
+'''
+import contextlib
+import io
+import time
+import numpy as np
+import pandas as pd
+from data_cleaning import DataCleaning
+
+CLEAN_METHODS = ['clean_users', 'clean_card_data', 'clean_store_data', 'clean_products_data', 'clean_order_data', 'clean_events_data']
+WEIGHT_SAMPLES = ['1.6kg', '0.5kg', '590g', '100g', '400ml', '1000ml', '16oz', '2.2oz', '12 x 100g',
+                  '3 x 2g', '8 x 85g', '77g .', '16oz .', 'NULL', None, '9GO9NZ5JTL', '5.4kg']
+
+
+def _split_weight_units(x):
+    '''Previous per-row weight splitter, the reference implementation.'''
+    try:
+        if pd.isna(x):
+            return np.nan, np.nan
+        if x[-2:] in ('kg', 'ml', 'oz'):
+            unit = x[:-2]
+            weight = x[-2:]
+        elif x[-2:] == ' .':
+            unit = x[:-4]
+            weight = x[-4:-2]
+        elif x[-1:] == 'g':
+            unit = x[:-1]
+            weight = x[-1:]
+        else:
+            return np.nan, np.nan
+        return unit, weight
+    except TypeError:
+        return np.nan, np.nan
+
+
+def reference_convert_product_weights(table):
+    '''Previous apply based _convert_product_weights, the reference implementation.'''
+    cleaner = DataCleaning(table)
+    cleaner.table['weight'] = cleaner.table['weight'].astype('string')
+    cleaner.remove_nulls()
+    table = cleaner.table
+    table['weights_tuple'] = table['weight'].apply(_split_weight_units)
+    table['weights'] = table['weights_tuple'].str[0]
+    table['unit'] = table['weights_tuple'].str[1]
+    multipack = table['weights'].str.match(r'\d+ x \d+', na=False)
+    table.loc[multipack, 'weights'] = (table.loc[multipack, 'weights'].str.extract(r'(\d+) x (\d+)').astype(int).prod(axis=1)) / 100
+    table['weights'] = table['weights'].astype('float')
+    table.loc[table['unit'] == 'g', 'weights'] /= 1000
+    table.loc[table['unit'] == 'ml', 'weights'] /= 1000
+    table.loc[table['unit'] == 'oz', 'weights'] /= 35.274
+    table['weight'] = table['weights']
+    table.drop(columns=['weights', 'unit', 'weights_tuple'], inplace=True)
+    return table
+
+
+def make_weights(rows:int, seed:int = 0):
+    '''
+    Build a products-like dataframe with a weight column drawn from the known weight formats.
+
+    Parameters
+    ----------
+    rows(int) : Number of rows to generate
+    seed(int) : Random seed
+
+    Returns
+    -------
+    df : Pandas Dataframe object
+    '''
+    rng = np.random.default_rng(seed)
+    weights = np.array(WEIGHT_SAMPLES, dtype=object)[rng.integers(0, len(WEIGHT_SAMPLES), rows)]
+    return pd.DataFrame({'product_name': 'product', 'weight': weights})
+
+
+def run_backend(table, clean_method:str, backend:str):
+    '''
+    Clean a copy of a table with one backend.
+
+    Parameters
+    ----------
+    table : Pandas Dataframe object to clean
+    clean_method(str) : Name of the DataCleaning method
+    backend(str) : "pandas" or "polars"
+
+    Returns
+    -------
+    df : The cleaned Pandas Dataframe object
+    rejected_rows : Number of rows failing each validation rule
+    seconds : Wall time of the clean method
+    '''
+    cleaner = DataCleaning(table.copy(), backend=backend)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        df = getattr(cleaner, clean_method)()
+        seconds = time.perf_counter() - start
+    return df, cleaner.rejected_rows, seconds
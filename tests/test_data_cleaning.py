@@ -0,0 +1,56 @@
+'''
+Equivalence tests of the cleaning optimisations against the implementations they replaced.
+'''
+import pytest
+import pandas as pd
+from data_cleaning import COMPACT_CATEGORIES, DataCleaning, clean_in_chunks
+from synthetic_data import SyntheticDataGenerator
+from tests.cleaning_reference import CLEAN_METHODS, WEIGHT_SAMPLES, make_weights, reference_convert_product_weights, run_backend
+
+
+def test_vectorised_weight_matches_apply_for_every_format():
+    df = pd.DataFrame({'product_name': 'product', 'weight': WEIGHT_SAMPLES})
+    expected = reference_convert_product_weights(df.copy())
+    result = DataCleaning(df.copy())._convert_product_weights()
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_vectorised_weights_match_apply(seed):
+    df = make_weights(5000, seed=seed)
+    expected = reference_convert_product_weights(df.copy())
+    result = DataCleaning(df.copy())._convert_product_weights()
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+@pytest.mark.parametrize('clean_method', CLEAN_METHODS)
+def test_polars_backend_matches_pandas(clean_method):
+    pytest.importorskip('polars')
+    table = SyntheticDataGenerator(seed=0).table_for(clean_method, 5000)
+    expected, expected_rejected, _ = run_backend(table, clean_method, 'pandas')
+    result, rejected, _ = run_backend(table, clean_method, 'polars')
+    pd.testing.assert_frame_equal(result, expected)
+    assert rejected == expected_rejected
+
+
+@pytest.mark.parametrize('clean_method', ['clean_store_data', 'clean_products_data', 'clean_users'])
+def test_compact_chunks_concatenate_without_falling_back_to_object(clean_method):
+    table = SyntheticDataGenerator(seed=0).table_for(clean_method, 3000)
+    chunks = [table.iloc[start:start + 1000].copy() for start in range(0, len(table), 1000)]
+    cleaned = list(clean_in_chunks(chunks, clean_method, compact=True))
+    combined = pd.concat(cleaned)
+    categories = [column for column in combined.columns if isinstance(cleaned[0][column].dtype, pd.CategoricalDtype)]
+    assert categories
+    for column in categories:
+        assert combined[column].dtype == cleaned[0][column].dtype
+    for column, fixed in COMPACT_CATEGORIES.items():
+        if column in combined.columns:
+            assert isinstance(combined[column].dtype, pd.CategoricalDtype) == (fixed is not None)
+
+
+@pytest.mark.filterwarnings('error::pandas.errors.SettingWithCopyWarning')
+@pytest.mark.parametrize('clean_method', ['clean_users', 'clean_card_data', 'clean_products_data', 'clean_order_data', 'clean_events_data'])
+@pytest.mark.parametrize('compact', [False, True])
+def test_cleaning_never_assigns_into_a_slice(clean_method, compact):
+    table = SyntheticDataGenerator(seed=0).table_for(clean_method, 2000)
+    getattr(DataCleaning(table, compact=compact), clean_method)()
@@ -0,0 +1,122 @@
+'''
+Tests of the store API client against a stub server on localhost answering with scripted 429 and 5xx responses.
+'''
+import contextlib
+import http.server
+import json
+import threading
+import time
+import pytest
+from data_extraction import DataExtractor
+from extraction_cache import ExtractionCache
+
+
+class StubStoreAPI(http.server.ThreadingHTTPServer):
+    '''
+    Store API stub. failures maps a path to the list of statuses returned before it succeeds, a path
+    whose list ends with a status keeps failing with it. Every request's path and time is recorded.
+    '''
+    def __init__(self, number_of_stores:int, failures:dict = None):
+        super().__init__(('127.0.0.1', 0), StubStoreHandler)
+        self.number_of_stores = number_of_stores
+        self.failures = {path: list(statuses) for path, statuses in (failures or {}).items()}
+        self.requests = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+class StubStoreHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests.append((self.path, time.monotonic()))
+            statuses = self.server.failures.get(self.path, [])
+            status = (statuses.pop(0) if len(statuses) > 1 else statuses[0]) if statuses else 200
+        if status != 200:
+            body = b'{"message": "try again"}'
+        elif self.path == '/number_stores':
+            body = json.dumps({'number_stores': self.server.number_of_stores}).encode()
+        else:
+            store_number = int(self.path.rsplit('/', 1)[1])
+            body = json.dumps({'index': store_number, 'store_code': f'ST-{store_number}'}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@contextlib.contextmanager
+def stub_api(number_of_stores:int, failures:dict = None):
+    server = StubStoreAPI(number_of_stores, failures)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_retries_429_and_5xx_until_every_store_is_retrieved():
+    failures = {'/store_details/1': [429, 429, 200], '/store_details/3': [503, 200], '/store_details/4': [500, 502, 200]}
+    with stub_api(6, failures) as server:
+        extractor = DataExtractor(max_workers=3, requests_per_second=1000, max_retries=3, backoff_factor=0)
+        df = extractor.retrieve_stores_data(6, f'{server.url}/store_details/', {})
+    assert df['index'].tolist() == list(range(6))
+    assert len(server.requests) == 6 + 2 + 1 + 2
+
+
+def test_store_failing_after_its_retries_raises():
+    with stub_api(4, {'/store_details/2': [500]}) as server:
+        extractor = DataExtractor(max_workers=2, requests_per_second=1000, max_retries=2, backoff_factor=0)
+        with pytest.raises(IOError, match=r'1 of 4 stores .*\[2\]'):
+            extractor.retrieve_stores_data(4, f'{server.url}/store_details/', {})
+        paths = [path for path, _ in server.requests]
+    assert paths.count('/store_details/2') == 3
+
+
+def test_retries_are_rate_limited():
+    rate = 20
+    workers = 2
+    with stub_api(8, {'/store_details/0': [429, 429, 429, 200], '/store_details/5': [503, 503, 200]}) as server:
+        extractor = DataExtractor(max_workers=workers, requests_per_second=rate, max_retries=3, backoff_factor=0)
+        start = time.monotonic()
+        extractor.retrieve_stores_data(8, f'{server.url}/store_details/', {})
+        times = [request_time - start for _, request_time in server.requests]
+    assert len(times) == 8 + 3 + 2
+    #the bucket starts with one token per worker and every request after those waits for a new token
+    for count, request_time in enumerate(sorted(times), start=1):
+        assert request_time >= (count - workers) / rate - 0.01
+
+
+def test_number_of_stores():
+    with stub_api(451) as server:
+        extractor = DataExtractor(requests_per_second=1000, backoff_factor=0)
+        assert extractor.list_number_of_stores(f'{server.url}/number_stores', {}) == 451
+
+
+def test_number_of_stores_failing_after_its_retries_raises():
+    with stub_api(451, {'/number_stores': [503]}) as server:
+        extractor = DataExtractor(requests_per_second=1000, max_retries=1, backoff_factor=0)
+        with pytest.raises(IOError, match='status code 503'):
+            extractor.list_number_of_stores(f'{server.url}/number_stores', {})
+
+
+def test_partial_stores_are_not_cached(tmp_path):
+    cache = ExtractionCache(cache_dir=tmp_path)
+    with stub_api(3, {'/store_details/1': [500]}) as server:
+        extractor = DataExtractor(requests_per_second=1000, max_retries=1, backoff_factor=0, cache=cache)
+        with pytest.raises(IOError):
+            extractor.retrieve_stores_data(3, f'{server.url}/store_details/', {})
+    assert list(tmp_path.iterdir()) == []
+    with stub_api(3) as server:
+        extractor = DataExtractor(requests_per_second=1000, backoff_factor=0, cache=cache)
+        df = extractor.retrieve_stores_data(3, f'{server.url}/store_details/', {})
+    assert df['index'].tolist() == [0, 1, 2]
+    assert cache.get(f'{server.url}/store_details/', '3 stores') is not None
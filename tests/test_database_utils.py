@@ -0,0 +1,98 @@
+'''
+Tests of merging chunks into a star schema table, against a fake connection recording the statements and copies.
+'''
+from contextlib import contextmanager
+import uuid
+import pandas as pd
+import pytest
+from database_utils import DatabaseConnector
+from star_schema import prepare_for_load, row_hashes
+
+
+class FakeResult:
+    rowcount = 0
+
+    def scalar(self):
+        return None
+
+
+class FakeConnection:
+    def __init__(self):
+        self.statements = []
+
+    def exec_driver_sql(self, statement):
+        self.statements.append(statement)
+        return FakeResult()
+
+
+def _users(rows:int):
+    return pd.DataFrame({
+        'first_name': [f'first {i}' for i in range(rows)],
+        'last_name': [f'last {i}' for i in range(rows)],
+        'date_of_birth': pd.to_datetime('1990-01-01') + pd.to_timedelta(range(rows), unit='D'),
+        'company': 'company',
+        'email_address': [f'user{i}@example.com' for i in range(rows)],
+        'address': 'address',
+        'country': 'United Kingdom',
+        'country_code': 'GB',
+        'phone_number': '0123',
+        'join_date': pd.to_datetime('2020-01-01'),
+        'user_uuid': [str(uuid.UUID(int=i)) for i in range(rows)],
+    })
+
+
+@pytest.fixture
+def connector(monkeypatch):
+    '''
+    DatabaseConnector whose transaction is a FakeConnection and whose stored hashes are those of 10 users.
+    '''
+    connector = DatabaseConnector.__new__(DatabaseConnector)
+    connector.connection = FakeConnection()
+    connector.copies = {}
+
+    @contextmanager
+    def begin():
+        yield connector.connection
+
+    def copy_dataframe(connection, df, table, chunksize):
+        connector.copies[table] = pd.concat([connector.copies.get(table), df])
+
+    stored = row_hashes(prepare_for_load(_users(10), 'dim_users'), 'dim_users')
+    monkeypatch.setattr(connector, 'begin', begin)
+    monkeypatch.setattr(connector, '_copy_dataframe', copy_dataframe)
+    monkeypatch.setattr(connector, '_stored_hashes', lambda connection, table: stored)
+    monkeypatch.setattr(connector, 'bump_table_versions', lambda tables, connection=None: None)
+    return connector
+
+
+def _source():
+    #user 3 is changed, user 9 is gone and user 10 is new
+    users = _users(11).drop(index=9)
+    users.loc[3, 'company'] = 'other company'
+    return users
+
+
+def test_chunks_merge_like_the_whole_table(connector):
+    whole = connector.merge_to_db(_source(), 'dim_users')
+    whole_copies = connector.copies
+    connector.copies = {}
+    source = _source()
+    chunked = connector.merge_chunks_to_db((source.iloc[start:start + 3] for start in range(0, len(source), 3)), 'dim_users')
+    assert chunked == whole == {'inserted': 1, 'updated': 1, 'deleted': 1, 'kept': 0, 'unchanged': 8}
+    assert whole_copies.keys() == connector.copies.keys()
+    for table, df in whole_copies.items():
+        pd.testing.assert_frame_equal(connector.copies[table].reset_index(drop=True), df.reset_index(drop=True))
+    assert connector.copies['dim_users_deleted']['user_uuid'].tolist() == [str(uuid.UUID(int=9))]
+
+
+def test_chunks_do_not_replace_the_table(connector):
+    source = _source()
+    connector.merge_chunks_to_db([source.iloc[:5], source.iloc[5:]], 'dim_users')
+    assert not any(statement.startswith('DROP TABLE') for statement in connector.connection.statements)
+
+
+def test_deletes_keep_the_foreign_keys_to_the_table(connector):
+    connector.merge_to_db(_source(), 'dim_users')
+    statements = connector.connection.statements
+    assert any(statement.startswith('DELETE FROM "dim_users" ') for statement in statements)
+    assert not any('DROP CONSTRAINT' in statement for statement in statements)
@@ -0,0 +1,55 @@
+'''
+Tests of the per call records written by instrument_class.
+'''
+from contextlib import contextmanager
+import inspect
+import json
+import pandas as pd
+import instrumentation
+
+
+@instrumentation.instrument_class
+class Loader:
+    def load(self, rows:int):
+        return pd.DataFrame({'value': range(rows)})
+
+    @contextmanager
+    def connect(self):
+        yield 'connection'
+
+
+def test_context_manager_methods_are_not_instrumented():
+    #an instrumented method would wrap the @contextmanager helper rather than the generator
+    assert inspect.isgeneratorfunction(Loader.connect.__wrapped__)
+    assert not inspect.isgeneratorfunction(Loader.load.__wrapped__)
+
+
+def test_records_name_the_result_size_and_process_peak(tmp_path):
+    path = tmp_path / 'records.jsonl'
+    instrumentation.configure(str(path))
+    try:
+        Loader().load(100)
+        with Loader().connect() as connection:
+            assert connection == 'connection'
+    finally:
+        instrumentation.configure(None)
+    [record] = [json.loads(line) for line in path.read_text().splitlines()]
+    assert record['span'] == 'Loader.load'
+    assert record['rows_out'] == 100
+    assert record['result_bytes'] == pd.DataFrame({'value': range(100)}).memory_usage(index=True, deep=False).sum()
+    assert 'process_peak_rss_mb' in record and 'bytes' not in record
+
+
+def test_private_helpers_do_not_emit_spans(tmp_path):
+    from data_cleaning import DataCleaning
+    from synthetic_data import SyntheticDataGenerator
+    table = SyntheticDataGenerator(seed=0).table_for('clean_products_data', 200)
+    path = tmp_path / 'records.jsonl'
+    instrumentation.configure(str(path))
+    try:
+        DataCleaning(table).clean_products_data()
+    finally:
+        instrumentation.configure(None)
+    spans = [json.loads(line)['span'] for line in path.read_text().splitlines()]
+    assert 'DataCleaning.clean_products_data' in spans
+    assert [span for span in spans if span.split('.')[-1].startswith('_')] == []
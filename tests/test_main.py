@@ -0,0 +1,75 @@
+'''
+Smoke tests of the main.py command line with the stage functions replaced by stubs.
+'''
+import functools
+import json
+import os
+import pytest
+import main
+from stage_scheduler import STAGE_REGISTRY
+
+
+def _stub_stage(name, context, chunksize:int = None, full_refresh:bool = False):
+    '''
+    Stand in for a stage, appending its name and options to the file in STAGE_LOG.
+    '''
+    with open(os.environ['STAGE_LOG'], 'a') as file:
+        file.write(json.dumps({'stage': name, 'chunksize': chunksize, 'full_refresh': full_refresh}) + '\n')
+
+
+def _logged(path):
+    with open(path) as file:
+        return [json.loads(line) for line in file]
+
+
+@pytest.fixture
+def stub_stages(monkeypatch, tmp_path):
+    '''
+    Replace every registered stage function with a stub, keeping its imports and dependencies.
+    '''
+    log_path = tmp_path / 'stages.jsonl'
+    log_path.touch()
+    monkeypatch.setenv('STAGE_LOG', str(log_path))
+    for name, (_, imports, depends_on) in list(STAGE_REGISTRY.items()):
+        monkeypatch.setitem(STAGE_REGISTRY, name, (functools.partial(_stub_stage, name), (), depends_on))
+    return log_path
+
+
+def test_no_arguments_runs_every_stage_after_its_dependencies(stub_stages, capsys):
+    main.main([])
+    ran = [entry['stage'] for entry in _logged(stub_stages)]
+    assert sorted(ran) == sorted(STAGE_REGISTRY)
+    for name in ran:
+        for dependency in STAGE_REGISTRY[name][2]:
+            assert ran.index(dependency) < ran.index(name)
+    assert 'critical path' in capsys.readouterr().out
+
+
+def test_all_passes_options_to_the_stages_taking_them(stub_stages):
+    main.main(['all', '--workers', '2', '--chunksize', '1000'])
+    assert {entry['chunksize'] for entry in _logged(stub_stages)} == {1000}
+
+
+def test_single_stage_runs_alone_with_its_options(stub_stages):
+    main.main(['clean_order_data', '--chunksize', '5', '--full-refresh'])
+    assert _logged(stub_stages) == [{'stage': 'clean_order_data', 'chunksize': 5, 'full_refresh': True}]
+
+
+def test_pull_store_data_reads_both_endpoints_and_json_headers(monkeypatch):
+    calls = []
+
+    class FakeExtractor:
+        def list_number_of_stores(self, endpoint, header_dict):
+            calls.append(('list_number_of_stores', endpoint, header_dict))
+            return 3
+
+        def retrieve_stores_data_to_staging(self, number_of_stores, endpoint, header_dict):
+            calls.append(('retrieve_stores_data_to_staging', number_of_stores, endpoint, header_dict))
+
+    monkeypatch.setenv('HEADER_DICT', '{"x-api-key": "secret"}')
+    monkeypatch.setattr(main, 'cached_extractor', FakeExtractor)
+    main.pull_store_data(main.PipelineContext())
+    assert calls == [
+        ('list_number_of_stores', main.NUMBER_OF_STORES_ENDPOINT, {'x-api-key': 'secret'}),
+        ('retrieve_stores_data_to_staging', 3, main.STORE_ENDPOINT, {'x-api-key': 'secret'}),
+    ]
@@ -0,0 +1,22 @@
+'''
+Tests of parsing dates by their distinct values.
+'''
+import pandas as pd
+import parsing
+from parsing import KNOWN_DATE_FORMATS, parse_dates
+
+
+def test_known_formats_are_not_reordered_by_parsing():
+    before = list(KNOWN_DATE_FORMATS)
+    series = pd.Series(['2020/01/0{}'.format(day) for day in range(1, 10)] * 3 + ['1999 May 20', '2001-02-03', '2001-02-03 04:05:06', 'not a date'])
+    parse_dates(series)
+    assert KNOWN_DATE_FORMATS == before
+
+
+def test_results_do_not_depend_on_the_format_order(monkeypatch):
+    series = pd.Series(['2020-01-02', '2020 March 04', 'July 2021 05', '2022/08/09', '2023-10-11 12:13:14', '2020-01-02', None, 'bad'])
+    expected = parse_dates(series)
+    monkeypatch.setattr(parsing, 'KNOWN_DATE_FORMATS', list(reversed(KNOWN_DATE_FORMATS)))
+    pd.testing.assert_series_equal(parse_dates(series), expected)
+    assert expected.tolist()[:5] == [pd.Timestamp(value) for value in ['2020-01-02', '2020-03-04', '2021-07-05', '2022-08-09', '2023-10-11 12:13:14']]
+    assert expected.isna().tolist()[6:] == [True, True]
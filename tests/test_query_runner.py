@@ -0,0 +1,30 @@
+'''
+Tests of naming the queries of a SQL file by their question comments.
+'''
+from query_plans import split_queries
+from query_runner import read_queries, query_tables
+
+
+def test_each_query_is_named_by_the_comment_before_it():
+    sql = '-- first question\nSELECT 1;\n-- second question\nSELECT 2\n;\n-- third question\nWITH a AS(SELECT 3) SELECT * FROM a;'
+    assert split_queries(sql) == [
+        ('first question', 'SELECT 1'),
+        ('second question', 'SELECT 2'),
+        ('third question', 'WITH a AS(SELECT 3) SELECT * FROM a'),
+    ]
+
+
+def test_a_query_without_its_own_comment_takes_the_last_one_above_it(tmp_path):
+    path = tmp_path / 'queries.sql'
+    path.write_text('-- setup then query\nUPDATE t SET a = 1;\nSELECT a FROM t;\nSELECT b FROM t;\n')
+    assert list(read_queries(str(path))) == ['setup then query', 'setup then query (2)']
+
+
+def test_data_queries_are_named_by_their_questions():
+    queries = read_queries()
+    assert len(queries) == 9
+    assert all(not name.upper().startswith(('SELECT', 'WITH')) for name in queries)
+    last = list(queries)[-1]
+    assert last == 'How quickly is the company making sales? in PROGRESS'
+    assert queries[last].startswith('WITH cte AS(')
+    assert query_tables(queries[last]) == ['dim_date_times']
@@ -0,0 +1,131 @@
+'''
+Check the sales_summary answers against the data_queries.sql questions they replace.
+
+The summary is built on an in memory SQLite star schema in which some orders reference dates, stores
+and products that are missing from their dimension tables, in two incremental refreshes.
+'''
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+from query_runner import read_queries
+from sales_aggregates import CREATE_SUMMARY, REFRESH_SUMMARY, SalesAggregates
+
+
+class SQLiteConnector:
+    '''
+    Stand in for DatabaseConnector giving connections to a SQLite engine.
+    '''
+    def __init__(self, engine):
+        self.engine = engine
+
+    @contextmanager
+    def connect(self):
+        with self.engine.connect() as connection:
+            yield connection
+
+
+def _star_schema(rows:int, seed:int = 0):
+    '''
+    Dimension and order tables where about one order in ten misses each dimension.
+    '''
+    rng = np.random.default_rng(seed)
+    dates = pd.DataFrame({
+        'date_uuid': [f'date-{i}' for i in range(200)],
+        'year': rng.choice(['2019', '2020', '2021'], 200),
+        'month': rng.integers(1, 13, 200).astype(str),
+    })
+    stores = pd.DataFrame({
+        'store_code': [f'store-{i}' for i in range(30)],
+        'store_type': rng.choice(['Local', 'Super Store', 'Mall Kiosk', 'Web Portal', None], 30),
+        'country_code': rng.choice(['GB', 'DE', 'US'], 30),
+    })
+    products = pd.DataFrame({
+        'product_code': [f'product-{i}' for i in range(50)],
+        'product_price': rng.uniform(1, 500, 50).round(2),
+    })
+    def keys(prefix, count):
+        #the codes past the end of each dimension have no matching row
+        return [f'{prefix}-{i}' for i in rng.integers(0, int(count * 1.1), rows)]
+    orders = pd.DataFrame({
+        'index': np.arange(rows),
+        'date_uuid': keys('date', 200),
+        'store_code': keys('store', 30),
+        'product_code': keys('product', 50),
+        'product_quantity': rng.integers(1, 10, rows),
+    })
+    return {'dim_date_times': dates, 'dim_store_details': stores, 'dim_products': products, 'orders_table': orders}
+
+
+@pytest.fixture(scope='module')
+def summary():
+    engine = create_engine('sqlite://')
+    tables = _star_schema(5000)
+    with engine.begin() as connection:
+        for table, df in tables.items():
+            df.to_sql(table, connection, index=False)
+        connection.exec_driver_sql(CREATE_SUMMARY)
+        #two refreshes so rows of the second add on to those of the first
+        for low, high in [(-1, 2499), (2499, 4999)]:
+            connection.execute(text(REFRESH_SUMMARY), {'low': low, 'high': high})
+    return engine, SalesAggregates(SQLiteConnector(engine))
+
+
+def _question(engine, start:str):
+    '''
+    Run the data_queries.sql query whose question starts with the given text.
+    '''
+    [statement] = [statement for question, statement in read_queries().items() if question.startswith(start)]
+    with engine.connect() as connection:
+        return pd.read_sql(text(statement), connection)
+
+
+def _assert_same(result, expected):
+    '''
+    Compare two answers indexed by their labels, ignoring row order and rounding to the cent.
+    '''
+    result = result.astype(float).sort_index()
+    expected = expected.astype(float).sort_index()
+    pd.testing.assert_frame_equal(result, expected, check_exact=False, atol=0.011, check_names=False)
+
+
+def test_orders_missing_a_dimension_are_in_the_summary(summary):
+    engine, _ = summary
+    with engine.connect() as connection:
+        orders = connection.exec_driver_sql('SELECT SUM(order_count) FROM sales_summary').scalar()
+    assert orders == 5000
+
+
+def test_sales_by_month(summary):
+    engine, aggregates = summary
+    expected = _question(engine, 'Which months produced the largest amount of sales?').astype({'month': int})
+    _assert_same(aggregates.sales_by_month().set_index('month'), expected.set_index('month'))
+
+
+def test_sales_by_location(summary):
+    engine, aggregates = summary
+    expected = _question(engine, 'How many sales are coming from online?')
+    expected.columns = ['number_of_sales', 'product_quantity_count', 'location']
+    _assert_same(aggregates.sales_by_location().set_index('location'), expected.set_index('location'))
+
+
+def test_store_type_share(summary):
+    engine, aggregates = summary
+    expected = _question(engine, 'What percentage of sales come through each type of store')
+    #the query groups stores without a type under NULL, the summary under "Unknown"
+    expected['store_type'] = expected['store_type'].fillna('Unknown')
+    _assert_same(aggregates.store_type_share().set_index('store_type'), expected.set_index('store_type'))
+
+
+def test_top_months(summary):
+    engine, aggregates = summary
+    expected = _question(engine, 'Which month in each year produced the highest cost of sales?').astype({'year': int, 'month': int})
+    _assert_same(aggregates.top_months().set_index(['year', 'month']), expected.set_index(['year', 'month']))
+
+
+def test_store_type_sales(summary):
+    engine, aggregates = summary
+    expected = _question(engine, 'Which German store type is selling the most')
+    expected['store_type'] = expected['store_type'].fillna('Unknown')
+    _assert_same(aggregates.store_type_sales('DE').set_index(['store_type', 'country_code']), expected.set_index(['store_type', 'country_code']))